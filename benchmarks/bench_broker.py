@@ -0,0 +1,32 @@
+"""
+    Microbenchmark of the node-local slot broker: latency of one try_acquire + release cycle on the shared table while several other
+    sweeps are registered, which is paid once per job launch.
+    Usage: python benchmarks/bench_broker.py [N_CYCLES] [N_SWEEPS]
+"""
+import sys
+import time
+import shutil
+import tempfile
+from gridsearcher.broker import SlotBroker
+
+N_CYCLES = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+N_SWEEPS = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+def main():
+    folder = tempfile.mkdtemp()
+    try:
+        brokers = [SlotBroker(gpus=list(range(8)), max_jobs_per_gpu=4, folder=folder).register() for _ in range(N_SWEEPS)]
+        broker = brokers[0]
+        start = time.perf_counter()
+        for _ in range(N_CYCLES):
+            gpus = broker.try_acquire(list(range(8)))
+            broker.release(gpus)
+        elapsed = time.perf_counter() - start
+        print(f'{N_SWEEPS} sweeps: {N_CYCLES} acquire/release cycles in {elapsed:6.2f}s\t{1e3 * elapsed / N_CYCLES:6.3f} ms per cycle')
+        for b in brokers:
+            b.close()
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
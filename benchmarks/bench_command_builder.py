@@ -0,0 +1,83 @@
+"""
+    Microbenchmark of the command builder: commands per second for a 100k-point grid with ~30 parameters, comparing the legacy path
+    (add_param + re-scan of __dict__ for templates + build_command for each point, kept here as the baseline since the launcher does not
+    use it anymore) to the compiled command of GridSearcher._compile.
+"""
+import sys
+import time
+from string import Template
+from itertools import product, islice
+from gridsearcher import GridSearcher
+from gridsearcher.gridsearcher import backward_key_replace
+
+N_POINTS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+def make_searcher():
+    gs = GridSearcher(script='train.py', defaults={f'static{i}': i for i in range(20)})
+    gs.add_param('model.name', 'resnet18')
+    gs.add_param('use-amp', True)
+    gs.add_param('lr_decay_at', [82, 123])
+    gs.add_param('wandb_group', Template('E=${epochs}_bs=${bs}'))
+    gs.add_param('wandb_name', Template('${wandb_group}_lr=${lr}_wd=${wd}_seed=${seed}'))
+    gs.exp_folder_template = Template('/results/${wandb_group}/${wandb_name}')
+    params_values = dict(
+        seed=list(range(10)),
+        lr=[f'1e-{i}' for i in range(10)],
+        wd=[f'1e-{i}' for i in range(10)],
+        bs=list(range(10)),
+        epochs=list(range(10)),
+    )
+    return gs, params_values
+
+def fill_template(gs, template):
+    """
+        Fills in `template` with the values stored in gs.__dict__, as the launcher did for each point before the compiled command.
+    """
+    if isinstance(template, str):
+        return template
+    return template.substitute(**{k[1:]: v for k, v in gs.__dict__.items() if k.startswith('_')})
+
+def build_command(gs):
+    params = []
+    dash_or_not = '--' if gs.use_dashes else '@'
+    for k, v in gs.__dict__.items():
+        if k.startswith('_'):
+            if isinstance(v, bool):
+                if v:
+                    params.append(f'{dash_or_not}{backward_key_replace(k)}')
+            elif isinstance(v, Template):
+                params.append(f'{dash_or_not}{backward_key_replace(k)}{gs.key_value_separator}{fill_template(gs, v)}')
+            else:
+                params.append(f'{dash_or_not}{backward_key_replace(k)}{gs.key_value_separator}{str(v)}')
+    params = ' '.join(params).replace(f'{dash_or_not}_', f'{dash_or_not}').replace('@', '')
+    return f'{gs.script} {params}'
+
+def legacy(gs, params_values, n):
+    params = list(params_values.keys())
+    for values in islice(product(*params_values.values()), n):
+        for k, v in zip(params, values):
+            gs.add_param(k, v)
+        for k, v in gs.__dict__.items():
+            if k.startswith('template_'):
+                gs.__dict__[k.replace('template', '')] = fill_template(gs, v)
+        root_folder = fill_template(gs, gs.exp_folder_template)
+        gs.add_param('output_dir', root_folder)
+        p = {k: v for k, v in gs.__dict__.items() if k.startswith('_')}
+        yield build_command(gs), root_folder, p
+
+def compiled(gs, params_values, n):
+    return islice(gs._iter_grid('output_dir', params_values, product(*params_values.values())), n)
+
+def main():
+    gs, params_values = make_searcher()
+    for expected, actual in zip(legacy(*make_searcher(), 1000), compiled(gs, params_values, 1000)):
+        assert expected == actual, f'The compiled command differs from the legacy one:\n{expected}\n{actual}'
+    for name, fn in [('legacy', legacy), ('compiled', compiled)]:
+        gs, params_values = make_searcher()
+        start = time.perf_counter()
+        count = sum(1 for _ in fn(gs, params_values, N_POINTS))
+        elapsed = time.perf_counter() - start
+        print(f'{name:>10}: {count} commands in {elapsed:6.2f}s\t{count / elapsed:10.0f} commands/s')
+
+if __name__ == '__main__':
+    main()
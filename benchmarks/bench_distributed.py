@@ -0,0 +1,62 @@
+"""
+    Runs a Coordinator and three WorkerAgents on localhost with fake GPU ids. The agents run short sleep jobs with different durations
+    per node, so the fast agents end up running more jobs and stealing the prefetched jobs of the slow one. One agent is killed in
+    the middle of the sweep: its jobs must be given to the other agents and every job must end exactly once with exit code 0.
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+from gridsearcher.distributed import Coordinator
+
+N_JOBS = 60
+AGENTS = [ # (name, fake GPU ids, sleep per job)
+    ('fast', '0,1,2,3', 0.2),
+    ('slow', '0,1', 0.8),
+    ('doomed', '0,1', 0.3),
+]
+
+def make_jobs(folder):
+    for i in range(N_JOBS):
+        root = os.path.join(folder, f'job_{i:03d}')
+        cmd = f'-c "import os, time; time.sleep(float(os.environ[\'SLEEP\']))" --root {root}'
+        yield f'job_{i:03d}', (sys.executable, cmd, root, dict(_root=root), False, False, 2**20, 1)
+
+def main():
+    folder = tempfile.mkdtemp()
+    coordinator = Coordinator(make_jobs(folder), host='127.0.0.1', port=0, lease_timeout=5)
+    started, ended = Counter(), {}
+    coordinator.on_start = lambda job_id, gpus: started.update([gpus[0].split('/')[0]])
+    coordinator.on_exit = lambda job_id, exit_code: ended.__setitem__(job_id, ended.get(job_id, []) + [exit_code])
+
+    thread = threading.Thread(target=coordinator.serve)
+    thread.start()
+    while coordinator.server is None or coordinator.port == 0:
+        time.sleep(0.01)
+
+    agents = {}
+    begin = time.monotonic()
+    for name, gpus, sleep in AGENTS:
+        agents[name] = subprocess.Popen(
+            [sys.executable, '-m', 'gridsearcher.agent', '--host', '127.0.0.1', '--port', str(coordinator.port),
+             '--gpus', gpus, '--warmup-seconds', '0', '--name', name],
+            env=dict(os.environ, SLEEP=str(sleep)), stdout=subprocess.DEVNULL)
+
+    time.sleep(1.5)
+    agents['doomed'].kill()
+    thread.join()
+    makespan = time.monotonic() - begin
+    for proc in agents.values():
+        proc.wait()
+
+    print(f'makespan={makespan:.2f}s\tjobs started per agent: {dict(started)}')
+    print(f'jobs ended: {len(ended)}/{N_JOBS}\tended twice: {sum(len(codes) > 1 for codes in ended.values())}'
+          f'\tfailed: {sum(codes != [0] for codes in ended.values())}')
+    shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+    Stress test for FileLock: many processes bump per-GPU counters stored in a shared JSON file, each update being a read-modify-write
+    under the lock. At the end the counters must be exact. The CPU time of all workers is compared to the wall time to show that
+    waiting for the lock does not spin.
+"""
+import os
+import json
+import time
+import tempfile
+import resource
+import multiprocessing as mp
+from gridsearcher.file_locker import FileLock
+
+N_PROCESSES = 32
+N_UPDATES = 200
+GPUS = [0, 1, 2, 3, 4, 5, 6, 7]
+
+def worker(args):
+    lock_path, counters_path, index = args
+    lock = FileLock(lock_path, timeout=60)
+    for i in range(N_UPDATES):
+        gpu = GPUS[(index + i) % len(GPUS)]
+        with lock:
+            with open(counters_path) as f:
+                counters = json.load(f)
+            counters[str(gpu)] += 1
+            with open(counters_path, 'w') as f:
+                json.dump(counters, f)
+
+def holder(lock_path, seconds):
+    with FileLock(lock_path):
+        time.sleep(seconds)
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        lock_path = os.path.join(folder, 'sweep.lock')
+        counters_path = os.path.join(folder, 'counters.json')
+        with open(counters_path, 'w') as f:
+            json.dump({str(gpu): 0 for gpu in GPUS}, f)
+
+        start = time.monotonic()
+        with mp.Pool(processes=N_PROCESSES) as pool:
+            pool.map(worker, [(lock_path, counters_path, i) for i in range(N_PROCESSES)])
+        wall = time.monotonic() - start
+
+        with open(counters_path) as f:
+            counters = json.load(f)
+        expected = N_PROCESSES * N_UPDATES
+        print(f'updates: {sum(counters.values())} / {expected}\texact: {sum(counters.values()) == expected}\tcounters: {counters}')
+        print(f'wall: {wall:.2f}s\tupdates/s: {expected / wall:.0f}')
+
+        # one process holds the lock for 3 seconds while another one waits for it: the waiter should use almost no CPU
+        p = mp.Process(target=holder, args=(lock_path, 3))
+        p.start()
+        time.sleep(0.5)
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        start = time.monotonic()
+        with FileLock(lock_path):
+            waited = time.monotonic() - start
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+        p.join()
+        cpu = (usage_after.ru_utime + usage_after.ru_stime) - (usage_before.ru_utime + usage_before.ru_stime)
+        print(f'waited {waited:.2f}s for the lock using {cpu * 1000:.1f}ms of CPU')
+
+        # a lock held by a killed process is released by the OS
+        p = mp.Process(target=holder, args=(lock_path, 60))
+        p.start()
+        time.sleep(0.5)
+        p.kill()
+        p.join()
+        start = time.monotonic()
+        FileLock(lock_path, timeout=5).acquire()
+        print(f'acquired the lock of a killed owner in {time.monotonic() - start:.3f}s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+    Microbenchmark of the metadata writes of a sweep: time to create the root folders and write the arguments and finished marks of N jobs,
+    comparing the previous per-job path (makedirs + open/write for arguments.txt + open for state.finished at each job), the atomic per-job
+    files with the folders created in bulk, and the journal without per-job files. The gap is much larger on network filesystems.
+    Usage: python benchmarks/bench_metadata.py [N] [FOLDER]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+from gridsearcher.metadata import JobMetadata, SweepJournal
+
+N_JOBS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+def jobs(folder):
+    for i in range(N_JOBS):
+        root = os.path.join(folder, f'lr={i % 10}', f'seed={i}')
+        yield root, {'_lr': i % 10, '_seed': i, '_epochs': 100, '_out': root}
+
+def previous(folder):
+    for root, cmd_dict in jobs(folder):
+        os.makedirs(root, exist_ok=True)
+        with open(os.path.join(root, 'arguments.txt'), 'w') as w:
+            for k, v in cmd_dict.items():
+                w.write(f'{k[1:]}={v}\n')
+        with open(os.path.join(root, 'state.finished'), 'w'):
+            pass
+
+def write(metadata, folder):
+    batch = list(jobs(folder))
+    metadata.create_folders([root for root, _ in batch])
+    for root, cmd_dict in batch:
+        metadata.write_arguments(root, cmd_dict)
+        metadata.mark_finished(root, 0)
+    metadata.close()
+
+def main():
+    base = sys.argv[2] if len(sys.argv) > 2 else tempfile.gettempdir()
+    cases = [
+        ('previous', previous),
+        ('atomic files', lambda folder: write(JobMetadata(), folder)),
+        ('journal', lambda folder: write(JobMetadata(SweepJournal(os.path.join(folder, 'metadata.jsonl')), per_job_files=False), folder)),
+    ]
+    folders = []
+    for name, fn in cases:
+        folders.append(tempfile.mkdtemp(dir=base))
+        start = time.perf_counter()
+        fn(folders[-1])
+        elapsed = time.perf_counter() - start
+        print(f'{name:>14}: {N_JOBS} jobs in {elapsed:6.2f}s\t{N_JOBS / elapsed:10.0f} jobs/s')
+    for folder in folders: # removed at the end, such that the deletions do not slow down the next case
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
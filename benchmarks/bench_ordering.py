@@ -0,0 +1,79 @@
+"""
+    Simulates the dispatch of a sweep on 8 GPU slots (no process is started, time is virtual) and reports the makespan of the order of
+    the cartesian product against the orders of OrderedJobs: longest first with the true durations given as `job_cost`, longest first
+    with the durations learned during the sweep (`job_cost='learned'`) and a random order. The makespans are divided by the lower bound
+    max(total / slots, longest).
+"""
+import heapq
+import random
+from itertools import product
+from gridsearcher.ordering import CostModel, OrderedJobs
+
+SLOTS = 8
+N_SEEDS = 20 # each grid is drawn N_SEEDS times, the reported numbers are averages
+
+def grid_epochs(rng):
+    """
+        epochs=[10, 100, 300] is the outermost dimension of the grid: the grid order ends with a tail of long jobs.
+    """
+    params_values = dict(epochs=[10, 100, 300], model=['small', 'large'], lr=[1e-4, 1e-3, 1e-2], seed=[0, 1, 2])
+    size = dict(small=1, large=3)
+    jobs = []
+    for values in product(*params_values.values()):
+        params = dict(zip(params_values.keys(), values))
+        jobs.append((params, params['epochs'] * size[params['model']] * rng.uniform(0.8, 1.2)))
+    return jobs
+
+def grid_lognormal(rng):
+    """
+        Durations driven by the batch size (outermost dimension, ascending durations) with a heavy-tailed noise.
+    """
+    params_values = dict(bs=[256, 128, 64, 32, 16], lr=[1e-4, 1e-3, 1e-2], seed=list(range(8)))
+    jobs = []
+    for values in product(*params_values.values()):
+        params = dict(zip(params_values.keys(), values))
+        jobs.append((params, 2000 / params['bs'] * rng.lognormvariate(0, 0.3)))
+    return jobs
+
+def simulate(jobs, order):
+    """
+        List scheduling: each time a slot is free, the next job of `order` starts on it.
+        :param jobs: list of tuples (params, duration)
+        :param order: callable receiving the jobs and the CostModel and returning an iterator over the jobs
+    """
+    model = CostModel(keys=jobs[0][0].keys())
+    iterator = order(jobs, model)
+    events = [] # heap of tuples (end time, index, params, duration)
+    now = 0.0
+    index = 0
+    for job in iterator:
+        if len(events) == SLOTS: # wait for the next job to end and teach its duration to the model
+            now, _, params, duration = heapq.heappop(events)
+            model.observe(params, duration)
+        model.started(job[0])
+        heapq.heappush(events, (now + job[1], index, job[0], job[1]))
+        index += 1
+    return max(end for end, _, _, _ in events)
+
+ORDERS = {
+    'grid order': lambda jobs, model: iter(jobs),
+    'random': lambda jobs, model: iter(random.Random(1).sample(jobs, len(jobs))),
+    'longest first (cost)': lambda jobs, model: OrderedJobs(jobs, score=lambda job: job[1]),
+    'longest first (learned)': lambda jobs, model: OrderedJobs(jobs, score=lambda job: model.priority(job[0]), model=model),
+}
+
+def main():
+    for name, make_grid in [('epochs outermost', grid_epochs), ('lognormal by batch size', grid_lognormal)]:
+        ratios = {order_name: [] for order_name in ORDERS.keys()}
+        for seed in range(N_SEEDS):
+            jobs = make_grid(random.Random(seed))
+            durations = [duration for _, duration in jobs]
+            lower_bound = max(sum(durations) / SLOTS, max(durations))
+            for order_name, order in ORDERS.items():
+                ratios[order_name].append(simulate(jobs, order) / lower_bound)
+        print(f'{name}: {len(jobs)} jobs on {SLOTS} slots, makespan / lower bound averaged over {N_SEEDS} draws')
+        for order_name, values in ratios.items():
+            print(f'{order_name:>25}: {sum(values) / len(values):.3f} (worst {max(values):.3f})')
+
+if __name__ == '__main__':
+    main()
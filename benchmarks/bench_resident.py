@@ -0,0 +1,60 @@
+"""
+    Runs the same short jobs on 4 fake GPU slots with the ProcessSupervisor (one interpreter per job) and with the ResidentPool (one
+    interpreter per slot) and reports the throughput in jobs per hour. The script sleeps IMPORT_SECONDS when it is imported, which stands
+    for importing torch and initializing CUDA, and JOB_SECONDS per configuration.
+"""
+import os
+import sys
+import time
+import tempfile
+from gridsearcher.scheduler import GPUScheduler
+from gridsearcher.process import ProcessSupervisor
+from gridsearcher.resident import ResidentPool
+from gridsearcher.tools import launch_worker
+
+IMPORT_SECONDS = 1.0
+JOB_SECONDS = 0.1
+N_JOBS = 80
+GPUS = [0, 1]
+MAX_JOBS_PER_GPU = 2
+
+SCRIPT = f"""
+import sys, time
+time.sleep({IMPORT_SECONDS})
+def main():
+    time.sleep({JOB_SECONDS})
+if __name__ == '__main__':
+    main()
+"""
+
+def run(folder, launch):
+    scheduler = GPUScheduler(gpus=GPUS, max_jobs_per_gpu=MAX_JOBS_PER_GPU, warmup_seconds=0)
+    script = os.path.join(folder, 'script.py')
+    # tuples (exe, cmd, root, cmd_dict, launch_blocking, torchrun, max_log_bytes, log_backups) as built by GridSearcher.run
+    jobs = [(sys.executable, f'{script} --i {i}', os.path.join(folder, str(i)), {}, False, False, 2**20, 1) for i in range(N_JOBS)]
+
+    def launcher(params, gpus, release):
+        launch(params, gpus, lambda exit_code: release())
+
+    start = time.monotonic()
+    scheduler.run_async(jobs=jobs, launcher=launcher)
+    return time.monotonic() - start
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        with open(os.path.join(folder, 'script.py'), 'w') as f:
+            f.write(SCRIPT)
+        supervisor = ProcessSupervisor()
+        pool = ResidentPool(script=os.path.join(folder, 'script.py'), echo=False)
+        backends = {
+            'one process per job': lambda params, gpus, on_exit: launch_worker(params, gpus, supervisor, on_exit, echo=False),
+            'resident workers': pool.launch,
+        }
+        print(f'{N_JOBS} jobs of {JOB_SECONDS}s on {len(GPUS) * MAX_JOBS_PER_GPU} slots, start-up of the script {IMPORT_SECONDS}s')
+        for name, launch in backends.items():
+            elapsed = run(folder, launch)
+            print(f'{name:>20}: {elapsed:6.2f}s, {N_JOBS / elapsed * 3600:8.0f} jobs per hour')
+        pool.close()
+
+if __name__ == '__main__':
+    main()
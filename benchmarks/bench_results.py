@@ -0,0 +1,55 @@
+"""
+    Benchmark of the results aggregation: time to build the table of a sweep of N runs (arguments.txt and metrics.jsonl with 100 lines
+    each) with a serial os.walk and parse, with SweepResults on a cold cache and again with a warm cache after 1% of the runs changed.
+    Usage: python benchmarks/bench_results.py [N] [FOLDER]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+from gridsearcher.results import SweepResults, parse_key_values, parse_metrics
+
+N_RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+def make_sweep(folder):
+    for i in range(N_RUNS):
+        root = os.path.join(folder, f'lr={i % 10}', f'seed={i}')
+        os.makedirs(root)
+        with open(os.path.join(root, 'arguments.txt'), 'w') as f:
+            f.write(f'lr={i % 10}\nseed={i}\nepochs=100\noutput_dir={root}\n')
+        with open(os.path.join(root, 'metrics.jsonl'), 'w') as f:
+            for epoch in range(100):
+                f.write(json.dumps(dict(epoch=epoch, loss=1 / (epoch + 1), acc=epoch / 100)) + '\n')
+        open(os.path.join(root, 'state.finished'), 'w').close()
+
+def serial(folder):
+    rows = []
+    for root, dirs, files in os.walk(folder):
+        if 'arguments.txt' in files:
+            rows.append(dict(parse_key_values(os.path.join(root, 'arguments.txt')), **parse_metrics(os.path.join(root, 'metrics.jsonl'))))
+    return rows
+
+def main():
+    folder = tempfile.mkdtemp(dir=sys.argv[2] if len(sys.argv) > 2 else None)
+    make_sweep(folder)
+    try:
+        start = time.perf_counter()
+        serial(folder)
+        print(f'{"serial walk":>12}: {time.perf_counter() - start:6.2f}s')
+
+        for name in ['cold cache', 'warm cache']:
+            if name == 'warm cache': # 1% of the runs log one more epoch
+                for i in range(0, N_RUNS, 100):
+                    with open(os.path.join(folder, f'lr={i % 10}', f'seed={i}', 'metrics.jsonl'), 'a') as f:
+                        f.write(json.dumps(dict(epoch=100, loss=0.0)) + '\n')
+            results = SweepResults(folder)
+            start = time.perf_counter()
+            table = results.collect()
+            print(f'{name:>12}: {time.perf_counter() - start:6.2f}s\t{len(table)} runs\t{results.stats}')
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
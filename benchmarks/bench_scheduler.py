@@ -0,0 +1,65 @@
+"""
+    Runs a few hundred no-op jobs on fake GPU ids and reports the idle slot-seconds of the legacy sleep/poll loop (stagger of index+5
+    seconds before each job, 60 seconds polling when all GPUs are busy) against GPUScheduler.run_async, the dispatch loop used by the
+    supervisor and resident backends of GridSearcher.run (each job ends on a timer instead of a process).
+    Time is scaled by TIME_SCALE so the benchmark finishes in a few seconds; the reported numbers are in unscaled seconds.
+"""
+import random
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+from gridsearcher.scheduler import GPUScheduler
+
+TIME_SCALE = 0.002
+GPUS = [0, 1, 2, 3]
+MAX_JOBS_PER_GPU = 2
+N_JOBS = 300
+
+def make_durations(seed=0):
+    rng = random.Random(seed)
+    return [rng.uniform(20, 120) for _ in range(N_JOBS)]
+
+def legacy(durations):
+    counts = {gpu: 0 for gpu in GPUS}
+    lock = threading.Lock()
+
+    def worker(params):
+        index, duration = params
+        time.sleep((index + 5) * TIME_SCALE)
+        while True:
+            with lock:
+                gpu = min(counts, key=counts.get)
+                if counts[gpu] < MAX_JOBS_PER_GPU:
+                    counts[gpu] += 1
+                    break
+            time.sleep(60 * TIME_SCALE)
+        time.sleep(duration * TIME_SCALE)
+        with lock:
+            counts[gpu] -= 1
+
+    start = time.monotonic()
+    with ThreadPool(processes=len(GPUS) * MAX_JOBS_PER_GPU) as pool:
+        pool.map(func=worker, iterable=list(enumerate(durations)), chunksize=1)
+    return time.monotonic() - start
+
+def scheduled(durations):
+    scheduler = GPUScheduler(gpus=GPUS, max_jobs_per_gpu=MAX_JOBS_PER_GPU, warmup_seconds=5 * TIME_SCALE)
+
+    def launcher(duration, gpus, release):
+        threading.Timer(duration * TIME_SCALE, release).start()
+
+    start = time.monotonic()
+    scheduler.run_async(jobs=durations, launcher=launcher)
+    return time.monotonic() - start
+
+def main():
+    durations = make_durations()
+    n_slots = len(GPUS) * MAX_JOBS_PER_GPU
+    busy = sum(durations)
+    for name, fn in [('legacy sleep/poll', legacy), ('GPUScheduler.run_async', scheduled)]:
+        makespan = fn(durations) / TIME_SCALE
+        idle = n_slots * makespan - busy
+        print(f'{name:>24}: makespan={makespan:9.1f}s\tidle slot-seconds={idle:9.1f}\tutilisation={busy / (n_slots * makespan):.3f}')
+
+if __name__ == '__main__':
+    main()
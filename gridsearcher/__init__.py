@@ -1,8 +1,28 @@
-from .gridsearcher import GridSearcher
-from .tools import GSExe, GSKeyValSep
-
-__all__ = [
-    'GridSearcher',
-    'GSExe',
-    'GSKeyValSep'
-]
+"""
+    The public classes are imported on first access (PEP 562), such that `import gridsearcher` and the command line (gridsearcher.cli)
+    do not load the launcher and its dependencies until they are used.
+"""
+import importlib
+
+EXPORTS = {
+    'GridSearcher': '.gridsearcher',
+    'GSExe': '.tools',
+    'GSKeyValSep': '.tools',
+    'GSBackend': '.tools',
+    'Uniform': '.sampling',
+    'LogUniform': '.sampling',
+    'IntUniform': '.sampling',
+    'collect_results': '.results',
+}
+
+__all__ = list(EXPORTS.keys())
+
+def __getattr__(name):
+    if name not in EXPORTS:
+        raise AttributeError(f'module {__name__} has no attribute {name}')
+    value = getattr(importlib.import_module(EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
@@ -0,0 +1,28 @@
+import sys
+import argparse
+from .distributed import WorkerAgent
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='GridSearcher worker agent: runs the jobs of a coordinator on the local GPUs')
+    parser.add_argument('--host', type=str, required=True, help='address of the coordinator')
+    parser.add_argument('--port', type=int, default=5555, help='port of the coordinator')
+    parser.add_argument('--gpus', type=str, required=True, help='comma separated list of local GPU ids, e.g. 0,1,2,3')
+    parser.add_argument('--max-jobs-per-gpu', type=int, default=1)
+    parser.add_argument('--distributed-training', action='store_true')
+    parser.add_argument('--warmup-seconds', type=float, default=5)
+    parser.add_argument('--prefetch', type=int, default=1)
+    parser.add_argument('--name', type=str, default=None)
+    args = parser.parse_args(argv)
+
+    WorkerAgent(
+        host=args.host,
+        port=args.port,
+        gpus=[int(gpu) if gpu.isdigit() else gpu for gpu in args.gpus.split(',')],
+        max_jobs_per_gpu=args.max_jobs_per_gpu,
+        distributed_training=args.distributed_training,
+        warmup_seconds=args.warmup_seconds,
+        prefetch=args.prefetch,
+        name=args.name).run()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import os
+import asyncio
+import traceback
+from .tools import prepare_job, mark_finished
+from .process import RotatingLog, LOG_FILE
+
+class AsyncGPUScheduler:
+    def __init__(self, scheduler):
+        """
+            asyncio front-end of a GPUScheduler: the slot table and the placement policy are the ones of `scheduler`, but waiting for a
+            free slot is done with an asyncio.Condition in the event loop instead of blocking a thread.
+            :param scheduler: GPUScheduler owning the slot table
+        """
+        self.scheduler = scheduler
+        self.cond = asyncio.Condition()
+
+    async def acquire(self, job=None):
+        poll_interval = self.scheduler.poll_interval()
+        loop = asyncio.get_running_loop()
+        async with self.cond:
+            while True:
+                if self.scheduler.placement is not None: # the probe can take tens of milliseconds, it is read in a worker thread
+                    await loop.run_in_executor(None, self.scheduler.refresh)
+                gpus, delay = self.scheduler.try_acquire(job)
+                if gpus is not None:
+                    return gpus, delay
+                if poll_interval is None:
+                    await self.cond.wait()
+                else: # the memory readings and the table of the broker change by themselves, look again after poll_interval seconds
+                    try:
+                        await asyncio.wait_for(self.cond.wait(), timeout=poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+
+    async def release(self, gpus, job=None):
+        self.scheduler.release(gpus, job)
+        async with self.cond:
+            self.cond.notify_all()
+
+async def run_job(params, gpus, on_spawn=None, echo=True, metadata=None):
+    """
+        Runs one job as a child process of the event loop, copies its stdout and stderr to the rotating log file in its root folder and
+        returns its exit code.
+        :param params: tuple (exe, cmd, root, cmd_dict, launch_blocking, torchrun, max_log_bytes, log_backups)
+        :param gpus: list of GPU ids reserved for this run
+        :param on_spawn: optional callable receiving the pid of the job once it started
+        :param echo: whether to print the command
+        :param metadata: optional JobMetadata (see tools.prepare_job)
+    """
+    root, max_log_bytes, log_backups = params[2], params[6], params[7]
+    args, env = prepare_job(params, gpus, echo, metadata)
+    log = RotatingLog(os.path.join(root, LOG_FILE), max_bytes=max_log_bytes, backups=log_backups)
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *args, env=env, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        if on_spawn is not None:
+            on_spawn(proc.pid)
+        while True:
+            data = await proc.stdout.read(65536)
+            if not data:
+                break
+            log.write(data)
+        exit_code = await proc.wait()
+    finally:
+        log.close()
+    mark_finished(root, exit_code, metadata)
+    return exit_code
+
+async def run_jobs(jobs, scheduler, on_start=None, on_exit=None, on_spawn=None, echo=True, metadata=None):
+    """
+        Dispatches all jobs from a single process and a single thread: each job is started with asyncio.create_subprocess_exec as soon as
+        a GPU slot is free and its completion is awaited by the event loop, so the launcher does not need one thread or process per job.
+        :param jobs: iterable of tuples (job_id, params), consumed lazily
+        :param scheduler: GPUScheduler owning the slot table
+        :param on_start: optional callable(job_id, gpus) called when a job starts
+        :param on_exit: optional callable(job_id, exit_code) called when a job ends (exit_code is None if the job could not be started)
+        :param on_spawn: optional callable(job_id, pid) called when the process of a job started
+        :param echo: whether to print the command of each job
+        :param metadata: optional JobMetadata (see tools.prepare_job)
+    """
+    slots = AsyncGPUScheduler(scheduler)
+    tasks = set()
+
+    async def supervise(job, gpus, delay):
+        job_id, params = job
+        exit_code = None
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if on_start is not None:
+                on_start(job_id, gpus)
+            exit_code = await run_job(params, gpus, None if on_spawn is None else lambda pid: on_spawn(job_id, pid), echo, metadata)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            if on_exit is not None:
+                on_exit(job_id, exit_code)
+            await slots.release(gpus, job)
+
+    """
+        The next job is taken from `jobs` in a worker thread because the adaptive searches and the retry queue block until a running job
+        ends, which is only noticed by the event loop. Without placement policy, the slot is reserved first, such that the next job is
+        chosen as late as possible (see GPUScheduler.run_async).
+    """
+    loop = asyncio.get_running_loop()
+    jobs = iter(jobs)
+    while True:
+        if scheduler.placement is None:
+            gpus, delay = await slots.acquire()
+            job = await loop.run_in_executor(None, next, jobs, None)
+            if job is None:
+                await slots.release(gpus)
+                break
+        else:
+            job = await loop.run_in_executor(None, next, jobs, None)
+            if job is None:
+                break
+            gpus, delay = await slots.acquire(job)
+        task = asyncio.create_task(supervise(job, gpus, delay))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
@@ -0,0 +1,252 @@
+import json
+import math
+import threading
+import numpy as np
+from .sampling import Sampler, to_value, to_unit, Uniform, IntUniform
+from .halving import read_metric
+
+class GaussianProcess:
+    def __init__(self, seed=0, n_restarts=64):
+        """
+            Gaussian process regression with a Matern 5/2 kernel with one length scale per dimension, on inputs in [0, 1]^d.
+            The length scales and the noise are chosen among `n_restarts` random candidates by maximizing the marginal likelihood.
+        """
+        self.rng = np.random.default_rng(seed)
+        self.n_restarts = n_restarts
+
+    @staticmethod
+    def kernel(a, b, lengthscales):
+        d = np.sqrt(5 * (((a[:, None, :] - b[None, :, :]) / lengthscales) ** 2).sum(-1))
+        return (1 + d + d ** 2 / 3) * np.exp(-d)
+
+    def fit(self, x, y):
+        """
+            :param x: array of shape (n, d)
+            :param y: array of shape (n,)
+            Raises ValueError if the kernel matrix stays singular with the default length scales and a noise of 1 (e.g. y is not finite).
+        """
+        self.x = x
+        self.mean, self.std = y.mean(), max(y.std(), 1e-12)
+        self.y = (y - self.mean) / self.std
+        best = None
+        for _ in range(self.n_restarts):
+            lengthscales = np.exp(self.rng.uniform(np.log(0.05), np.log(2.0), size=x.shape[1]))
+            noise = np.exp(self.rng.uniform(np.log(1e-6), np.log(1e-1)))
+            candidate = self._candidate(lengthscales, noise)
+            if candidate is not None and (best is None or candidate[0] > best[0]):
+                best = candidate
+        if best is None: # the kernel matrix of every candidate is singular, add more noise to the default length scales until it is not
+            for jitter in 10.0 ** np.arange(-6, 1):
+                best = self._candidate(np.full(x.shape[1], 0.5), jitter)
+                if best is not None:
+                    break
+            else:
+                raise ValueError(f'The Gaussian process cannot be fitted on {len(x)} points, even with a noise of 1 (results: {y})')
+        _, self.lengthscales, self.chol, self.alpha = best
+        return self
+
+    def _candidate(self, lengthscales, noise):
+        """
+            Returns a tuple (marginal log-likelihood, lengthscales, cholesky factor, alpha) or None if the kernel matrix is singular.
+        """
+        k = self.kernel(self.x, self.x, lengthscales) + noise * np.eye(len(self.x))
+        try:
+            chol = np.linalg.cholesky(k)
+        except np.linalg.LinAlgError:
+            return None
+        alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, self.y))
+        likelihood = -0.5 * self.y @ alpha - np.log(np.diag(chol)).sum()
+        return likelihood, lengthscales, chol, alpha
+
+    def predict(self, x):
+        """
+            Returns the mean and the standard deviation of the posterior at the points `x` of shape (m, d).
+        """
+        k = self.kernel(x, self.x, self.lengthscales)
+        mean = k @ self.alpha
+        v = np.linalg.solve(self.chol, k.T)
+        var = np.maximum(1 - (v ** 2).sum(0), 1e-12)
+        return mean * self.std + self.mean, np.sqrt(var) * self.std
+
+def expected_improvement(mean, std, best):
+    """
+        Expected improvement below `best` (minimization) of points with the given posterior mean and standard deviation.
+    """
+    z = (best - mean) / std
+    cdf = 0.5 * (1 + np.vectorize(math.erf)(z / np.sqrt(2)))
+    pdf = np.exp(-0.5 * z ** 2) / np.sqrt(2 * np.pi)
+    return (best - mean) * cdf + std * pdf
+
+class BayesianSearch:
+    def __init__(self, params_values, make_job, metric, n_trials, mode='min', n_initial=None, liar='mean', n_candidates=2048, seed=0,
+                 is_done=None):
+        """
+            Asynchronous Bayesian optimization with ask/tell: each time a GPU slot is free, `ask` suggests the configuration with the
+            highest expected improvement under a Gaussian process fitted on the results of the jobs that ended. The jobs that are still
+            running are added to the data with a fake result (constant liar), so the suggestions made while they run go elsewhere and all
+            slots stay busy without waiting for a batch to end.
+            :param params_values: dictionary where key=parameter name and value=list of values or a range (Uniform, LogUniform, IntUniform)
+            :param make_job: callable(values) returning a tuple (job_id, root, job) for the configuration `values`
+            :param metric: name of the metric read from metrics.jsonl in the root folder of each job when it ends
+            :param n_trials: total number of configurations to run, including the ones of the previous launches
+            :param mode: 'min' if the metric is a loss, 'max' if it is an accuracy
+            :param n_initial: number of configurations drawn from a Sobol sequence before the first suggestion of the model, defaults to
+            max(5, 2 * number of parameters)
+            :param liar: fake result of the running jobs: 'best', 'mean' or 'worst' of the results observed so far
+            :param n_candidates: number of random points where the expected improvement is evaluated for each suggestion
+            :param seed: seed of the initial design and of the candidates
+            :param is_done: optional callable(job_id, root) telling whether a job already ended in a previous launch, in which case its
+            metric is read without running it again
+        """
+        assert mode in ['min', 'max'], 'mode must be min or max'
+        assert liar in ['best', 'mean', 'worst'], 'liar must be best, mean or worst'
+        self.params_values = list(params_values.values())
+        self.make_job = make_job
+        self.metric = metric
+        self.n_trials = n_trials
+        self.sign = 1 if mode == 'min' else -1
+        self.n_initial = max(5, 2 * len(self.params_values)) if n_initial is None else n_initial
+        self.liar = liar
+        self.n_candidates = n_candidates
+        self.is_done = is_done
+        self.initial = Sampler(params_values, n=self.n_initial, method='sobol', seed=seed)
+        self.rng = np.random.default_rng(seed)
+        self.gp = GaussianProcess(seed=seed)
+        self.observed = {} # key=configuration and value=result (multiplied by sign, such that lower is better)
+        self.pending = {} # key=job_id and value=tuple (configuration, root folder) of the jobs that did not end yet
+        self.asked = 0
+        self.lock = threading.Lock()
+
+    def __iter__(self):
+        while self.asked < self.n_trials:
+            config = self.ask()
+            if config is None: # all points of a discrete space were tried
+                return
+            job_id, root, job = self.make_job(config)
+            with self.lock:
+                self.pending[job_id] = (config, root)
+            if self.is_done is not None and self.is_done(job_id, root):
+                self.ended(job_id, 0)
+                continue
+            yield job
+
+    def ask(self):
+        """
+            Returns the next configuration to try, as a tuple of values in the order of the keys of params_values.
+        """
+        with self.lock:
+            self.asked += 1
+            tried = set(self.observed.keys()) | {config for config, _ in self.pending.values()}
+            if len(self.observed) < self.n_initial or len(self.observed) < 2:
+                for point in self.initial:
+                    if point not in tried:
+                        return point
+            candidates = self._candidates(tried)
+            if len(candidates) == 0:
+                return None
+            if len(self.observed) < 2: # not enough data for the model, e.g. the initial design was exhausted by the previous launches
+                return candidates[0]
+
+            x = np.array([self._encode(config) for config in self.observed.keys()])
+            y = np.array(list(self.observed.values()), dtype=float)
+            if self.pending: # constant liar: the running jobs get a fake result
+                lie = dict(best=y.min(), mean=y.mean(), worst=y.max())[self.liar]
+                x = np.vstack([x, [self._encode(config) for config, _ in self.pending.values()]])
+                y = np.concatenate([y, np.full(len(self.pending), lie)])
+            self.gp.fit(x, y)
+            mean, std = self.gp.predict(np.array([self._encode(config) for config in candidates]))
+            return candidates[int(np.argmax(expected_improvement(mean, std, y.min())))]
+
+    def tell(self, config, value):
+        """
+            Records the result of a configuration. Failed jobs (value=None) and diverged jobs (NaN or infinite value) get the worst result
+            observed so far, a non-finite value would make the expected improvement NaN everywhere.
+        """
+        with self.lock:
+            if value is not None:
+                value = self.sign * float(value)
+            if value is None or not math.isfinite(value):
+                if len(self.observed) == 0:
+                    return
+                self.observed[config] = max(self.observed.values())
+            else:
+                self.observed[config] = value
+
+    def ended(self, job_id, exit_code):
+        """
+            Reads the metric of a job that ended and gives it to the model.
+        """
+        with self.lock:
+            if job_id not in self.pending:
+                return
+            config, root = self.pending.pop(job_id)
+        self.tell(config, read_metric(root, self.metric) if exit_code == 0 else None)
+
+    def warm_start(self, rows, keys):
+        """
+            Gives the results of the jobs that succeeded in the previous launches to the model.
+            :param rows: rows returned by SweepLedger.select
+            :param keys: names of the parameters in the rows, in the order of the keys of params_values
+        """
+        for row in rows:
+            config = self._parse(json.loads(row['params']), keys)
+            if config is not None:
+                value = read_metric(row['root'], self.metric)
+                if value is not None:
+                    self.tell(config, value)
+                    self.asked += 1
+
+    def best(self):
+        """
+            Returns a tuple (config, metric) for the best configuration so far.
+        """
+        with self.lock:
+            if not self.observed:
+                return None
+            config = min(self.observed, key=self.observed.get)
+            return config, self.sign * self.observed[config]
+
+    def _encode(self, config):
+        return [to_unit(values, value) for values, value in zip(self.params_values, config)]
+
+    def _candidates(self, tried):
+        """
+            Random points of the space and perturbations of the best configurations, snapped to valid values, without the ones that were
+            already tried.
+        """
+        units = self.rng.random((self.n_candidates, len(self.params_values)))
+        if self.observed:
+            best = sorted(self.observed, key=self.observed.get)[:5]
+            centers = np.array([self._encode(config) for config in best])
+            local = centers[self.rng.integers(len(centers), size=self.n_candidates // 4)]
+            local = np.clip(local + self.rng.normal(0, 0.05, size=local.shape), 0, 1 - 1e-9)
+            units = np.vstack([units, local])
+        candidates = []
+        seen = set(tried)
+        for u in units:
+            config = tuple(to_value(values, x) for values, x in zip(self.params_values, u))
+            if config not in seen:
+                seen.add(config)
+                candidates.append(config)
+        return candidates
+
+    def _parse(self, params, keys):
+        """
+            Converts the parameters of a ledger row (values stored as strings) back to a configuration, or returns None if a value is not
+            part of the space anymore.
+        """
+        config = []
+        for key, values in zip(keys, self.params_values):
+            value = params.get(key)
+            if value is None:
+                return None
+            if isinstance(values, IntUniform):
+                config.append(int(value))
+            elif isinstance(values, Uniform):
+                config.append(float(value))
+            else:
+                matches = [v for v in values if str(v) == value]
+                if not matches:
+                    return None
+                config.append(matches[0])
+        return tuple(config)
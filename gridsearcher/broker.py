@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import uuid
+from .file_locker import FileLock, pid_alive
+
+TABLE_FILE = 'table.json'
+WAITING_TIMEOUT_SECONDS = 10 # a sweep that did not ask for a slot for that long is not waiting anymore
+
+def default_broker_folder():
+    """
+        Folder shared by all launchers of the machine: $GRIDSEARCHER_BROKER or <temporary folder>/gridsearcher_broker.
+    """
+    return os.environ.get('GRIDSEARCHER_BROKER', os.path.join('/tmp' if os.name != 'nt' else os.environ.get('TEMP', '.'), 'gridsearcher_broker'))
+
+def shared_file(path):
+    """
+        Creates `path` readable and writable by all users (the launchers of a machine can belong to different users). On Windows, the
+        lock files are created by FileLock itself.
+    """
+    if os.name != 'nt' and not os.path.exists(path):
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+            os.close(fd)
+            os.chmod(path, 0o666)
+        except OSError:
+            pass
+
+class SlotBroker:
+    def __init__(self, gpus, max_jobs_per_gpu, weight=1.0, name=None, folder=None, poll_interval=1.0):
+        """
+            Node-local slot broker shared by all sweeps launched on the same machine, implemented as a table in a JSON file guarded by
+            a FileLock (no daemon). Each sweep registers its GPUs, its max_jobs_per_gpu and a weight, and asks the table for a slot before
+            launching a job (see GPUScheduler). The table enforces:
+                - a global limit per GPU: the number of jobs of all sweeps on a GPU is at most the smallest max_jobs_per_gpu of the sweeps
+                registered on that GPU
+                - weighted fair share: while several sweeps wait for the same GPU, the slot goes to the sweep with the smallest number of
+                running jobs divided by its weight
+            Each registered sweep holds a FileLock on its own file in the broker folder for its whole life. The kernel releases it if the
+            launcher dies, so the other sweeps find the dead entries and give their slots back to the table (the jobs of a killed
+            launcher that are still running are not counted anymore).
+            The default folder is shared by all users of the machine, with the sticky bit such that the files of a user cannot be removed
+            or replaced by the others. The table itself stays writable by all users: give a folder only accessible to a group (`folder`
+            or $GRIDSEARCHER_BROKER) to restrict who shares the GPUs.
+            :param gpus: GPU ids used by the sweep
+            :param max_jobs_per_gpu: jobs per GPU accepted by the sweep, it also bounds the jobs of the other sweeps on these GPUs
+            :param weight: share of the sweep relative to the other sweeps, e.g. 2 gets twice as many slots as a sweep with weight 1
+            :param name: name of the sweep shown in the table, defaults to the PID of the launcher
+            :param folder: broker folder, defaults to default_broker_folder()
+            :param poll_interval: seconds between two requests of a waiting sweep, the other sweeps release their slots without notifying it
+        """
+        assert weight > 0, 'The weight of a sweep must be positive'
+        self.gpus = [str(gpu) for gpu in gpus] # JSON keys
+        self.max_jobs = max_jobs_per_gpu
+        self.weight = weight
+        self.name = name or f'pid {os.getpid()}'
+        self.folder = folder or default_broker_folder()
+        self.poll_interval = poll_interval
+        self.key = uuid.uuid4().hex[:12]
+        self.held = {} # key=GPU id and value=number of slots of the sweep, to register it again if its entry was lost
+        self.registered_at = None
+        self.table_lock = None
+        self.alive = None
+
+    def register(self):
+        os.makedirs(self.folder, exist_ok=True)
+        try:
+            os.chmod(self.folder, 0o1777) # the other users create their files, the sticky bit keeps them from removing ours
+        except OSError: # created by another user
+            pass
+        shared_file(os.path.join(self.folder, 'table.lock'))
+        self.table_lock = FileLock(os.path.join(self.folder, 'table.lock'))
+        alive_path = os.path.join(self.folder, f'{self.key}.alive')
+        shared_file(alive_path)
+        self.alive = FileLock(alive_path)
+        self.alive.acquire(timeout=0)
+        self.registered_at = time.time()
+        with self.table_lock:
+            table = self._read()
+            self._entry(table)
+            self._write(table)
+        return self
+
+    def _entry(self, table):
+        """
+            Returns the entry of the sweep in `table`, added again with the slots held by the sweep if it is missing (the table was
+            cleared or could not be read).
+        """
+        me = table['sweeps'].get(self.key)
+        if me is None:
+            me = table['sweeps'][self.key] = dict(
+                name=self.name, pid=os.getpid(), gpus=self.gpus, max_jobs=self.max_jobs, weight=self.weight, held=dict(self.held),
+                waiting=None, waited_at=None, registered_at=self.registered_at)
+        return me
+
+    def close(self):
+        """
+            Gives back all slots of the sweep and removes it from the table.
+        """
+        if self.alive is None:
+            return
+        with self.table_lock:
+            table = self._read()
+            table['sweeps'].pop(self.key, None)
+            self._write(table)
+        self.alive.release()
+        self._remove(self.alive.path)
+        self.alive = None
+
+    def try_acquire(self, candidates, all_of=False):
+        """
+            Reserves a slot in the table on one GPU of `candidates` (the first in the order of the list among the least loaded GPUs of
+            the machine), or on all of them if `all_of` is True (distributed training).
+            :return: the list of reserved GPU ids (same type as in `candidates`) or an empty list if the limits or the fair share do not
+            allow it now, in which case the sweep is marked as waiting for these GPUs
+        """
+        with self.table_lock:
+            table = self._read()
+            sweeps = table['sweeps']
+            me = self._entry(table)
+            now = time.time()
+            totals, limits = self._totals(sweeps)
+            my_share = sum(me['held'].values()) / me['weight']
+
+            def allowed(gpu):
+                gpu = str(gpu)
+                if totals.get(gpu, 0) >= limits.get(gpu, self.max_jobs):
+                    return False
+                for key, other in sweeps.items(): # a waiting sweep with a smaller share goes first
+                    if key != self.key and other['waiting'] and gpu in other['waiting'] and now - other['waited_at'] < WAITING_TIMEOUT_SECONDS:
+                        if sum(other['held'].values()) / other['weight'] < my_share:
+                            return False
+                return True
+
+            if all_of:
+                gpus = list(candidates) if all(allowed(gpu) for gpu in candidates) else []
+            else:
+                free = [gpu for gpu in candidates if allowed(gpu)]
+                gpus = [min(free, key=lambda gpu: totals.get(str(gpu), 0))] if free else [] # min keeps the first of equal GPUs
+
+            if gpus:
+                for gpu in gpus:
+                    self.held[str(gpu)] = self.held.get(str(gpu), 0) + 1
+                me['held'] = dict(self.held)
+                me['waiting'], me['waited_at'] = None, None
+            else:
+                me['waiting'], me['waited_at'] = [str(gpu) for gpu in candidates], now
+            self._write(table)
+            return gpus
+
+    def release(self, gpus):
+        with self.table_lock:
+            table = self._read()
+            for gpu in gpus:
+                gpu = str(gpu)
+                self.held[gpu] = max(0, self.held.get(gpu, 0) - 1)
+            self._entry(table)['held'] = dict(self.held)
+            self._write(table)
+
+    def sweeps(self):
+        """
+            Returns the entries of the live sweeps of the table: name, pid, gpus, max_jobs, weight, held slots per GPU, etc.
+        """
+        with self.table_lock:
+            return list(self._read()['sweeps'].values())
+
+    def _totals(self, sweeps):
+        """
+            Returns the number of jobs of all sweeps on each GPU and the global limit of each GPU.
+        """
+        totals, limits = {}, {}
+        for sweep in sweeps.values():
+            for gpu, count in sweep['held'].items():
+                totals[gpu] = totals.get(gpu, 0) + count
+            for gpu in sweep['gpus']:
+                limits[gpu] = min(limits.get(gpu, sweep['max_jobs']), sweep['max_jobs'])
+        return totals, limits
+
+    def _read(self):
+        """
+            Reads the table and removes the sweeps whose launcher died. Must be called with the table lock held.
+        """
+        path = os.path.join(self.folder, TABLE_FILE)
+        try:
+            with open(path) as f:
+                table = json.load(f)
+        except (OSError, ValueError):
+            table = {}
+        table.setdefault('sweeps', {})
+        for key in [key for key in table['sweeps'] if key != self.key]:
+            if self._dead(key, table['sweeps'][key]):
+                del table['sweeps'][key]
+        return table
+
+    def _dead(self, key, sweep):
+        """
+            The launcher of a sweep is dead if the lock on its file can be taken. If the file is missing or cannot be opened, the
+            launcher is dead only if its PID does not exist anymore.
+        """
+        path = os.path.join(self.folder, f'{key}.alive')
+        if not os.path.exists(path):
+            return not pid_alive(sweep['pid'])
+        lock = FileLock(path)
+        try:
+            lock.acquire(timeout=0)
+        except TimeoutError:
+            return False
+        except OSError:
+            return not pid_alive(sweep['pid'])
+        lock.release()
+        self._remove(path)
+        return True
+
+    def _write(self, table):
+        """
+            Writes the table in place, since the file of another user cannot be replaced in a folder with the sticky bit. Must be called
+            with the table lock held, the readers hold it too. A table left half-written by a killed launcher is read as empty and the
+            live sweeps add their entries again.
+        """
+        path = os.path.join(self.folder, TABLE_FILE)
+        shared_file(path)
+        with os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o666), 'w') as f:
+            f.write(json.dumps(table))
+            f.truncate()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
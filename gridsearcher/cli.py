@@ -0,0 +1,205 @@
+"""
+    Command line entry point `gridsearcher`, which runs a sweep described by a YAML spec instead of a python driver:
+
+        gridsearcher sweep.yaml              # run the sweep, refuses to start if runs of the sweep already finished
+        gridsearcher sweep.yaml --resume     # run the runs that did not finish yet
+        gridsearcher sweep.yaml --dry-run    # only print the commands (debug mode of GridSearcher.run)
+        gridsearcher sweep.yaml --status     # counts of finished runs, whether a launcher is running and its live status
+        gridsearcher results FOLDER ...      # same as python -m gridsearcher.results
+        gridsearcher agent --host ...        # same as python -m gridsearcher.agent
+
+    The spec contains the arguments of GridSearcher and GridSearcher.run (see example.yaml):
+        script, defaults, exe, key_value_separator, use_dashes: constructor of GridSearcher
+        params: parameters added with add_param, templates: parameters added with add_param(key, Template(value))
+        param_name_for_exp_root_folder, exp_folder (template string), scheduling, launch_blocking, torchrun, backend: GridSearcher.run
+    In scheduling.params_values, a range is written {uniform: [low, high]}, {log_uniform: [low, high]} or {int_uniform: [low, high]} and
+    scheduling.device_probe is 'nvidia-smi' or {file: path}.
+    The launcher and its dependencies are only imported to run a sweep, such that --status answers quickly on large sweeps.
+"""
+import os
+import sys
+import json
+import argparse
+from string import Template
+from .tools import read_yaml, sweep_size, sweep_folder, sweep_depth, sweep_file
+
+RANGES = ['uniform', 'log_uniform', 'int_uniform']
+
+def load_spec(path):
+    """
+        Reads a sweep spec and checks that the required keys are present.
+    """
+    spec = read_yaml(path)
+    assert isinstance(spec, dict), f'The spec {path} must be a YAML dictionary'
+    for key in ['script', 'param_name_for_exp_root_folder', 'exp_folder', 'scheduling']:
+        assert key in spec, f'The spec {path} requires the key `{key}`'
+    for key in ['gpus', 'max_jobs_per_gpu', 'params_values']:
+        assert key in spec['scheduling'], f'The spec {path} requires the key `scheduling.{key}`'
+    spec['scheduling'].setdefault('distributed_training', False)
+    return spec
+
+def build_searcher(spec):
+    """
+        Creates the GridSearcher of a spec and returns the keyword arguments of its run method.
+    """
+    from .gridsearcher import GridSearcher
+    from .tools import GSExe, GSKeyValSep, GSBackend
+
+    gs = GridSearcher(
+        script=spec['script'],
+        defaults=spec.get('defaults', None),
+        exe=GSExe(spec.get('exe', GSExe.PYTHON.value)),
+        key_value_separator=GSKeyValSep(spec.get('key_value_separator', GSKeyValSep.SPACE.value)),
+        use_dashes=spec.get('use_dashes', True))
+    for k, v in (spec.get('params', None) or {}).items():
+        gs.add_param(k, v)
+    for k, v in (spec.get('templates', None) or {}).items():
+        gs.add_param(k, Template(v))
+
+    scheduling = dict(spec['scheduling'])
+    scheduling['params_values'] = {k: parse_values(v) for k, v in scheduling['params_values'].items()}
+    if 'device_probe' in scheduling:
+        scheduling['device_probe'] = parse_probe(scheduling['device_probe'])
+    return gs, dict(
+        param_name_for_exp_root_folder=spec['param_name_for_exp_root_folder'],
+        exp_folder=Template(spec['exp_folder']),
+        scheduling=scheduling,
+        launch_blocking=spec.get('launch_blocking', False),
+        torchrun=spec.get('torchrun', False),
+        backend=GSBackend(spec.get('backend', GSBackend.SUPERVISOR.value)))
+
+def parse_values(values):
+    """
+        Returns the values of a parameter of params_values: a list, or a range for the dictionaries {uniform: [low, high]}, etc.
+    """
+    if isinstance(values, dict):
+        from .sampling import Uniform, LogUniform, IntUniform
+        assert len(values) == 1 and list(values)[0] in RANGES, f'A range must be one of {RANGES}, got {values}'
+        kind, (low, high) = list(values.items())[0]
+        return dict(uniform=Uniform, log_uniform=LogUniform, int_uniform=IntUniform)[kind](low, high)
+    return values if isinstance(values, list) else [values]
+
+def parse_probe(probe):
+    from .devices import NvidiaSmiProbe, FileProbe
+    if probe == 'nvidia-smi':
+        return NvidiaSmiProbe()
+    assert isinstance(probe, dict) and 'file' in probe, f'device_probe must be "nvidia-smi" or {{file: path}}, got {probe}'
+    return FileProbe(probe['file'])
+
+def sweep_status(spec):
+    """
+        Returns the status of the sweep of a spec without importing the launcher: the number of runs, the finished runs found in the
+        ledger, the journal or the root folders (in this order), whether a launcher holds the lock of the sweep and the live status served
+        by that launcher if scheduling.progress.port is set.
+    """
+    script, exp_folder, scheduling = spec['script'], Template(spec['exp_folder']), spec['scheduling']
+    status = dict(script=script, folder=sweep_folder(exp_folder), total=sweep_size(scheduling),
+                  running=launcher_running(script, exp_folder))
+
+    ledger_path = sweep_file(script, exp_folder, 'ledger.sqlite')
+    journal = scheduling.get('metadata_journal', False)
+    journal_path = sweep_file(script, exp_folder, 'metadata.jsonl') if journal is True else journal
+    if scheduling.get('ledger', False) and os.path.isfile(ledger_path):
+        from .ledger import SweepLedger
+        status.update(source='ledger', jobs=SweepLedger(ledger_path).counts())
+        status['finished'] = status['jobs'].get('succeeded', 0)
+    elif journal and not scheduling.get('metadata_files', False):
+        from .metadata import SweepJournal
+        finished = SweepJournal(journal_path).finished_roots() if os.path.isfile(journal_path) else set()
+        status.update(source='journal', finished=len(finished))
+    else:
+        from .resume import ResumeIndex
+        index = ResumeIndex(
+            folder=sweep_folder(exp_folder),
+            depth=sweep_depth(exp_folder),
+            manifest=sweep_file(script, exp_folder, 'resume.json') if scheduling.get('resume_manifest', False) else None,
+            workers=scheduling.get('resume_workers', 16)).scan()
+        status.update(source='folders', finished=len(index.finished))
+
+    progress = scheduling.get('progress', False)
+    if status['running'] and isinstance(progress, dict) and progress.get('port', None) is not None:
+        status['live'] = live_status(progress['port'])
+    return status
+
+def launcher_running(script, exp_folder):
+    """
+        Checks whether a launcher holds the lock of the sweep (see GridSearcher.run), without creating the lock file.
+    """
+    from .file_locker import FileLock
+    path = sweep_file(script, exp_folder, 'lock')
+    if not os.path.isfile(path):
+        return False
+    lock = FileLock(path)
+    try:
+        lock.acquire(timeout=0)
+    except TimeoutError:
+        return True
+    lock.release()
+    return False
+
+def live_status(port):
+    """
+        Returns the status served by progress.StatusServer on the local port, or None if it does not answer.
+    """
+    from urllib.request import urlopen
+    try:
+        with urlopen(f'http://127.0.0.1:{port}/', timeout=0.5) as response:
+            return json.loads(response.read())
+    except (OSError, ValueError):
+        return None
+
+def print_status(status):
+    total = '?' if status['total'] is None else status['total']
+    print(f'Sweep of {status["script"]} in {status["folder"]}')
+    print(f'Launcher: {"running" if status["running"] else "not running"}')
+    print(f'Runs:\tfinished {status["finished"]}\ttotal {total}\t(from the {status["source"]})')
+    if 'jobs' in status:
+        print('Ledger:\t' + '\t'.join(f'{state} {count}' for state, count in sorted(status['jobs'].items())))
+    live = status.get('live', None)
+    if live is not None:
+        from .progress import format_seconds
+        print(f'Live:\tqueued {live["queued"]}\trunning {live["running"]}\tdone {live["done"]}\tfailed {live["failed"]}\t'
+              f'ETA {format_seconds(live["eta_seconds"])}')
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] == 'results':
+        from .results import main as results_main
+        return results_main(argv[1:])
+    if argv and argv[0] == 'agent':
+        from .agent import main as agent_main
+        return agent_main(argv[1:])
+
+    parser = argparse.ArgumentParser(prog='gridsearcher', description='GridSearcher: runs the sweep described by a YAML spec')
+    parser.add_argument('spec', type=str, help='YAML file with script, defaults, params, templates, exp_folder and scheduling')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--dry-run', action='store_true', help='only print the commands')
+    mode.add_argument('--status', action='store_true', help='print the progress of the sweep and exit')
+    parser.add_argument('--resume', action='store_true', help='run the sweep even if some of its runs already finished (they are skipped)')
+    parser.add_argument('--json', action='store_true', help='print the status as JSON')
+    args = parser.parse_args(argv)
+
+    spec = load_spec(args.spec)
+    if args.status:
+        status = sweep_status(spec)
+        if args.json:
+            print(json.dumps(status))
+        else:
+            print_status(status)
+        return 0
+
+    if not args.dry_run and not args.resume:
+        status = sweep_status(spec)
+        if status['running']:
+            print(f'A launcher is already running this sweep, see `gridsearcher {args.spec} --status`', file=sys.stderr)
+            return 1
+        if status['finished'] > 0:
+            print(f'{status["finished"]} runs of this sweep already finished: use --resume to run the others', file=sys.stderr)
+            return 1
+
+    gs, run_args = build_searcher(spec)
+    gs.run(debug=args.dry_run, **run_args)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
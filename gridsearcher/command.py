@@ -0,0 +1,205 @@
+from string import Template
+
+def template_identifiers(template):
+    """
+        Returns the list of placeholder names used in `template`, in order of appearance and without duplicates.
+        Example: Template('lr=${lr}_wd=$wd_${lr}') returns ['lr', 'wd_']
+    """
+    names = []
+    for m in template.pattern.finditer(template.template):
+        name = m.group('named') or m.group('braced')
+        if name is not None and name not in names:
+            names.append(name)
+    return names
+
+def template_order(templates):
+    """
+        Sorts the templated parameters such that each template is filled after the templates it depends on (topological order of the
+        dependency graph). Raises RuntimeError if the dependencies contain a cycle.
+        :param templates: dictionary where key=parameter name and value=Template
+        :return: list of parameter names
+    """
+    order = []
+    visiting = [] # path of the depth-first search, to report the cycle
+
+    def visit(key):
+        if key in order:
+            return
+        if key in visiting:
+            cycle = visiting[visiting.index(key):] + [key]
+            raise RuntimeError(f'[TemplateError] cyclic reference between templates: {" -> ".join(cycle)}')
+        visiting.append(key)
+        for dep in template_identifiers(templates[key]):
+            if dep in templates:
+                visit(dep)
+        visiting.pop()
+        order.append(key)
+
+    for key in templates.keys():
+        visit(key)
+    return order
+
+def validate_templates(templates, known, exp_folder=None):
+    """
+        Checks before the launch that every placeholder of the templates and of `exp_folder` refers to a known parameter and that the
+        dollar signs are valid, such that no unresolved ${...} can reach a command or a folder name. Raises RuntimeError listing all
+        problems.
+        :param templates: dictionary where key=parameter name and value=Template
+        :param known: names of all parameters (static, varying, templated and the root folder)
+        :param exp_folder: Template or string for the root folder
+    """
+    problems = []
+    named = dict(templates)
+    if isinstance(exp_folder, Template):
+        named['exp_folder'] = exp_folder
+    for key, template in named.items():
+        for m in template.pattern.finditer(template.template):
+            if m.group('invalid') is not None:
+                problems.append(f'{key}: invalid placeholder at position {m.start("invalid")} of "{template.template}" (use $$ for a dollar sign)')
+        missing = [name for name in template_identifiers(template) if name not in known]
+        if missing:
+            problems.append(f'{key}: unknown parameters {missing} in "{template.template}"')
+    if problems:
+        raise RuntimeError('[TemplateError] ' + '; '.join(problems))
+
+def fill(template, values):
+    """
+        Fills in `template` with `values`. The templates are validated before the launch, so a missing value is a bug and raises.
+    """
+    try:
+        return template.substitute(values)
+    except KeyError as e:
+        raise RuntimeError(f'[TemplateError] missing value for {e} in "{template.template}"') from e
+
+class CompiledCommand:
+    def __init__(self, script, params, templates, varying, root_param, exp_folder, key_prefixes, key_value_separator):
+        """
+            Command builder for a sweep, created by GridSearcher._compile. Everything that does not depend on the grid point (parameter
+            names, dashes, separators, static values and the order in which templates have to be filled) is resolved here, once per sweep.
+            Calling the object with the values of a grid point only fills in the templates and formats the varying parameters.
+            :param script: path of the script
+            :param params: dictionary where key=parameter name (as stored in GridSearcher.__dict__, without the underscore prefix) and
+            value=parameter value, in the order in which they appear in the command
+            :param templates: dictionary where key=parameter name and value=Template
+            :param varying: list of parameter names whose value changes between grid points (the keys of params_values)
+            :param root_param: name of the parameter that receives the root folder of the experiment
+            :param exp_folder: Template or string for the root folder of the experiment
+            :param key_prefixes: dictionary where key=parameter name and value=formatted argument name, e.g. '--training.lr'
+            :param key_value_separator: separator between keys and values
+        """
+        self.script = script
+        self.params = dict(params)
+        self.templates = templates
+        validate_templates(templates, set(params) | set(templates) | set(varying) | {root_param}, exp_folder)
+
+        """
+            The templates that use the root folder (directly or through another template) are filled after it, the others before it
+            since the root folder can use them. A root folder using such a template is a cycle.
+        """
+        order = template_order(templates)
+        after_root = set()
+        for key in order:
+            if any(dep == root_param or dep in after_root for dep in template_identifiers(templates[key])):
+                after_root.add(key)
+        if isinstance(exp_folder, Template):
+            cyclic = [dep for dep in template_identifiers(exp_folder) if dep in after_root or dep == root_param]
+            if cyclic:
+                raise RuntimeError(f'[TemplateError] exp_folder uses {cyclic}, which depend on the root folder {root_param}')
+        self.template_order = [key for key in order if key not in after_root]
+        self.root_template_order = [key for key in order if key in after_root]
+
+        """
+            For each template and for the root folder, a bit mask of the varying parameters it depends on (directly or through other
+            templates), bit i being the i-th parameter of `varying`. Consecutive grid points usually differ in a few parameters only (the
+            last ones of the cartesian product), so only the templates whose inputs changed are filled again. The extra bit `first` is set
+            in all masks and only in the changes of the first point, such that the templates using only static parameters are filled once.
+        """
+        bits = {key: 1 << i for i, key in enumerate(varying)}
+        first = 1 << len(varying)
+        self.inputs = {}
+
+        def inputs_of(template):
+            mask = first
+            for dep in template_identifiers(template):
+                mask |= bits.get(dep, 0) | self.inputs.get(dep, 0)
+            return mask
+
+        for key in self.template_order:
+            self.inputs[key] = inputs_of(templates[key])
+        self.inputs[root_param] = inputs_of(exp_folder) if isinstance(exp_folder, Template) else first
+        for key in self.root_template_order:
+            self.inputs[key] = inputs_of(templates[key])
+        self.before_root = [(key, templates[key], self.inputs[key]) for key in self.template_order]
+        self.after_root = [(key, templates[key], self.inputs[key]) for key in self.root_template_order]
+        self.previous = None # values of the previous grid point
+        self.varying = list(varying)
+        self.root_param = root_param
+        self.exp_folder = exp_folder
+        self.key_value_separator = key_value_separator
+
+        """
+            The command is a list of pieces: the arguments whose value is fixed for the whole sweep are formatted now and stored as strings,
+            the others are stored as (key, prefix) pairs and formatted for each grid point.
+        """
+        dynamic = set(self.varying) | set(templates.keys()) | {root_param}
+        self.pieces = []
+        for key, value in self.params.items():
+            if key in dynamic:
+                self.pieces.append((key, key_prefixes[key]))
+            else:
+                arg = self.format_arg(key_prefixes[key], value)
+                if arg is not None:
+                    self.pieces.append(arg)
+
+    def format_arg(self, prefix, value):
+        """
+            Formats one argument as "--key value" or "--key=value". Booleans are flags: True gives "--key" and False skips the argument.
+        """
+        if isinstance(value, bool):
+            return prefix if value else None
+        if isinstance(value, Template):
+            value = fill(value, self.params)
+        return f'{prefix}{self.key_value_separator}{value}'
+
+    def __call__(self, values):
+        """
+            Builds the command for one grid point.
+            :param values: sequence with the values of the varying parameters, in the order given by `varying`
+            :return: a tuple (cmd, root_folder, cmd_dict), where cmd_dict has the same format as GridSearcher.__dict__ (keys prefixed by
+            an underscore), to be written to arguments.txt
+        """
+        params = self.params
+        for key, value in zip(self.varying, values):
+            if value is not None:
+                params[key] = ' '.join(map(str, value)) if isinstance(value, list) else value
+
+        if self.previous is None:
+            changed = -1 # first point, all templates are filled
+        else:
+            changed = 0
+            for i, (old, new) in enumerate(zip(self.previous, values)):
+                if old != new:
+                    changed |= 1 << i
+        self.previous = values
+
+        for key, template, inputs in self.before_root:
+            if inputs & changed:
+                params[key] = fill(template, params)
+
+        if self.inputs[self.root_param] & changed:
+            params[self.root_param] = fill(self.exp_folder, params) if isinstance(self.exp_folder, Template) else self.exp_folder
+        root_folder = params[self.root_param]
+        for key, template, inputs in self.after_root:
+            if inputs & changed:
+                params[key] = fill(template, params)
+
+        args = []
+        for piece in self.pieces:
+            if isinstance(piece, str):
+                args.append(piece)
+            else:
+                arg = self.format_arg(piece[1], params[piece[0]])
+                if arg is not None:
+                    args.append(arg)
+        cmd = f'{self.script} {" ".join(args)}'
+        return cmd, root_folder, {f'_{k}': v for k, v in params.items()}
@@ -0,0 +1,227 @@
+import json
+import time
+import subprocess
+
+class DeviceProbe:
+    """
+        Interface for reading the memory of the GPUs. Subclasses implement `memory` and optionally `utilization` and `process_memory`,
+        which are only used by the telemetry.
+    """
+    def memory(self):
+        """
+            :return: dictionary where key=gpu id and value=tuple (free_mb, total_mb)
+        """
+        raise NotImplementedError()
+
+    def utilization(self):
+        """
+            :return: dictionary where key=gpu id and value=utilization in percent, empty if not supported
+        """
+        return {}
+
+    def process_memory(self):
+        """
+            :return: dictionary where key=pid and value=GPU memory used by the process in MB (summed over GPUs), empty if not supported
+        """
+        return {}
+
+class NvidiaSmiProbe(DeviceProbe):
+    def __init__(self):
+        """
+            Reads the GPU memory through NVML if the package `pynvml` is installed, otherwise by calling `nvidia-smi`.
+        """
+        try:
+            import pynvml
+            pynvml.nvmlInit()
+            self.nvml = pynvml
+        except Exception: # ImportError or NVMLError
+            self.nvml = None
+
+    def memory(self):
+        if self.nvml is not None:
+            result = {}
+            for i in range(self.nvml.nvmlDeviceGetCount()):
+                info = self.nvml.nvmlDeviceGetMemoryInfo(self.nvml.nvmlDeviceGetHandleByIndex(i))
+                result[i] = (info.free / 2**20, info.total / 2**20)
+            return result
+
+        output = subprocess.check_output(
+            ['nvidia-smi', '--query-gpu=index,memory.free,memory.total', '--format=csv,noheader,nounits'], text=True)
+        result = {}
+        for line in output.strip().splitlines():
+            index, free, total = [x.strip() for x in line.split(',')]
+            result[int(index)] = (float(free), float(total))
+        return result
+
+    def utilization(self):
+        if self.nvml is not None:
+            return {i: float(self.nvml.nvmlDeviceGetUtilizationRates(self.nvml.nvmlDeviceGetHandleByIndex(i)).gpu)
+                    for i in range(self.nvml.nvmlDeviceGetCount())}
+
+        output = subprocess.check_output(['nvidia-smi', '--query-gpu=index,utilization.gpu', '--format=csv,noheader,nounits'], text=True)
+        result = {}
+        for line in output.strip().splitlines():
+            index, util = [x.strip() for x in line.split(',')]
+            result[int(index)] = float(util)
+        return result
+
+    def process_memory(self):
+        result = {}
+        if self.nvml is not None:
+            for i in range(self.nvml.nvmlDeviceGetCount()):
+                for proc in self.nvml.nvmlDeviceGetComputeRunningProcesses(self.nvml.nvmlDeviceGetHandleByIndex(i)):
+                    if proc.usedGpuMemory is not None: # None when the driver does not report it
+                        result[proc.pid] = result.get(proc.pid, 0) + proc.usedGpuMemory / 2**20
+            return result
+
+        output = subprocess.check_output(
+            ['nvidia-smi', '--query-compute-apps=pid,used_memory', '--format=csv,noheader,nounits'], text=True)
+        for line in output.strip().splitlines():
+            pid, used = [x.strip() for x in line.split(',')]
+            if used.replace('.', '').isdigit():
+                result[int(pid)] = result.get(int(pid), 0) + float(used)
+        return result
+
+class FileProbe(DeviceProbe):
+    def __init__(self, path):
+        """
+            Fake probe reading the GPU memory from a JSON file, e.g. {"0": {"free": 10000, "total": 16000}, "1": ...} (values in MB).
+            The key "util" of a GPU optionally gives its utilization in percent.
+            It is meant for tests and simulations on machines without GPUs: the file can be rewritten while the sweep runs.
+        """
+        self.path = path
+
+    def _read(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        return {int(gpu) if gpu.isdigit() else gpu: info for gpu, info in data.items()}
+
+    def memory(self):
+        return {gpu: (float(info['free']), float(info['total'])) for gpu, info in self._read().items()}
+
+    def utilization(self):
+        return {gpu: float(info['util']) for gpu, info in self._read().items() if 'util' in info}
+
+class MemoryPlacement:
+    def __init__(self, probe, footprint=None, reserve_mb=1024, settle_timeout=120, poll_interval=1.0):
+        """
+            Placement policy that packs jobs on GPUs by memory footprint instead of a fixed number of jobs per GPU.
+            - a job is placed on the GPU with the least free memory that still fits its footprint (best fit), so that small jobs share
+            cards and the emptier cards stay available for large jobs
+            - after a job is placed on a GPU, that GPU does not accept another job until the memory of the first one was actually allocated
+            (its free memory dropped by ~90% of the footprint or stopped changing) or `settle_timeout` seconds passed
+            - if the footprint is unknown, it is learned from the memory allocated by the previous jobs of the sweep; until then, a job is
+            only placed on a GPU without jobs
+            :param probe: DeviceProbe
+            :param footprint: memory of a job in MB: a number, a callable receiving the job and returning a number, or None to learn it
+            :param reserve_mb: memory kept free on each GPU
+            :param settle_timeout: maximum number of seconds to wait for a job to allocate its memory
+            :param poll_interval: minimum number of seconds between two readings of the probe, see `refresh`
+        """
+        self.probe = probe
+        self.footprint = footprint
+        self.reserve_mb = reserve_mb
+        self.settle_timeout = settle_timeout
+        self.poll_interval = poll_interval
+        self.gpus = [] # GPU ids of the scheduler, see `check`
+        self.learned_mb = None # exponential moving average of the memory allocated by the jobs of this sweep
+        self.settling = {} # key=gpu id and value=[job, free memory before its launch, footprint, deadline, previous used reading]
+        self.reading = {}
+        self.read_at = None # time.monotonic() of the latest reading
+        self.readings = 0 # number of readings, the settling jobs are only updated with a new reading
+        self.updated = 0 # value of `readings` at the latest update of the settling jobs
+
+    def demand(self, job):
+        """
+            Returns the memory in MB the job is expected to use, or None if it is not known yet.
+        """
+        if callable(self.footprint):
+            return self.footprint(job)
+        if self.footprint is not None:
+            return self.footprint
+        return self.learned_mb
+
+    def refresh(self):
+        """
+            Reads the probe if the latest reading is older than `poll_interval` seconds. Reading the probe can take tens of milliseconds
+            (nvidia-smi), so the scheduler calls it without holding its lock and `choose` uses the latest reading.
+        """
+        now = time.monotonic()
+        if self.read_at is None or now - self.read_at >= self.poll_interval:
+            reading = self.probe.memory()
+            missing = [gpu for gpu in self.gpus if gpu not in reading]
+            if missing:
+                raise ValueError(f'The GPUs {missing} of the sweep are not reported by {type(self.probe).__name__}, which reads the GPUs '
+                                 f'{list(reading.keys())}')
+            self.reading = reading
+            self.read_at = now
+            self.readings += 1
+
+    def check(self, gpus):
+        """
+            Reads the probe and raises ValueError if one of `gpus` is missing from its output, e.g. a GPU id that does not exist or a
+            string id while the probe reports integers. Called by the scheduler when it is created, the later readings are checked too.
+            :param gpus: list of GPU ids the jobs can be placed on
+        """
+        self.gpus = list(gpus)
+        self.read_at = None
+        self.refresh()
+
+    def choose(self, counts, job, dist_train, max_jobs):
+        """
+            Returns the list of GPUs where `job` should run or an empty list if it does not fit anywhere with the latest reading.
+            :param counts: dictionary where key=gpu id and value=number of jobs running on that GPU
+            :param job: the job to place
+            :param dist_train: if True, the job needs all GPUs
+            :param max_jobs: upper bound for the number of jobs on one GPU
+        """
+        if self.updated != self.readings:
+            self._update_settling()
+            self.updated = self.readings
+        demand = self.demand(job)
+
+        candidates = [] # tuples (free memory, gpu id)
+        for gpu, count in counts.items():
+            if count >= max_jobs or gpu in self.settling:
+                continue
+            free = self.reading[gpu][0] - self.reserve_mb
+            if (demand is None and count == 0) or (demand is not None and free >= demand):
+                candidates.append((free, gpu))
+
+        if dist_train:
+            return list(counts.keys()) if len(candidates) == len(counts) else []
+        if len(candidates) == 0:
+            return []
+        return [min(candidates, key=lambda c: c[0])[1]]
+
+    def started(self, gpus, job):
+        """
+            Called by the scheduler when `job` was placed on `gpus`.
+        """
+        deadline = time.monotonic() + self.settle_timeout
+        for gpu in gpus:
+            self.settling[gpu] = [job, self.reading[gpu][0], self.demand(job), deadline, None]
+
+    def ended(self, gpus, job=None):
+        """
+            Called by the scheduler when `job`, placed on `gpus`, ended. The GPUs stop waiting for its memory if it did not settle yet,
+            a job that already settled does not affect the job settling after it on the same GPU.
+        """
+        for gpu in gpus:
+            if gpu in self.settling and self.settling[gpu][0] is job:
+                del self.settling[gpu]
+
+    def _update_settling(self):
+        now = time.monotonic()
+        for gpu, (_, baseline, demand, deadline, previous) in list(self.settling.items()):
+            used = baseline - self.reading[gpu][0]
+            if demand is not None:
+                settled = used >= 0.9 * demand
+            else: # unknown footprint: the job allocated something and the reading did not change since the previous probe
+                settled = used > 0 and previous is not None and abs(used - previous) <= 0.01 * used
+            if settled or now >= deadline:
+                del self.settling[gpu]
+                if used > 0:
+                    self.learned_mb = used if self.learned_mb is None else 0.8 * self.learned_mb + 0.2 * used
+            else:
+                self.settling[gpu][4] = used
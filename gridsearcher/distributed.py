@@ -0,0 +1,329 @@
+"""
+    Multi-node execution: the Coordinator (started by GridSearcher.run when scheduling contains the key `coordinator`) owns the grid and
+    one WorkerAgent per node pulls jobs from it over TCP as soon as one of its GPU slots is free.
+    The protocol is one JSON object per line, each request of an agent being followed by one reply of the coordinator:
+        {"op": "hello", "agent": name}                                          -> {"ok": true}
+        {"op": "get", "agent": name}                                            -> {"job": [job_id, params], "lease": n} or
+                                                                                   {"job": null, "done": bool}
+        {"op": "start", "agent": name, "job_id": id, "lease": n, "gpus": [...]} -> {"ok": bool}, false if the job was given to another
+                                                                                   agent
+        {"op": "done", "agent": name, "job_id": id, "lease": n, "exit_code": c} -> {"ok": bool}, false if the lease expired
+        {"op": "heartbeat", "agent": name}                                      -> {"ok": true}
+    Each time a job is handed out, it receives a new lease number and only the agent holding the current lease can start the job and
+    report its end. The report of an agent whose lease expired (the job was given to another agent in the meantime) is rejected, such
+    that each job is recorded once.
+"""
+import os
+import json
+import time
+import socket
+import ipaddress
+import itertools
+import threading
+import traceback
+import socketserver
+from collections import deque
+from .scheduler import GPUScheduler
+from .process import ProcessSupervisor
+from .tools import launch_worker
+
+def send(sock_file, data):
+    sock_file.write((json.dumps(data, default=str) + '\n').encode())
+    sock_file.flush()
+
+def receive(sock_file):
+    line = sock_file.readline()
+    if not line:
+        raise ConnectionError('connection closed')
+    return json.loads(line)
+
+def is_loopback(host):
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+class Coordinator:
+    def __init__(self, jobs, host='127.0.0.1', port=5555, lease_timeout=60, allow_remote=False, on_start=None, on_exit=None):
+        """
+            Owns the jobs of a sweep and hands them out to the WorkerAgents.
+            - agents pull jobs when they have a free GPU slot, so faster nodes get more jobs
+            - an agent that asks for a job when there are no jobs left can steal a job that another agent fetched but did not start yet
+            - the jobs of an agent that disconnected or did not send a heartbeat for `lease_timeout` seconds are given to other agents
+            - once all jobs ended, the agents are told so when they ask for a job and the coordinator waits up to `lease_timeout` seconds
+            for them to disconnect before closing the remaining connections
+            :param jobs: iterable of tuples (job_id, params), consumed lazily
+            :param host: address to listen on, a loopback address unless `allow_remote` is True
+            :param port: TCP port to listen on
+            :param lease_timeout: number of seconds without heartbeat after which an agent is considered dead
+            :param allow_remote: must be True to listen on a non-loopback address (e.g. 0.0.0.0 for the agents of other nodes). The
+            protocol has no authentication: anyone reaching the port can read the commands of the jobs and report results
+            :param on_start: optional callable(job_id, gpus) called when a job starts on an agent
+            :param on_exit: optional callable(job_id, exit_code) called when a job ends on an agent
+        """
+        assert allow_remote or is_loopback(host), \
+            f'The coordinator would accept agents from the network on {host}, set allow_remote=True to serve the jobs to other nodes'
+        self.jobs = iter(jobs)
+        self.host = host
+        self.port = port
+        self.lease_timeout = lease_timeout
+        self.on_start = on_start
+        self.on_exit = on_exit
+        self.pending = deque() # jobs given back by dead agents or stolen, served before the next jobs of the grid
+        self.assignments = {} # key=job_id and value=dictionary with keys job, agent, lease and started
+        self.leases = itertools.count(1)
+        self.last_seen = {} # key=agent name and value=time.monotonic() of its last message
+        self.exhausted = False
+        self.lock = threading.Lock()
+        self.all_done = threading.Event()
+        self.connections = set() # sockets of the connected agents
+        self.disconnected = threading.Condition(self.lock)
+        self.server = None
+
+    def serve(self):
+        """
+            Serves the jobs until all of them ended, then returns.
+        """
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                agent = None
+                with coordinator.lock:
+                    coordinator.connections.add(self.connection)
+                try:
+                    while True:
+                        msg = receive(self.rfile)
+                        agent = msg.get('agent', agent)
+                        send(self.wfile, coordinator.handle(msg))
+                except (ConnectionError, OSError, ValueError):
+                    pass
+                if agent is not None:
+                    coordinator.agent_lost(agent)
+                with coordinator.lock:
+                    coordinator.connections.discard(self.connection)
+                    coordinator.disconnected.notify_all()
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self.server = Server((self.host, self.port), Handler)
+        self.port = self.server.server_address[1] # the actual port if port=0 was given
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._reap_agents, daemon=True).start()
+        print(f'GridSearcher coordinator listening on {self.host}:{self.port}')
+        self._check_done()
+        self.all_done.wait()
+        with self.lock: # the agents waiting for a job learn that the sweep ended at their next request
+            self.disconnected.wait_for(lambda: not self.connections, timeout=self.lease_timeout)
+            for connection in self.connections: # agents that did not ask in time see a closed connection
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, msg):
+        op, agent = msg['op'], msg.get('agent')
+        with self.lock:
+            self.last_seen[agent] = time.monotonic()
+
+            if op == 'get':
+                job = self._next_job(agent)
+                if job is None:
+                    return dict(job=None, done=self.all_done.is_set())
+                lease = next(self.leases)
+                self.assignments[job[0]] = dict(job=job, agent=agent, lease=lease, started=False)
+                return dict(job=job, lease=lease)
+
+            assignment = self.assignments.get(msg.get('job_id'))
+            if op in ['start', 'done'] and (assignment is None or assignment['lease'] != msg['lease']):
+                return dict(ok=False) # the job was stolen, or reassigned after its lease expired
+
+            if op == 'start':
+                assignment['started'] = True
+                if self.on_start is not None:
+                    self.on_start(msg['job_id'], [f'{agent}/{gpu}' for gpu in msg['gpus']])
+                return dict(ok=True)
+
+            if op == 'done':
+                del self.assignments[msg['job_id']]
+                if self.on_exit is not None:
+                    self.on_exit(msg['job_id'], msg['exit_code'])
+                self._check_done()
+                return dict(ok=True)
+
+            return dict(ok=True) # hello and heartbeat
+
+    def _next_job(self, agent):
+        """
+            Returns the next job for `agent`: a job given back by another agent, the next job of the grid or a job stolen from an agent
+            that did not start it yet. Must be called with `self.lock` held.
+        """
+        if self.pending:
+            return self.pending.popleft()
+        if not self.exhausted:
+            try:
+                return next(self.jobs)
+            except StopIteration:
+                self.exhausted = True
+        for job_id, assignment in self.assignments.items():
+            if not assignment['started'] and assignment['agent'] != agent:
+                del self.assignments[job_id] # the owner will get ok=False when it tries to start it
+                return assignment['job']
+        return None
+
+    def agent_lost(self, agent):
+        """
+            Gives the jobs of a dead or disconnected agent to the other agents.
+        """
+        with self.lock:
+            self.last_seen.pop(agent, None)
+            for job_id, assignment in list(self.assignments.items()):
+                if assignment['agent'] == agent:
+                    del self.assignments[job_id]
+                    self.pending.append(assignment['job'])
+                    print(f'Agent {agent} was lost, job {job_id} will be given to another agent')
+
+    def _reap_agents(self):
+        while not self.all_done.is_set():
+            time.sleep(1)
+            now = time.monotonic()
+            with self.lock:
+                dead = [agent for agent, seen in self.last_seen.items() if now - seen > self.lease_timeout]
+            for agent in dead:
+                self.agent_lost(agent)
+
+    def _check_done(self):
+        """
+            Sets `all_done` if all jobs ended. Must be called with `self.lock` held (or before the server starts).
+        """
+        if not self.exhausted and not self.pending:
+            try:
+                self.pending.append(next(self.jobs))
+            except StopIteration:
+                self.exhausted = True
+        if self.exhausted and not self.pending and not self.assignments:
+            self.all_done.set()
+
+class WorkerAgent:
+    def __init__(self, host, port, gpus, max_jobs_per_gpu=1, distributed_training=False, warmup_seconds=5, prefetch=1,
+                 heartbeat_interval=5, poll_interval=1, name=None):
+        """
+            Runs on one node and executes the jobs of a Coordinator on the local GPUs, using the same GPUScheduler and ProcessSupervisor as
+            GridSearcher.run.
+            :param host: address of the coordinator
+            :param port: port of the coordinator
+            :param gpus: list of local GPU ids
+            :param max_jobs_per_gpu: how many jobs can share one GPU
+            :param distributed_training: if True, each job uses all local GPUs
+            :param warmup_seconds: see GPUScheduler
+            :param prefetch: how many jobs to fetch in advance to hide the network latency (they can be stolen by idle agents)
+            :param heartbeat_interval: number of seconds between two heartbeats
+            :param poll_interval: number of seconds to wait before asking again when the coordinator has no job available
+            :param name: name of the agent, defaults to hostname:pid
+        """
+        self.host = host
+        self.port = port
+        self.scheduler = GPUScheduler(gpus, max_jobs_per_gpu, distributed_training, warmup_seconds)
+        self.prefetch = prefetch
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.local = deque() # tuples (job, lease) fetched that did not start yet
+        self.lock = threading.Lock()
+        self.sock_file = None
+
+    def request(self, op, **kwargs):
+        with self.lock: # one request and its reply at a time, shared by the main, heartbeat and supervisor threads
+            send(self.sock_file, dict(op=op, agent=self.name, **kwargs))
+            return receive(self.sock_file)
+
+    def run(self):
+        """
+            Pulls and runs jobs until the coordinator says all jobs ended.
+        """
+        sock = socket.create_connection((self.host, self.port))
+        self.sock_file = sock.makefile('rwb')
+        self.request('hello')
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(stop,), daemon=True).start()
+        supervisor = ProcessSupervisor()
+
+        try:
+            while True:
+                gpus, delay = self.scheduler.acquire()
+                job, lease = self._take()
+                if job is None:
+                    self.scheduler.release(gpus)
+                    break
+                job_id, params = job
+                if not self.request('start', job_id=job_id, lease=lease, gpus=gpus)['ok']: # stolen by another agent
+                    self.scheduler.release(gpus)
+                    continue
+                if delay > 0:
+                    threading.Timer(delay, self._launch, args=(job_id, lease, params, gpus, supervisor)).start()
+                else:
+                    self._launch(job_id, lease, params, gpus, supervisor)
+            self.scheduler.wait_all()
+        finally:
+            stop.set()
+            supervisor.close()
+            try:
+                self.sock_file.close() # the socket is only closed once its file is closed too
+            except OSError: # the coordinator closed the connection
+                pass
+            sock.close()
+
+    def _take(self):
+        """
+            Returns the next job to run and its lease, or (None, None) if there are no jobs left.
+        """
+        while not self.local:
+            try:
+                reply = self.request('get')
+            except (ConnectionError, OSError): # the coordinator stopped after the end of the sweep or died
+                print(f'Agent {self.name} lost the connection to the coordinator, stopping')
+                return None, None
+            if reply['job'] is not None:
+                self.local.append((reply['job'], reply['lease']))
+            elif reply['done']:
+                return None, None
+            else:
+                time.sleep(self.poll_interval)
+
+        job = self.local.popleft()
+        while len(self.local) < self.prefetch:
+            try:
+                reply = self.request('get')
+            except (ConnectionError, OSError):
+                break
+            if reply['job'] is None:
+                break
+            self.local.append((reply['job'], reply['lease']))
+        return job
+
+    def _launch(self, job_id, lease, params, gpus, supervisor):
+        def on_exit(exit_code):
+            try:
+                if not self.request('done', job_id=job_id, lease=lease, exit_code=exit_code)['ok']:
+                    print(f'The lease of job {job_id} expired, it was given to another agent and this result is discarded')
+            except (ConnectionError, OSError):
+                print(f'The coordinator is not reachable, the result of job {job_id} is discarded')
+            finally:
+                self.scheduler.release(gpus)
+
+        try:
+            launch_worker(tuple(params), gpus, supervisor, on_exit)
+        except Exception:
+            traceback.print_exc()
+            on_exit(None)
+
+    def _heartbeat(self, stop):
+        while not stop.wait(self.heartbeat_interval):
+            try:
+                self.request('heartbeat')
+            except (ConnectionError, OSError):
+                return
@@ -0,0 +1,165 @@
+import os
+import time
+import heapq
+import threading
+from collections import deque
+
+OOM = 'oom'
+CUDA = 'cuda'
+SIGNAL = 'signal'
+ERROR = 'error'
+
+"""
+    Patterns searched in the end of the output of a failed job, in this order: an out of memory error is often reported as a CUDA error.
+"""
+FAILURE_PATTERNS = [
+    (OOM, [b'CUDA out of memory', b'OutOfMemoryError', b'CUBLAS_STATUS_ALLOC_FAILED', b'CUDNN_STATUS_ALLOC_FAILED',
+           b'CUDA error: out of memory']),
+    (CUDA, [b'CUDA error', b'cudaError', b'ECC error', b'uncorrectable ECC', b'illegal memory access', b'unspecified launch failure',
+            b'NCCL error', b'GPU is lost', b'CUDA driver']),
+]
+
+def classify_failure(exit_code, log_path, offset=0, tail_bytes=64 * 2**10):
+    """
+        Returns the kind of failure of a job from its exit code and the end of its log: OOM, CUDA, SIGNAL (killed by a signal, e.g. by the
+        OOM killer of the host) or ERROR (any other non-zero exit code, e.g. an exception in the script). Returns None if the job succeeded.
+        :param exit_code: exit code of the job, negative if it was killed by a signal, None if it could not be started
+        :param log_path: path of the file containing the stdout and stderr of the job
+        :param offset: size of the log when the job started, the log is appended by each attempt of a job
+        :param tail_bytes: how many bytes at the end of the log are searched
+    """
+    if exit_code == 0:
+        return None
+    tail = b''
+    if os.path.isfile(log_path):
+        size = os.path.getsize(log_path)
+        if offset > size: # the log was rotated while the job was running
+            offset = 0
+        with open(log_path, 'rb') as f:
+            f.seek(max(offset, size - tail_bytes))
+            tail = f.read()
+    for kind, patterns in FAILURE_PATTERNS:
+        if any(pattern in tail for pattern in patterns):
+            return kind
+    if exit_code is not None and (exit_code < 0 or exit_code in [128 + 9, 128 + 15]): # Popen reports signals as negative exit codes
+        return SIGNAL
+    return ERROR
+
+class RetryQueue:
+    def __init__(self, jobs, max_retries, backoff_seconds=30, retry_on=(OOM, CUDA, SIGNAL), on_retry=None):
+        """
+            Iterable over `jobs` that gives back the failed jobs after an exponential backoff: the n-th retry of a job waits
+            backoff_seconds * 2^(n-1) seconds after its failure. The retries are dispatched before the next jobs of `jobs`.
+            When `jobs` is exhausted, the iteration blocks until all jobs ended, since each of them can still be retried.
+            :param jobs: iterable of tuples (job_id, params)
+            :param max_retries: maximum number of retries of one job
+            :param backoff_seconds: waiting time before the first retry
+            :param retry_on: kinds of failures that are retried (see classify_failure)
+            :param on_retry: optional callable(job_id, failure, attempt, delay) called when a failed job is scheduled to run again
+        """
+        self.jobs = iter(jobs)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.retry_on = retry_on
+        self.on_retry = on_retry
+        self.running = {} # key=job_id and value=job, for the jobs that were yielded and did not end yet
+        self.retries = {} # key=job_id and value=number of retries
+        self.due = [] # heap of tuples (time.monotonic() when the retry is due, job_id, job)
+        self.exhausted = False
+        self.cond = threading.Condition()
+
+    def __iter__(self):
+        while True:
+            with self.cond:
+                job = self._next_retry()
+            if job is None and not self.exhausted:
+                job = next(self.jobs, None)
+                if job is None:
+                    self.exhausted = True
+            if job is None:
+                with self.cond:
+                    job = self._wait_retry()
+            if job is None:
+                return
+            with self.cond:
+                self.running[job[0]] = job
+            yield job
+
+    def _next_retry(self):
+        """
+            Returns a retry that is due or None. Must be called with `self.cond` held.
+        """
+        if self.due and self.due[0][0] <= time.monotonic():
+            return heapq.heappop(self.due)[2]
+        return None
+
+    def _wait_retry(self):
+        """
+            Blocks until a retry is due or all jobs ended. Must be called with `self.cond` held.
+        """
+        while True:
+            job = self._next_retry()
+            if job is not None:
+                return job
+            if not self.due and not self.running:
+                return None
+            self.cond.wait(None if not self.due else max(0, self.due[0][0] - time.monotonic()))
+
+    def ended(self, job_id, failure):
+        """
+            Records the end of a job. Returns True if the job will be retried.
+            :param job_id: id of the job
+            :param failure: kind of failure returned by classify_failure, None if the job succeeded
+        """
+        with self.cond:
+            job = self.running.pop(job_id, None)
+            retried = False
+            if job is not None and failure in self.retry_on and self.retries.get(job_id, 0) < self.max_retries:
+                self.retries[job_id] = self.retries.get(job_id, 0) + 1
+                delay = self.backoff_seconds * 2 ** (self.retries[job_id] - 1)
+                heapq.heappush(self.due, (time.monotonic() + delay, job_id, job))
+                print(f'Job {job_id} failed ({failure}), retry {self.retries[job_id]}/{self.max_retries} in {delay:g} seconds')
+                if self.on_retry is not None:
+                    self.on_retry(job_id, failure, self.retries[job_id], delay)
+                retried = True
+            self.cond.notify_all()
+            return retried
+
+class GPUQuarantine:
+    def __init__(self, scheduler, max_failures, window_seconds=600, kinds=(CUDA,), on_quarantine=None):
+        """
+            Removes a GPU from the scheduler when `max_failures` jobs failed on it in the last `window_seconds` seconds.
+            Only the failures of the given kinds are counted: out of memory errors are not counted by default, since a job that does not
+            fit would fail on any GPU.
+            :param scheduler: GPUScheduler
+            :param max_failures: number of failures that puts a GPU in quarantine
+            :param window_seconds: length of the sliding window
+            :param kinds: kinds of failures that are attributed to the GPU (see classify_failure)
+            :param on_quarantine: optional callable(gpu, failure, n_failures) called when a GPU is quarantined
+        """
+        self.scheduler = scheduler
+        self.max_failures = max_failures
+        self.window_seconds = window_seconds
+        self.kinds = kinds
+        self.on_quarantine = on_quarantine
+        self.failures = {} # key=gpu id and value=deque of time.monotonic() of the failures
+        self.lock = threading.Lock()
+
+    def failed(self, gpus, failure):
+        """
+            Records that a job running on `gpus` ended with the given kind of failure (None if it succeeded).
+        """
+        if failure not in self.kinds:
+            return
+        now = time.monotonic()
+        with self.lock:
+            for gpu in gpus:
+                times = self.failures.setdefault(gpu, deque())
+                times.append(now)
+                while times[0] < now - self.window_seconds:
+                    times.popleft()
+                if len(times) >= self.max_failures and gpu not in self.scheduler.quarantined:
+                    print(f'GPU {gpu} is quarantined after {len(times)} failures ({failure}) in {self.window_seconds} seconds')
+                    self.scheduler.quarantine(gpu)
+                    if self.on_quarantine is not None:
+                        self.on_quarantine(gpu, failure, len(times))
@@ -1,19 +1,134 @@
 import os
+import time
+import threading
 
-LOCK_FILE = 'locker.lock'
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
 
 # https://github.com/dmfrey/FileLock/blob/master/filelock/filelock.py
 # https://superfastpython.com/multiprocessing-pool-mutex-lock/
 
-def lock_acquire():
-    while True:
-        if not os.path.isfile(LOCK_FILE):
-            break
-    open(LOCK_FILE, 'w').close()
+class FileLock:
+    def __init__(self, path, timeout=None, stale_seconds=3600, poll_interval=0.001):
+        """
+            Cross-process lock backed by a file on disk.
+            On POSIX systems the lock is an `fcntl.flock` on `path`: the kernel releases it when the owner dies, so there are no stale
+            locks and waiting without a timeout does not use CPU. On other systems the lock file is created with O_CREAT | O_EXCL and
+            contains the PID of the owner. It is considered stale and removed if the owner is not alive anymore or if it is older than
+            `stale_seconds`.
+            :param path: path of the lock file, its parent folder is created if it does not exist
+            :param timeout: default number of seconds to wait in `acquire`, None waits forever
+            :param stale_seconds: age after which an O_EXCL lock file is considered stale (not used with flock)
+            :param poll_interval: initial sleep between two attempts when waiting with a timeout (doubled up to 0.05 seconds)
+        """
+        self.path = path
+        self.timeout = timeout
+        self.stale_seconds = stale_seconds
+        self.poll_interval = poll_interval
+        self.fd = None
+        self.thread_lock = threading.Lock() # the same FileLock object can be shared by the threads of a process
+
+    def acquire(self, timeout=-1):
+        """
+            Acquires the lock, waiting at most `timeout` seconds.
+            :param timeout: number of seconds to wait, None waits forever and -1 uses the timeout given in the constructor
+            :return: True if the lock was acquired, raises TimeoutError otherwise
+        """
+        if timeout == -1:
+            timeout = self.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        if not self.thread_lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise TimeoutError(f'Could not acquire the lock {self.path} in {timeout} seconds')
+
+        try:
+            parent = os.path.dirname(self.path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            sleep = self.poll_interval
+            while not self._try_acquire(blocking=deadline is None):
+                if deadline is not None and time.monotonic() + sleep > deadline:
+                    raise TimeoutError(f'Could not acquire the lock {self.path} in {timeout} seconds')
+                time.sleep(sleep)
+                sleep = min(2 * sleep, 0.05)
+        except BaseException:
+            self.thread_lock.release()
+            raise
+        return True
+
+    def release(self):
+        """
+            Releases the lock. Does nothing if the lock is not held.
+        """
+        if self.fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+        else:
+            os.close(self.fd)
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        self.fd = None
+        self.thread_lock.release()
+
+    def _try_acquire(self, blocking):
+        if fcntl is not None:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except (BlockingIOError, PermissionError):
+                os.close(fd)
+                return False
+            self.fd = fd
+            return True
 
-def lock_release():
-    if os.path.isfile(LOCK_FILE):
         try:
-            os.remove(LOCK_FILE)
-        except:
-            pass
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            self._remove_if_stale()
+            return False
+        os.write(fd, str(os.getpid()).encode())
+        self.fd = fd
+        return True
+
+    def _remove_if_stale(self):
+        """
+            Removes the O_EXCL lock file if its owner is dead or if it is older than `stale_seconds`.
+        """
+        try:
+            with open(self.path) as f:
+                pid = int(f.read().strip() or 0)
+            age = time.time() - os.path.getmtime(self.path)
+        except (OSError, ValueError):
+            return
+        if age > self.stale_seconds or (pid > 0 and not pid_alive(pid)):
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+def pid_alive(pid):
+    """
+        Checks whether a process with the given PID exists. On Windows, os.kill(pid, 0) would send CTRL_C_EVENT, so we assume it is alive.
+    """
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
@@ -1,8 +1,30 @@
-import multiprocessing as mp
+import asyncio
+import shutil
+from contextlib import ExitStack
 from string import Template
 from itertools import product
 from copy import deepcopy
 from .tools import *
+from .scheduler import GPUScheduler
+from .file_locker import FileLock
+from .command import CompiledCommand, template_identifiers
+from .resume import ResumeIndex
+from .process import ProcessSupervisor
+from .async_backend import run_jobs
+from .devices import MemoryPlacement, NvidiaSmiProbe
+from .ledger import SweepLedger, SUCCEEDED, FAILED
+from .distributed import Coordinator
+from .ordering import CostModel, OrderedJobs
+from .halving import SuccessiveHalving
+from .sampling import Sampler
+from .failures import RetryQueue, GPUQuarantine
+from .telemetry import SweepMonitor
+from .progress import SweepProgress, TerminalPanel, StatusServer
+from .identity import GlobalIndex
+from .jobs import SweepJobs
+from .options import check_scheduling
+from .metadata import JobMetadata, SweepJournal
+from .broker import SlotBroker
 
 FW_DICT = {'.': 'DOT', '-': 'DASH'}
 BW_DICT = {v: k for k, v in FW_DICT.items()} # will contain { 'DOT': '.', 'DASH': '-' }
@@ -96,7 +118,8 @@ class GridSearcher:
             scheduling: dict,
             launch_blocking: bool = False,
             torchrun: bool = False,
-            debug: bool = False):
+            debug: bool = False,
+            backend: GSBackend = GSBackend.SUPERVISOR):
         """
             Runs the GridSearcher using the provided configuration.
             :param param_name_for_exp_root_folder: set this parameter to the name of the cmd argument for the output directory of your script.
@@ -104,196 +127,451 @@ class GridSearcher:
             will automatically be filled with the value of `exp_folder`, being equivalent to "--output_dir=exp_folder". Note that `exp_folder`
             parameter can be a template, which might make it easy for you to embed some hyper-parameters to this folder.
             :param exp_folder: absolute path of the root folder where you want your experiments to be
-            :param scheduling: a dictionary containing keys `gpus`, `max_jobs_per_gpu`, `params_values` and `distributed_training`
-                - `gpus` is a list containing IDs of GPUs you want to run your tasks on
-                - `distributed_training` a boolean indicating whether the experiment uses DataParallel or not. If set to True, then all GPUs
-                in the `gpus` list will be used for CUDA_VISIBLE_DEVICES. Otherwise, only one GPU id will be used for CUDA_VISIBLE_DEVICES.
-                - `max_jobs_per_gpu` specifies how many processes should run on each GPU at most (num_processes = len(gpus) * max_jobs_per_gpu)
-                - `param_values` a dictionary that contains values for your hyper-parameters parameters (the cartesian product will be computed)
+            :param scheduling: a dictionary containing the keys `gpus`, `max_jobs_per_gpu`, `params_values` and `distributed_training` and
+            the optional keys of the features of the launcher (sampling, ledger, retries, telemetry, progress, etc.), all documented in
+            options.SCHEDULING_KEYS
             :param launch_blocking: when set to True, the all programs will be run with the flag CUDA_LAUNCH_BLOCKING=1
             :param torchrun: whether to run with torchrun or not
             :param debug: print commands if True, run commands if False
+            :param backend: how the jobs are executed, both backends supervise all jobs from the launcher process:
+                - GSBackend.SUPERVISOR starts the jobs with subprocess.Popen and supervises them from one thread
+                - GSBackend.ASYNC starts the jobs with asyncio.create_subprocess_exec and awaits them in one event loop
+                - GSBackend.RESIDENT runs the jobs back-to-back in one long-lived python process per GPU slot, which imports the script
+                once and calls its function `resident_entry` (optional key of `scheduling`, default 'main') with sys.argv set to the
+                arguments of the job (see resident.ResidentPool). For short jobs whose time is dominated by the start-up of python and
+                CUDA. `resident_max_jobs` (optional, default 0 for never) replaces a worker by a fresh process after that many jobs
         """
-        assert 'gpus' in scheduling.keys(), 'scheduling requires `gpu` key'
-        assert 'params_values' in scheduling.keys(), 'scheduling requires `params_values` key'
-        assert 'max_jobs_per_gpu' in scheduling.keys(), 'scheduling requires `max_jobs_per_gpu` key'
-        assert 'distributed_training' in scheduling.keys(), 'scheduling requires `distributed_training` key'
-
-        # remove duplicate values to avoid wasting computations
-        for k in scheduling['params_values'].keys():
-            scheduling['params_values'][k] = list(set(scheduling['params_values'][k]))
-
-        n_gpus = len(scheduling['gpus'])
-        if scheduling['distributed_training']: # use all GPUs for a single run (distributed training)
-            n_workers = scheduling['max_jobs_per_gpu']
-        else: # use GPUs to run one experiment per GPU
-            n_workers = n_gpus * scheduling['max_jobs_per_gpu']
+        assert isinstance(backend, GSBackend), f'Variable backend must be of type {GSBackend}'
+        if backend == GSBackend.RESIDENT:
+            assert self.exe == GSExe.PYTHON.value and not torchrun, 'GSBackend.RESIDENT only runs python scripts without torchrun'
+        check_scheduling(scheduling)
+
+        params_values = scheduling['params_values']
+        halving = scheduling.get('halving', None)
+        if halving is not None:
+            budget_param = halving['budget_param']
+            assert budget_param not in params_values, f'The budget parameter {budget_param} cannot be in params_values'
+            assert forward_key_replace(budget_param) in template_identifiers(exp_folder), \
+                f'exp_folder must contain ${{{forward_key_replace(budget_param)}}} such that each budget has its own root folder'
+            # the budget is one more varying parameter, its value is set by SuccessiveHalving (the debug mode prints the first rung)
+            params_values = dict(params_values, **{budget_param: [halving['min_budget']]})
 
         self.exp_folder_template = deepcopy(exp_folder)
-        os.system('cls' if on_windows() else 'clear')
+        if not scheduling.get('progress', False):
+            os.system('cls' if on_windows() else 'clear')
         print(f'ExperimentBuilder PID: {os.getpid()}')
 
-        cmds = [] # will store all commands to be run (as strings)
-        cmds_dict = [] # will store dictionaries containing key:value pairs of hyper-parameters
-        root_folders = [] # each command will have a separate value for the output folder specified by param_name_for_exp_root_folder
+        """
+            The grid is generated lazily: each point of the cartesian product is turned into a command only when it is about to be printed
+            or dispatched, so the memory usage and the time to the first launch do not depend on the size of the grid.
+        """
+        points = self._search_space(scheduling)
+        if halving is not None:
+            points = (values + (halving['min_budget'],) for values in points)
+        grid = self._iter_grid(param_name_for_exp_root_folder, params_values, points)
 
-        params = list(scheduling['params_values'].keys()) # if we do grid search for lr and wd, then params will contain "lr" and "wd"
+        if debug: # only print commands to check for correctness, do not run anything
+            for index, (cmd, root, cmd_dict) in enumerate(grid):
+                print(f'command {index+1}: {self.exe}', cmd.replace('\\', '/'))
+            return
 
-        cart_prod = list(product(*list(scheduling['params_values'].values()))) # perform the cartesian product of all hyper-parameters
-        for i, values in enumerate(cart_prod):
-            # for each element of cartesian product (contained in `values`), we have to (follow the steps given by numbers):
+        """
+            We will write the file `state.finished` to the folder specified by param_name_for_exp_root_folder when the experiment ends.
+            If some experiments were already run and have a file state.finished, they will not be run again and the experiment will be
+            skipped.
+        """
+        total = sweep_size(scheduling)
+        print(f'Commands:\tTotal: {grid_size(scheduling["params_values"]) if total is None else total}')
+        pause_process(seconds=5, message=f'Waiting 5 seconds before running GridSearcher...')
 
-            # step 1: add the values for hyper-parameter optimization (HPO)to GridSearcher object
-            for k, v in zip(params, values):
-                self.add_param(k, v)
+        """
+            Only one launcher can run a sweep at a time, otherwise the jobs that are not finished yet would run twice.
+            The lock is released by the OS if the launcher dies.
+        """
+        sweep_lock = FileLock(sweep_file(self.script, exp_folder, 'lock'))
+        try:
+            sweep_lock.acquire(timeout=0)
+        except TimeoutError:
+            raise RuntimeError(f'Another GridSearcher process is already running this sweep (lock file {sweep_lock.path})')
+
+        telemetry = {}
+        with ExitStack() as stack: # the features are closed in the reverse order of their creation, even if the launcher fails
+            stack.callback(sweep_lock.release)
+            ledger = self._ledger(scheduling, exp_folder, stack)
+            monitor = self._monitor(scheduling)
+            if monitor is not None:
+                stack.callback(lambda: telemetry.update(self._stop_monitor(monitor, exp_folder)))
+            progress = self._progress(scheduling, total, stack)
+            metadata = self._metadata(scheduling, exp_folder, stack)
+            config_index = self._global_index(scheduling, stack)
+
+            cost_model = None
+            if scheduling.get('job_cost', None) == 'learned':
+                cost_model = CostModel(keys=[forward_key_replace(k) for k in scheduling['params_values'].keys()])
+                if ledger is not None: # the durations of the previous launches, read before the jobs are queued again
+                    cost_model.observe_ledger(ledger.select(SUCCEEDED))
+
+            jobs = SweepJobs(
+                script=self.script,
+                exe=self.exe, # python or composer
+                root_param=forward_key_replace(param_name_for_exp_root_folder),
+                job_options=(
+                    launch_blocking, # whether to run with CUDA_LAUNCH_BLOCKING=1 or not
+                    torchrun, # whether to run the scripts with torchrun or not
+                    scheduling.get('log_max_bytes', 50 * 2**20), # size of the log file of a job before rotating it
+                    scheduling.get('log_backups', 1)), # how many rotated log files to keep
+                is_done=self._is_done(scheduling, exp_folder, ledger, metadata),
+                ledger=ledger,
+                monitor=monitor,
+                progress=progress,
+                cost_model=cost_model,
+                config_index=config_index,
+                duplicates=scheduling.get('duplicates', 'link'),
+                backfill=not scheduling.get('retry_failed_only', False), # otherwise is_done is also True for jobs that never ran
+                classify=scheduling.get('max_retries', 0) > 0 or 'quarantine_failures' in scheduling)
 
-            # step 2: after filling in the values for HPO, go through all templated fields and fill them with the new values
-            for k, v in self.__dict__.items():
-                if k.startswith('template_'): # template parameters have "template_" prefix
-                    tmpl_filled = self._fill_template(v) # this returns string or the same template if there are no matching values
-                    self.__dict__[k.replace('template', '')] = tmpl_filled # only replace "template" prefix and keep "_" prefix
+            """
+                The adaptive searches choose the next job when a slot is free, using the metrics of the jobs that ended. Without them,
+                `job_cost` and `job_priority`, the jobs are dispatched lazily in the order of the cartesian product. Otherwise all runnable
+                jobs are generated first and dispatched by decreasing priority or estimated duration.
+            """
+            jobs.search = self._search(scheduling, ledger, jobs, param_name_for_exp_root_folder, params_values)
+            job_score = self._job_score(scheduling, cost_model)
+            if jobs.search is not None:
+                queue = (jobs.queue(job) for job in jobs.search)
+            elif job_score is not None:
+                queue = OrderedJobs(jobs.runnable(grid, metadata, scheduling.get('precreate_folders', 1024)), score=job_score, model=cost_model)
+            else:
+                queue = jobs.runnable(grid, metadata, scheduling.get('precreate_folders', 1024))
+            if scheduling.get('max_retries', 0) > 0: # the failed jobs are given back to the scheduler after a backoff
+                jobs.retries = RetryQueue(
+                    queue,
+                    max_retries=scheduling['max_retries'],
+                    backoff_seconds=scheduling.get('retry_backoff', 30),
+                    retry_on=scheduling.get('retry_on', ('oom', 'cuda', 'signal')),
+                    on_retry=jobs.retried)
+                queue = iter(jobs.retries)
+
+            if 'coordinator' in scheduling: # the worker agents pull the jobs and run them on the GPUs of their nodes
+                Coordinator(queue, on_start=jobs.started, on_exit=jobs.ended, **scheduling['coordinator']).serve()
+            else:
+                self._dispatch(queue, jobs, scheduling, backend, metadata, stack)
 
-            # step 3: if the cartesian product element `values` contains some values templated in param_name_for_exp_root_folder, fill them
-            root_folder = self._create_root_arg(
-                param_name_for_exp_root_folder,
-                self.exp_folder_template)
+        self._print_summary(jobs, config_index, telemetry, exp_folder, params_values, scheduling)
 
-            # create
-            p = {k: v for k, v in self.__dict__.items() if k.startswith('_')}
+    def _ledger(self, scheduling, exp_folder, stack):
+        """
+            Creates the SweepLedger recording the state, GPUs, timing and exit code of each job if `scheduling` contains `ledger`,
+            otherwise returns None.
+        """
+        if not scheduling.get('ledger', False):
+            return None
+        ledger = SweepLedger(sweep_file(self.script, exp_folder, 'ledger.sqlite')).start()
+        stack.callback(ledger.close)
+        return ledger
 
-            # step 4: add metadata
-            cmds.append(self._build_command()) # add the string commands
-            cmds_dict.append(p) # add current parameters from the GridSearch object's internal dictionary, as key:value dictionary
-            root_folders.append(root_folder) # add root folders (e.g., output_dir based on the example for param_name_for_exp_root_folder)
-        # end cartesian product loop
+    def _stop_monitor(self, monitor, exp_folder):
+        """
+            Stops the SweepMonitor and writes the summary and the timeline of the sweep, returns the summary.
+        """
+        monitor.stop()
+        return monitor.write(
+            summary_path=sweep_file(self.script, exp_folder, 'telemetry.json'),
+            trace_path=sweep_file(self.script, exp_folder, 'trace.json'))
 
-        if debug: # only print commands to check for correctness, do not run anything
-            for index, cmd in enumerate(cmds):
-                print(f'command {index+1}: {self.exe}', cmd.replace('\\', '/'))
-        else: # actually run the processes for hyper-parameter optimizations
-            manager = mp.Manager()
-            gpu_processes_count = manager.dict() # shared dict, where key=gpu_id and value=how many processes were run that GPU id
-            for gpu in scheduling['gpus']:
-                gpu_processes_count[gpu] = 0
+    def _progress(self, scheduling, total, stack):
+        """
+            Creates the SweepProgress fed by the launcher if `scheduling` contains `progress`, shown by a TerminalPanel and served over HTTP
+            by a StatusServer if `port` is given, otherwise returns None.
+        """
+        options = scheduling.get('progress', False)
+        if not options:
+            return None
+        options = {} if options is True else dict(options)
+        progress = SweepProgress(gpus=scheduling['gpus'], max_jobs_per_gpu=scheduling['max_jobs_per_gpu'], total=total)
+        if options.get('port', None) is not None:
+            stack.callback(StatusServer(progress, port=options['port']).start().stop)
+        if options.get('terminal', True):
+            panel = TerminalPanel(progress, interval=options.get('interval', 1), log_interval=options.get('log_interval', 60))
+            stack.callback(panel.start().stop) # gives sys.stdout back even if the launcher fails
+        return progress
+
+    def _metadata(self, scheduling, exp_folder, stack):
+        """
+            Creates the JobMetadata writing the arguments and the end of the jobs to the root folders and/or to the journal of the sweep.
+        """
+        journal = None
+        if scheduling.get('metadata_journal', False): # the metadata of all jobs is appended to one file of the sweep folder
+            journal = SweepJournal(sweep_file(self.script, exp_folder, 'metadata.jsonl')
+                                   if scheduling['metadata_journal'] is True else scheduling['metadata_journal'])
+        metadata = JobMetadata(
+            journal=journal,
+            per_job_files=scheduling.get('metadata_files', journal is None),
+            workers=scheduling.get('resume_workers', 16))
+        stack.callback(metadata.close)
+        return metadata
+
+    def _global_index(self, scheduling, stack):
+        """
+            Opens the GlobalIndex shared by all sweeps if `scheduling` contains `global_index`, otherwise returns None.
+        """
+        if not scheduling.get('global_index', False):
+            return None
+        config_index = GlobalIndex(None if scheduling['global_index'] is True else scheduling['global_index'])
+        stack.callback(config_index.close)
+        return config_index
 
-            """
-                We will write the file `state.finished` to the folder specified by param_name_for_exp_root_folder when the experiment ends.
-                If some experiments were already run and have a file state.finished, they will not be run again and the experiment will be 
-            skipped.
-            """
+    def _is_done(self, scheduling, exp_folder, ledger, metadata):
+        """
+            Returns the callable(job_id, root) telling whether a job finished in a previous launch: from the journal if it is the only
+            record of the finished jobs, otherwise from the root folders. A job recorded as succeeded in the ledger is also done, the
+            ledger does not replace the other records since the runs that finished before it was enabled are not in it. With
+            `retry_failed_only`, only the jobs recorded as failed in the ledger are not done.
+        """
+        if scheduling.get('retry_failed_only', False): # only run the jobs that failed in the previous launches
+            failed = ledger.job_ids(FAILED)
+            return lambda job_id, root: job_id not in failed
+        if not metadata.per_job_files: # the journal is the only record of the finished jobs, no need to walk the sweep folder
+            # except at the first launch with the journal, to add the runs that finished before to it
+            finished = metadata.journal.finished_roots(seed=lambda: self._resume_index(scheduling, exp_folder).finished)
+            is_finished = lambda root: os.path.normpath(root) in finished
+        else:
+            is_finished = self._resume_index(scheduling, exp_folder).is_finished
+        if ledger is not None:
+            succeeded = ledger.job_ids(SUCCEEDED)
+            return lambda job_id, root: job_id in succeeded or is_finished(root)
+        return lambda job_id, root: is_finished(root)
+
+    def _resume_index(self, scheduling, exp_folder):
+        """
+            Returns the ResumeIndex of the runs that have the file state.finished. The finished runs are found with one parallel walk of
+            the sweep folder instead of one stat per grid point. The result can be persisted in a manifest, such that the next launch only
+            re-lists the folders that changed since the previous scan.
+        """
+        return ResumeIndex(
+            folder=sweep_folder(exp_folder),
+            depth=sweep_depth(exp_folder),
+            manifest=sweep_file(self.script, exp_folder, 'resume.json') if scheduling.get('resume_manifest', False) else None,
+            workers=scheduling.get('resume_workers', 16)).scan()
 
-            cmds_total = 0 # how many program instances (commands to run) were generated by the cartesian product of hyper-parameters grid
-            cmds_runnable = 0 # some runs might have already been run
-
-            params_list = [] # will hold the parameters to be send to the MultiProcessing worker to run experiments
-            for cmd, root, cmd_dict in zip(cmds, root_folders, cmds_dict):
-                cmds_total += 1
-                if os.path.isfile(os.path.join(root, 'state.finished')):
-                    continue
-                cmds_runnable += 1
-                params_list.append([cmd, root, cmd_dict])
-
-            console_info = f'Commands:\tRunnable: {cmds_runnable}\tFinished: {cmds_total - cmds_runnable}\tTotal: {cmds_total}'
-            print(console_info)
-
-            pause_process(seconds=5, message=f'Waiting 5 seconds before running GridSearcher...')
-
-            if cmds_runnable > 0:
-                # transform the params list (previously initialized)
-                params_list = [
-                    (
-                        self.exe, # python or composer
-                        index, # run index, zero based
-                        *tpl, # cmd, root, cmd_dict
-                        gpu_processes_count, # shared dict where key=gpu id and value=processes cound per gpu id
-                        scheduling['gpus'], # GPU ids
-                        scheduling['max_jobs_per_gpu'], # how many jobs we accept per GPU
-                        scheduling['distributed_training'], # whether to do distributed training on multiple GPUs or not
-                        launch_blocking, # whether to run with CUDA_LAUNCH_BLOCKING=1 or not
-                        torchrun # whether to run the scripts with torchrun or not
-                    )
-                    for index, tpl in enumerate(params_list)
-                ]
-
-                with mp.Pool(processes=n_workers) as pool:
-                    lock_release() # make sure there are no lock files on disk before starting pool
-                    pool.map(func=waiting_worker, iterable=params_list)
-
-            print('ExperimentBuilder process ended. Summary:')
-            print(console_info)
-
-    def _create_root_arg(self, param_name_for_exp_root_folder, exp_folder):
-        """
-            This method fills in the exp_folder template and adds it to the __dict__ to be used as output directory.
-            For example, if your python script requires setting the parameter "output_dir" to specify where to save checkpoints,
-            then you can specify param_name_for_exp_root_folder="output_dir" and the value for this parameter will be given by
-            the value of `exp_folder` (which can be a template).
-            :param param_name_for_exp_root_folder: a string containing the argument name for the experiment root folder
-        """
-        exp_root_folder = self._fill_template(exp_folder) # fill in the template
-        self.add_param(param_name_for_exp_root_folder, exp_root_folder) # add to the __dict__
-        return exp_root_folder
-
-    def _fill_template(self, template):
-        """
-        This method fills in the `template` given as parameter with values stored in `self.__dict__`.
-        If the template uses a variable which is not in `self.__dict__` yet, the method returns the template again because that parameter
-        is expected to be set in the next steps when iterating through the elements of the cartesian product.
-        :param template: Template or string. If Template, we try to fill it. If string, then it's immediately returned.
-        :return: a string containing the template with substitutions or the same template if no substitutions could be made
-        """
-        if isinstance(template, str):
-            return template
+    def _search(self, scheduling, ledger, jobs, param_name_for_exp_root_folder, params_values):
+        """
+            Creates the adaptive search (SuccessiveHalving or BayesianSearch) if `scheduling` contains `halving` or `bayesopt`, otherwise
+            returns None. The search calls search_job(values) to build the job of a point and is told about the end of each job by `jobs`.
+        """
+        halving, bayesopt = scheduling.get('halving', None), scheduling.get('bayesopt', None)
+        if halving is None and bayesopt is None:
+            return None
+        command = self._compile(param_name_for_exp_root_folder, params_values)
+
+        def search_job(values):
+            job = jobs.make(*command(values))
+            return job[0], job[1][2], job
+
+        if halving is not None:
+            return SuccessiveHalving(
+                configs=list(self._search_space(scheduling)),
+                make_job=lambda values, budget: search_job(values + (budget,)),
+                is_done=jobs.is_done,
+                **{k: v for k, v in halving.items() if k != 'budget_param'})
+        from .bayesopt import BayesianSearch # requires numpy, which is only needed for Bayesian optimization
+        search = BayesianSearch(params_values=params_values, make_job=search_job, is_done=jobs.is_done, **bayesopt)
+        if ledger is not None: # the results of the previous launches
+            search.warm_start(ledger.select(SUCCEEDED), keys=[forward_key_replace(k) for k in params_values.keys()])
+        return search
+
+    def _broker(self, scheduling, stack):
+        """
+            Registers the sweep in the SlotBroker shared by the sweeps of the machine if `scheduling` contains `broker`, otherwise returns
+            None.
+        """
+        if not scheduling.get('broker', False):
+            return None
+        options = {} if scheduling['broker'] is True else dict(scheduling['broker'])
+        broker = SlotBroker(
+            gpus=scheduling['gpus'],
+            max_jobs_per_gpu=scheduling['max_jobs_per_gpu'],
+            name=options.pop('name', None) or f'{self.script} (pid {os.getpid()})',
+            **options).register()
+        stack.callback(broker.close)
+        return broker
+
+    def _dispatch(self, queue, jobs, scheduling, backend, metadata, stack):
+        """
+            Runs the jobs of `queue` on the GPUs of this machine with the given backend.
+            The scheduler owns the GPU slot table: each job is launched as soon as a slot is free and the slot is given back immediately
+            when the job ends. The warm-up delay is applied only to jobs that share a GPU with a running job.
+        """
+        scheduler = GPUScheduler(
+            gpus=scheduling['gpus'], # GPU ids
+            max_jobs_per_gpu=scheduling['max_jobs_per_gpu'], # how many jobs we accept per GPU
+            distributed_training=scheduling['distributed_training'], # whether to do distributed training on multiple GPUs or not
+            warmup_seconds=scheduling.get('warmup_seconds', 5), # seconds between two launches on the same GPU
+            placement=self._memory_placement(scheduling), # pack jobs by memory footprint if requested
+            broker=self._broker(scheduling, stack)) # share the GPUs with the other sweeps of the machine
+        if 'quarantine_failures' in scheduling: # stop using a GPU where jobs keep failing
+            jobs.quarantine = GPUQuarantine(
+                scheduler,
+                max_failures=scheduling['quarantine_failures'],
+                window_seconds=scheduling.get('quarantine_window', 600),
+                kinds=scheduling.get('quarantine_on', ('cuda',)),
+                on_quarantine=jobs.quarantined)
+        echo = jobs.progress is None
+        monitor = jobs.monitor
+
+        if backend == GSBackend.ASYNC: # one event loop starts and awaits all jobs
+            asyncio.run(run_jobs(queue, scheduler, on_start=jobs.started, on_exit=jobs.ended,
+                                 on_spawn=None if monitor is None else monitor.attach, echo=echo, metadata=metadata))
+            return
+
+        if backend == GSBackend.RESIDENT: # the jobs run back-to-back in one python process per GPU slot
+            from .resident import ResidentPool # imported here such that `python -m gridsearcher.resident` works
+            pool = ResidentPool(
+                script=self.script,
+                entry=scheduling.get('resident_entry', 'main'),
+                max_jobs_per_worker=scheduling.get('resident_max_jobs', 0),
+                echo=echo,
+                metadata=metadata)
+            stack.callback(pool.close)
+            launch = pool.launch
+        else:
+            supervisor = ProcessSupervisor() # one thread supervises all jobs, collects their output and reports their exit codes
+            stack.callback(supervisor.close)
+            launch = lambda params, gpus, on_exit: launch_worker(params, gpus, supervisor, on_exit, echo=echo, metadata=metadata)
+
+        def launcher(job, gpus, release):
+            job_id, params = job
+            jobs.started(job_id, gpus)
+
+            def on_exit(exit_code):
+                jobs.ended(job_id, exit_code)
+                release()
+
+            try:
+                handle = launch(params, gpus, on_exit)
+                if monitor is not None:
+                    monitor.attach(job_id, handle.pid)
+            except Exception:
+                jobs.ended(job_id, None)
+                raise
+
+        scheduler.run_async(jobs=queue, launcher=launcher)
+
+    def _print_summary(self, jobs, config_index, telemetry, exp_folder, params_values, scheduling):
+        counts = jobs.counts
+        console_info = f'Commands:\tRunnable: {counts["runnable"]}\tFinished: {counts["total"] - counts["runnable"]}\tTotal: {counts["total"]}'
+        print('ExperimentBuilder process ended. Summary:')
+        print(console_info)
+        if config_index is not None:
+            print(f'Reused from other folders or sweeps (global index {config_index.path}): {counts["reused"]}')
+        if telemetry:
+            print(f'Slot occupancy: {100 * (telemetry["occupancy"] or 0):.1f}%\tIdle slot-seconds: {telemetry["idle_slot_seconds"]:.0f}\t'
+                  f'Queue wait: mean {telemetry["queue_wait"]["mean"]}s, max {telemetry["queue_wait"]["max"]}s')
+            print(f'Timeline: {sweep_file(self.script, exp_folder, "trace.json")} (open in chrome://tracing or ui.perfetto.dev)')
+        if jobs.search is not None and jobs.search.best() is not None:
+            if 'halving' in scheduling:
+                config, budget, value = jobs.search.best()
+                print(f'Best configuration: {dict(zip(params_values.keys(), config))} with {scheduling["halving"]["budget_param"]}={budget}: '
+                      f'{scheduling["halving"]["metric"]}={value}')
+            else:
+                config, value = jobs.search.best()
+                print(f'Best configuration: {dict(zip(params_values.keys(), config))}: {scheduling["bayesopt"]["metric"]}={value}')
 
-        try:
-            d = {}
-            for key, val in self.__dict__.items():
-                if key.startswith('_'): # only look at the keys in __dict__ that start with underscore (those were added by GridSearcher)
-                    d[key[1:]] = val # erase the underscore at position 0
+    def _job_score(self, scheduling, cost_model):
+        """
+            Returns the callable used to order the jobs (higher runs first) from the keys `job_priority` or `job_cost` of `scheduling`,
+            or None to keep the order of the cartesian product.
+        """
+        # jobs are tuples (job_id, params) and params[3] is the dictionary of parameters with underscore prefix
+        score = scheduling.get('job_priority', None) or scheduling.get('job_cost', None)
+        if score is None:
+            return None
+        if score == 'learned':
+            score = cost_model.priority
+        return lambda job: score({k[1:]: v for k, v in job[1][3].items()})
+
+    def _memory_placement(self, scheduling):
+        """
+            Creates the MemoryPlacement policy if `scheduling` contains the keys `device_probe` or `memory_footprint`, otherwise returns None.
+        """
+        if 'device_probe' not in scheduling and 'memory_footprint' not in scheduling:
+            return None
+        footprint = scheduling.get('memory_footprint', None)
+        if callable(footprint):
+            user_footprint = footprint
+            # jobs are tuples (job_id, params) and params[3] is the dictionary of parameters with underscore prefix
+            footprint = lambda job: user_footprint({k[1:]: v for k, v in job[1][3].items()})
+        return MemoryPlacement(
+            probe=scheduling.get('device_probe', None) or NvidiaSmiProbe(),
+            footprint=footprint,
+            reserve_mb=scheduling.get('memory_reserve_mb', 1024))
+
+    def _monitor(self, scheduling):
+        """
+            Creates and starts the SweepMonitor if `scheduling` contains the key `telemetry`, otherwise returns None.
+        """
+        telemetry = scheduling.get('telemetry', False)
+        if not telemetry:
+            return None
+        telemetry = {} if telemetry is True else dict(telemetry)
+        probe = telemetry.pop('probe', None) or scheduling.get('device_probe', None)
+        if probe is None and shutil.which('nvidia-smi') is not None:
+            probe = NvidiaSmiProbe()
+        return SweepMonitor(
+            gpus=scheduling['gpus'],
+            max_jobs_per_gpu=scheduling['max_jobs_per_gpu'],
+            probe=probe,
+            **telemetry).start()
+
+    def _search_space(self, scheduling):
+        """
+            Returns an iterator over the points to run (tuples of values in the order of the keys of params_values): the cartesian
+            product of `params_values` or the points drawn by a Sampler if `scheduling` contains the key `sampling`.
+        """
+        if 'sampling' in scheduling:
+            return iter(Sampler(scheduling['params_values'], **scheduling['sampling']))
+        if 'bayesopt' in scheduling: # only printed by the debug mode, with the seed of the initial design of BayesianSearch
+            return iter(Sampler(scheduling['params_values'], n=scheduling['bayesopt']['n_trials'], seed=scheduling['bayesopt'].get('seed', 0)))
+        return product(*scheduling['params_values'].values()) # lazily iterate the cartesian product of all hyper-parameters
 
-            """
-                Call the substitute method for the template:
-                - if we have the template "lr=${lr}" and we have the dictionary d = { "lr": 1e-3 }, then the template will be fully filled
-                and the returned value will be "lr=1e-3"
-                
-                All parameters in the template should be present in the dictionary d. If the substituted string still contains the 
-                delimiter (e.g. the dollar sign character), it means that the dictionary d did not contain all required values to fill in
-                the template and in that case we raise a RuntimeError
-                
-                We can also use safe_substitute
-            """
-            substituted = template.substitute(**d)
-            # dlmtr = template.delimiter
-            # if dlmtr in substituted: # after substitution, the delimiter should disappear. If it's still present, it's an issue
-            #     raise RuntimeError(f'Could not replace the variables marked by {dlmtr}: {substituted}. '
-            #                        f'Please specify them in the scheduling["params_values"] dictionary')
-            return substituted
-        except KeyError as e:
-            print(f'[TemplateError] {str(e)}, {e.__cause__}')
-            return template
-
-    def _build_command(self):
-        """
-            This method actually builds the list of parameters of form "--key=value" or "--key value".
-            It can handle boolean parameters: if key=True, then only "--key" is added, for example "--bf16" sets bf16=True in the script
-            We also support parameters that have dot or dash characters, such as "--train.lr" or "--optimizer-name". In these cases,
-            the parameters should be specified as "trainDOTlr" or "optimizerDASHname" in the keys of the scheduling["params_values"]
-        """
-        params = []
-        dash_or_not = '--' if self.use_dashes else '@'
-
-        for k, v in self.__dict__.items(): # iterate through __dict__
-            if k.startswith('_'): # process parameters with underscore prefix because these are the ones that we added to GridSearcher
-                if isinstance(v, bool): # we have a boolean parameter without a value, but its presence or absence means True or False
-                    if v:
-                        params.append(f'{dash_or_not}{backward_key_replace(k)}') # replace
-                elif isinstance(v, Template):
-                    # elif isinstance(v, str) and '${' in v:
-                    params.append(f'{dash_or_not}{backward_key_replace(k)}{self.key_value_separator}{self._fill_template(v)}')
-                else:
-                    params.append(f'{dash_or_not}{backward_key_replace(k)}{self.key_value_separator}{str(v)}')
-        params = ' '.join(params).replace(f'{dash_or_not}_', f'{dash_or_not}').replace('@', '')
-        return f'{self.script} {params}'
+    def _iter_grid(self, param_name_for_exp_root_folder, params_values, points):
+        """
+            Returns a generator yielding one tuple (cmd, root_folder, cmd_dict) for each point of `points`. Only the current point is kept
+            in memory. The command is compiled (and its templates validated) when this method is called, such that a missing or cyclic
+            reference fails before any job is launched.
+        """
+        command = self._compile(param_name_for_exp_root_folder, params_values)
+        return (command(values) for values in points)
+
+    def _compile(self, param_name_for_exp_root_folder, params_values):
+        """
+            Resolves once per sweep everything the command needs except the values of the grid point: the order of the parameters,
+            the argument names (dashes, DOT and DASH replacements), the static values and the order in which templates have to be filled.
+            :return: a CompiledCommand that is called with the values of each element of the cartesian product
+        """
+        params = {} # key=parameter name without the underscore prefix, in the same order as they would appear in __dict__
+        templates = {} # key=parameter name and value=Template
+        for k, v in self.__dict__.items():
+            if k.startswith('_'):
+                params[k[1:]] = v
+            elif k.startswith('template_'):
+                templates[k[len('template_'):]] = v
+
+        varying = [forward_key_replace(k) for k in params_values.keys()]
+        root_param = forward_key_replace(param_name_for_exp_root_folder)
+        for k in varying + [root_param]:
+            params.setdefault(k, None)
+
+        dash_or_not = '--' if self.use_dashes else ''
+        return CompiledCommand(
+            script=self.script,
+            params=params,
+            templates=templates,
+            varying=varying,
+            root_param=root_param,
+            exp_folder=self.exp_folder_template,
+            key_prefixes={k: f'{dash_or_not}{backward_key_replace(k)}' for k in params.keys()},
+            key_value_separator=self.key_value_separator)
 
     def __getattr__(self, item):
         return self.__dict__[f'_{item}']
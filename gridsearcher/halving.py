@@ -0,0 +1,161 @@
+import os
+import json
+import threading
+from collections import deque
+
+METRICS_FILE = 'metrics.jsonl'
+
+def log_metrics(root, **metrics):
+    """
+        Helper for the scripts run by GridSearcher: appends one JSON line with the given metrics to the file metrics.jsonl in the root
+        folder of the experiment, for example log_metrics(args.output_dir, epoch=3, val_loss=0.41).
+    """
+    with open(os.path.join(root, METRICS_FILE), 'a') as f:
+        f.write(json.dumps(metrics) + '\n')
+
+def read_metric(root, name):
+    """
+        Returns the last value of the metric `name` written in the file metrics.jsonl of the root folder, or None if there is none.
+    """
+    path = os.path.join(root, METRICS_FILE)
+    if not os.path.isfile(path):
+        return None
+    value = None
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError: # a line being written or truncated by a crash
+                continue
+            if isinstance(record, dict) and record.get(name) is not None:
+                value = record[name]
+    return value
+
+def budgets(min_budget, max_budget, eta):
+    """
+        Returns the budgets of the rungs: min_budget, min_budget * eta, min_budget * eta^2, ... and max_budget as the last one.
+    """
+    result = []
+    budget = min_budget
+    while budget < max_budget:
+        result.append(budget)
+        budget *= eta
+    result.append(max_budget)
+    return result
+
+class SuccessiveHalving:
+    def __init__(self, configs, make_job, metric, min_budget, max_budget, eta=3, mode='min', brackets=1, is_done=None):
+        """
+            Asynchronous successive halving (and Hyperband with brackets > 1) over the points of a grid.
+            Each configuration starts with the smallest budget. Each time a slot is free, a configuration in the best 1/eta of the finished
+            jobs of a rung is promoted to the next rung (the highest rungs first), otherwise the next configuration of the grid is started.
+            The other configurations never get a larger budget, so most of the grid only runs with the smallest budget. There is no
+            barrier between rungs: the GPUs do not wait for the slowest job of a rung before the promotions start.
+            With Hyperband, the configurations are spread over `brackets` brackets, the bracket s starting at the budget of rung s.
+            :param configs: list of grid points (tuples of values of params_values)
+            :param make_job: callable(values, budget) returning a tuple (job_id, root, job) for the grid point `values` with the given budget
+            :param metric: name of the metric read from metrics.jsonl in the root folder of each job when it ends
+            :param min_budget: budget of the first rung
+            :param max_budget: budget of the last rung
+            :param eta: the best 1/eta of the jobs of a rung are promoted to the next rung, whose budget is eta times larger
+            :param mode: 'min' if the metric is a loss, 'max' if it is an accuracy
+            :param brackets: number of Hyperband brackets, 1 is successive halving
+            :param is_done: optional callable(job_id, root) telling whether a job already ended in a previous launch, in which case its
+            metric is read without running it again
+        """
+        assert mode in ['min', 'max'], 'mode must be min or max'
+        self.make_job = make_job
+        self.metric = metric
+        self.sign = 1 if mode == 'min' else -1
+        self.eta = eta
+        self.budgets = budgets(min_budget, max_budget, eta)
+        self.is_done = is_done
+        brackets = max(1, min(brackets, len(self.budgets)))
+        """
+            One state per bracket: the configurations that did not start yet and, for each rung, the results (metric, config index) of
+            the ended jobs and the config indexes that were promoted from it.
+        """
+        self.brackets = []
+        for s in range(brackets):
+            self.brackets.append(dict(
+                first_rung=s,
+                waiting=deque(),
+                results=[[] for _ in self.budgets],
+                promoted=[set() for _ in self.budgets]))
+
+        # as in Hyperband, the bracket starting at rung s gets a share of the configurations proportional to eta^(K - s) / (K - s + 1)
+        last = len(self.budgets) - 1
+        weights = [eta ** (last - s) / (last - s + 1) for s in range(brackets)]
+        for i in range(len(configs)): # interleaved, such that each bracket covers the whole grid
+            s = min(range(brackets), key=lambda s: (len(self.brackets[s]['waiting']) + 1) / weights[s])
+            self.brackets[s]['waiting'].append(i)
+        self.configs = configs
+        self.running = {} # key=job_id and value=tuple (bracket, rung, config index, root)
+        self.cond = threading.Condition()
+
+    def __iter__(self):
+        """
+            Yields the jobs to run. When no job can be started now but jobs are running, waits for one of them to end, since its result
+            can promote a configuration.
+        """
+        while True:
+            with self.cond:
+                while True:
+                    choice = self._next()
+                    if choice is not None or len(self.running) == 0:
+                        break
+                    self.cond.wait()
+            if choice is None:
+                return
+            bracket, rung, index = choice
+            job_id, root, job = self.make_job(self.configs[index], self.budgets[rung])
+            with self.cond:
+                self.running[job_id] = (bracket, rung, index, root)
+            if self.is_done is not None and self.is_done(job_id, root):
+                self.ended(job_id, 0)
+                continue
+            yield job
+
+    def _next(self):
+        """
+            Returns (bracket, rung, config index) of the next job or None if no job can start now. Must be called with `self.cond` held.
+        """
+        for rung in range(len(self.budgets) - 2, -1, -1): # promotions first, from the highest rung
+            for b, bracket in enumerate(self.brackets):
+                if rung < bracket['first_rung']:
+                    continue
+                results = sorted(r for r in bracket['results'][rung] if r[0] is not None)
+                top = results[:len(bracket['results'][rung]) // self.eta]
+                for _, index in top:
+                    if index not in bracket['promoted'][rung]:
+                        bracket['promoted'][rung].add(index)
+                        return b, rung + 1, index
+
+        for b, bracket in enumerate(self.brackets): # otherwise a new configuration
+            if bracket['waiting']:
+                return b, bracket['first_rung'], bracket['waiting'].popleft()
+        return None
+
+    def ended(self, job_id, exit_code):
+        """
+            Records the metric of a job that ended. Failed jobs and jobs without metric are never promoted.
+        """
+        with self.cond:
+            if job_id not in self.running:
+                return
+            b, rung, index, root = self.running.pop(job_id)
+            value = read_metric(root, self.metric) if exit_code == 0 else None
+            self.brackets[b]['results'][rung].append((None if value is None else self.sign * float(value), index))
+            self.cond.notify_all()
+
+    def best(self):
+        """
+            Returns a tuple (config, budget, metric) for the best configuration among the jobs that ended with the largest budget reached.
+        """
+        with self.cond:
+            for rung in range(len(self.budgets) - 1, -1, -1):
+                results = [r for bracket in self.brackets for r in bracket['results'][rung] if r[0] is not None]
+                if results:
+                    value, index = min(results)
+                    return self.configs[index], self.budgets[rung], self.sign * value
+        return None
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+ROOT_PLACEHOLDER = '${root}'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS configs (
+    config_hash TEXT PRIMARY KEY,
+    script TEXT,
+    params TEXT,
+    root TEXT,
+    finished_at REAL
+);
+'''
+
+def default_index_path():
+    """
+        Path of the global index shared by all sweeps of the user: $GRIDSEARCHER_INDEX or ~/.gridsearcher/index.sqlite.
+    """
+    return os.environ.get('GRIDSEARCHER_INDEX', os.path.join(os.path.expanduser('~'), '.gridsearcher', 'index.sqlite'))
+
+def effective_params(cmd_dict, root_param, root):
+    """
+        Returns the arguments that define what a job computes: all parameters of the command after defaults and templates were filled,
+        without the root folder. Occurrences of the root folder in the other values (e.g. a log file templated from it) are replaced by a
+        placeholder, such that the same configuration has the same parameters in any folder.
+        :param cmd_dict: dictionary of parameters with underscore prefix, as built by CompiledCommand
+        :param root_param: name of the parameter receiving the root folder
+        :param root: root folder of the job
+    """
+    params = {}
+    for k, v in cmd_dict.items():
+        k = k[1:]
+        if k == root_param or v is None:
+            continue
+        v = str(v)
+        params[k] = v.replace(root, ROOT_PLACEHOLDER) if root else v
+    return params
+
+def config_hash(script, exe, params):
+    """
+        Canonical identity of a configuration: a hash of the interpreter, the absolute path of the script and the effective parameters
+        (keys sorted), independent of the folder where the job writes its results and of the sweep it belongs to.
+    """
+    data = json.dumps(dict(exe=exe, script=os.path.abspath(script), params=params), sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+class GlobalIndex:
+    def __init__(self, path=None, batch_size=256):
+        """
+            SQLite index of the configurations that finished successfully, shared by all sweeps (and all launchers) of a user, keyed by
+            config_hash. It tells a launcher that a configuration was already trained in another folder, by another sweep.
+            The insertions are grouped in transactions of `batch_size` rows.
+            :param path: path of the SQLite file, defaults to default_index_path()
+            :param batch_size: number of pending insertions before a commit
+        """
+        self.path = path or default_index_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+        self.batch_size = batch_size
+        self.pending = {} # key=config_hash and value=row waiting to be committed
+        self.lock = threading.Lock()
+
+    def lookup(self, config_hash):
+        """
+            Returns the root folder where the configuration finished, or None. Entries whose folder does not contain state.finished
+            anymore (deleted or moved results) are removed.
+        """
+        with self.lock:
+            if config_hash in self.pending:
+                return self.pending[config_hash][3]
+            row = self.db.execute('SELECT root FROM configs WHERE config_hash = ?', (config_hash,)).fetchone()
+            if row is None:
+                return None
+            if not os.path.isfile(os.path.join(row[0], 'state.finished')):
+                self.db.execute('DELETE FROM configs WHERE config_hash = ?', (config_hash,))
+                self.db.commit()
+                return None
+            return row[0]
+
+    def add(self, config_hash, script, params, root):
+        """
+            Records a configuration that finished successfully in `root`. A configuration already recorded keeps its first folder.
+        """
+        with self.lock:
+            if config_hash not in self.pending:
+                self.pending[config_hash] = (config_hash, os.path.abspath(script), json.dumps(params, sort_keys=True), root, time.time())
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.pending:
+            with self.db:
+                self.db.executemany('INSERT OR IGNORE INTO configs VALUES (?, ?, ?, ?, ?)', list(self.pending.values()))
+            self.pending = {}
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+def link_result(source, root):
+    """
+        Makes the results of a configuration that finished in `source` visible in `root` with a symbolic link. Returns False if `root`
+        already exists or links are not supported (e.g. Windows without the privilege), in which case the job is only skipped.
+    """
+    if os.path.lexists(root):
+        return False
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(root)), exist_ok=True)
+        os.symlink(os.path.abspath(source), root, target_is_directory=True)
+        return True
+    except OSError:
+        return False
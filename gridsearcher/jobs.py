@@ -0,0 +1,183 @@
+import os
+import time
+from .process import LOG_FILE
+from .ledger import job_hash, RETRIED, QUARANTINED
+from .failures import classify_failure
+from .identity import effective_params, config_hash, link_result
+
+class SweepJobs:
+    def __init__(self, script, exe, root_param, job_options, is_done, ledger=None, monitor=None, progress=None, cost_model=None,
+                 config_index=None, duplicates='link', backfill=True, classify=False):
+        """
+            Builds the jobs of a sweep and forwards their events (queued, started, ended) to the optional features of the launcher. A job
+            is a tuple (job_id, params), where params=(exe, cmd, root, cmd_dict, launch_blocking, torchrun, log_max_bytes, log_backups).
+            :param script: path of the script
+            :param exe: interpreter of the script
+            :param root_param: name of the parameter receiving the root folder
+            :param job_options: tuple (launch_blocking, torchrun, log_max_bytes, log_backups) appended to the params of each job
+            :param is_done: callable(job_id, root) telling whether a job finished in a previous launch
+            :param ledger: optional SweepLedger
+            :param monitor: optional SweepMonitor
+            :param progress: optional SweepProgress
+            :param cost_model: optional CostModel, trained with the durations of the jobs that succeed
+            :param config_index: optional GlobalIndex. A job whose configuration finished in another folder or sweep is done, its root
+            folder becomes a link to the existing results if `duplicates` is 'link'
+            :param duplicates: 'link' or 'skip'
+            :param backfill: whether the jobs that finished in previous launches are added to `config_index`
+            :param classify: whether the failures are classified (see failures.classify_failure) for the retries and the quarantine
+        """
+        self.script = script
+        self.exe = exe
+        self.root_param = root_param
+        self.job_options = tuple(job_options)
+        self.is_done_in_sweep = is_done
+        self.ledger = ledger
+        self.monitor = monitor
+        self.progress = progress
+        self.cost_model = cost_model
+        self.config_index = config_index
+        self.duplicates = duplicates
+        self.backfill = backfill
+        self.classify = classify
+        self.retries = None # RetryQueue, set once the jobs are wrapped in it
+        self.quarantine = None # GPUQuarantine, set once the scheduler is created
+        self.search = None # adaptive search told about the end of each job
+        self.counts = dict(
+            total=0, # how many program instances (commands to run) were generated
+            runnable=0, # some runs might have already been run
+            reused=0) # configurations that finished in another folder, found in the global index
+        self.configs = {} # key=job_id and value=tuple (config hash, effective parameters), only kept with the global index
+        self.params = {} # key=job_id and value=dictionary of parameters, only kept to train the cost model
+        self.start_times = {}
+        self.roots = {} # key=job_id and value=root folder, only kept to classify the failures, for the telemetry and the global index
+        self.runs = {} # key=job_id and value=tuple (log path, log size at start, gpus) of the running jobs
+
+    def make(self, cmd, root, cmd_dict):
+        """
+            Returns the job of a command built by CompiledCommand.
+        """
+        self.counts['total'] += 1
+        job_id = job_hash(cmd_dict)
+        if self.config_index is not None: # identity of the configuration, independent of the root folder
+            params = effective_params(cmd_dict, self.root_param, root)
+            self.configs[job_id] = (config_hash(self.script, self.exe, params), params)
+        return job_id, (self.exe, cmd, root, cmd_dict) + self.job_options
+
+    def is_done(self, job_id, root):
+        """
+            Tells whether a job does not need to run: it finished in a previous launch or, with the global index, in another folder.
+        """
+        if self.config_index is None:
+            return self.is_done_in_sweep(job_id, root)
+        config, params = self.configs[job_id]
+        if self.is_done_in_sweep(job_id, root):
+            if self.backfill: # the results of this sweep become visible to the other sweeps
+                self.config_index.add(config, self.script, params, root)
+            del self.configs[job_id]
+            return True
+        source = self.config_index.lookup(config)
+        if source is not None and os.path.realpath(source) != os.path.realpath(root):
+            self.counts['reused'] += 1
+            if self.duplicates == 'link':
+                link_result(source, root)
+            del self.configs[job_id]
+            return True
+        return False
+
+    def queue(self, job):
+        """
+            Records a job that will be dispatched and returns it.
+        """
+        job_id, (_, cmd, root, cmd_dict) = job[0], job[1][:4]
+        self.counts['runnable'] += 1
+        if self.cost_model is not None:
+            self.params[job_id] = {k[1:]: v for k, v in cmd_dict.items()}
+        if self.classify or self.monitor is not None or self.config_index is not None:
+            self.roots[job_id] = root
+        if self.monitor is not None:
+            self.monitor.queued(job_id)
+        if self.progress is not None:
+            self.progress.queued()
+        if self.ledger is not None:
+            self.ledger.queued(job_id, root, cmd, cmd_dict)
+        return job
+
+    def runnable(self, grid, metadata, batch_size):
+        """
+            Yields the jobs of `grid` (tuples (cmd, root, cmd_dict)) that are not done. The root folders are created in batches of
+            `batch_size` runnable jobs, each batch in one parallel pass, before its jobs are dispatched.
+            :param metadata: JobMetadata creating the folders
+            :param batch_size: number of folders created together, 0 lets each job create its folder when it starts
+        """
+        batch = []
+        for cmd, root, cmd_dict in grid:
+            job = self.make(cmd, root, cmd_dict)
+            if self.is_done(job[0], root):
+                if self.progress is not None:
+                    self.progress.skipped()
+            elif batch_size <= 0:
+                yield self.queue(job)
+            else:
+                batch.append(self.queue(job))
+                if len(batch) >= batch_size:
+                    metadata.create_folders([job[1][2] for job in batch])
+                    yield from batch
+                    batch = []
+        metadata.create_folders([job[1][2] for job in batch])
+        yield from batch
+
+    def started(self, job_id, gpus):
+        self.start_times[job_id] = time.monotonic()
+        if self.classify: # the log is appended by each attempt, only the part written by this one is classified
+            log_path = os.path.join(self.roots[job_id], LOG_FILE)
+            self.runs[job_id] = (log_path, os.path.getsize(log_path) if os.path.isfile(log_path) else 0, gpus)
+        if self.monitor is not None:
+            self.monitor.started(job_id, gpus, self.roots[job_id])
+        if self.progress is not None:
+            self.progress.started(job_id, gpus)
+        if self.cost_model is not None:
+            self.cost_model.started(self.params[job_id])
+        if self.ledger is not None:
+            self.ledger.running(job_id, gpus)
+
+    def ended(self, job_id, exit_code):
+        """
+            Records the end of a job, exit_code is None if the job could not be started.
+        """
+        started_at = self.start_times.pop(job_id, None)
+        if self.cost_model is not None and exit_code == 0 and started_at is not None:
+            self.cost_model.observe(self.params[job_id], time.monotonic() - started_at)
+        if self.ledger is not None:
+            self.ledger.ended(job_id, exit_code)
+        if self.config_index is not None and exit_code == 0 and job_id in self.configs:
+            config, params = self.configs.pop(job_id)
+            self.config_index.add(config, self.script, params, self.roots[job_id])
+        if self.monitor is not None:
+            self.monitor.ended(job_id, exit_code)
+        retried = False
+        if job_id in self.runs:
+            log_path, offset, gpus = self.runs.pop(job_id)
+            failure = classify_failure(exit_code, log_path, offset)
+            if self.quarantine is not None:
+                self.quarantine.failed(gpus, failure)
+            retried = self.retries is not None and self.retries.ended(job_id, failure)
+        if self.progress is not None:
+            self.progress.ended(job_id, exit_code, retried)
+        if self.search is not None and not retried: # the metric of the job is used to choose the next jobs
+            self.search.ended(job_id, exit_code) # only the result of the last attempt
+
+    def retried(self, job_id, failure, attempt, delay):
+        """
+            Records that a failed job will run again, called by the RetryQueue (the progress counts it when the job ends).
+        """
+        if self.ledger is not None:
+            self.ledger.event(RETRIED, job_id=job_id, detail=f'{failure}, retry {attempt} in {delay:g} seconds')
+
+    def quarantined(self, gpu, failure, n_failures):
+        """
+            Records that a GPU does not receive new jobs anymore, called by the GPUQuarantine.
+        """
+        if self.ledger is not None:
+            self.ledger.event(QUARANTINED, gpu=gpu, detail=f'{n_failures} failures ({failure})')
+        if self.progress is not None:
+            self.progress.quarantined(gpu)
@@ -0,0 +1,181 @@
+import json
+import time
+import contextlib
+import queue
+import sqlite3
+import hashlib
+import threading
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+RETRIED = 'retried' # kinds of events
+QUARANTINED = 'quarantined'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    root TEXT,
+    cmd TEXT,
+    params TEXT,
+    state TEXT,
+    gpus TEXT,
+    queued_at REAL,
+    started_at REAL,
+    ended_at REAL,
+    duration REAL,
+    exit_code INTEGER,
+    attempts INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+CREATE TABLE IF NOT EXISTS events (
+    at REAL,
+    kind TEXT,
+    job_id TEXT,
+    gpu TEXT,
+    detail TEXT
+);
+'''
+
+def job_hash(cmd_dict):
+    """
+        Returns the identifier of a job in the ledger: a hash of its parameter dictionary (keys are sorted, values converted to strings).
+    """
+    data = json.dumps({k: str(v) for k, v in cmd_dict.items()}, sort_keys=True)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+class SweepLedger:
+    def __init__(self, path, flush_interval=1.0, batch_size=512):
+        """
+            SQLite ledger of a sweep, with one row per job keyed by the hash of its parameters. It records the state of the job (queued,
+            running, succeeded or failed), the GPUs, the start and end times, the duration and the exit code. The retries of failed jobs
+            and the quarantined GPUs are recorded in the table `events`.
+            All writes are done by one thread of the launcher, which groups the updates in transactions of at most `batch_size` rows and
+            commits at least every `flush_interval` seconds, so recording thousands of jobs does not cost thousands of fsyncs.
+            :param path: path of the SQLite file
+            :param flush_interval: maximum number of seconds between two commits
+            :param batch_size: maximum number of updates in one transaction
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.updates = queue.Queue()
+        self.writer = None
+
+        with contextlib.closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def start(self):
+        """
+            Starts the writer thread. Jobs left in the `running` state by a launcher that died are marked as failed.
+        """
+        with contextlib.closing(self._connect()) as conn, conn:
+            conn.execute('UPDATE jobs SET state=? WHERE state=?', (FAILED, RUNNING))
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+        return self
+
+    def close(self):
+        """
+            Writes the pending updates and stops the writer thread.
+        """
+        if self.writer is not None:
+            self.updates.put(None)
+            self.writer.join()
+            self.writer = None
+
+    def queued(self, job_id, root, cmd, cmd_dict):
+        params = json.dumps({k[1:] if k.startswith('_') else k: str(v) for k, v in cmd_dict.items()})
+        self.updates.put((
+            'INSERT INTO jobs (job_id, root, cmd, params, state, queued_at) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(job_id) DO UPDATE SET root=excluded.root, cmd=excluded.cmd, params=excluded.params, state=excluded.state, '
+            'queued_at=excluded.queued_at, started_at=NULL, ended_at=NULL, duration=NULL, exit_code=NULL',
+            (job_id, root, cmd, params, QUEUED, time.time())))
+
+    def running(self, job_id, gpus):
+        self.updates.put((
+            'UPDATE jobs SET state=?, gpus=?, started_at=?, attempts=attempts+1 WHERE job_id=?',
+            (RUNNING, ','.join(map(str, gpus)), time.time(), job_id)))
+
+    def ended(self, job_id, exit_code):
+        now = time.time()
+        self.updates.put((
+            'UPDATE jobs SET state=?, ended_at=?, duration=?-started_at, exit_code=? WHERE job_id=?',
+            (SUCCEEDED if exit_code == 0 else FAILED, now, now, exit_code, job_id)))
+
+    def event(self, kind, job_id=None, gpu=None, detail=None):
+        """
+            Records an event of the sweep that is not a change of state of a job.
+            :param kind: RETRIED (a failed job will run again) or QUARANTINED (a GPU does not receive new jobs anymore)
+            :param job_id: id of the job concerned, if any
+            :param gpu: GPU concerned, if any
+            :param detail: text describing the event, e.g. the kind of failure
+        """
+        self.updates.put((
+            'INSERT INTO events (at, kind, job_id, gpu, detail) VALUES (?, ?, ?, ?, ?)',
+            (time.time(), kind, job_id, None if gpu is None else str(gpu), detail)))
+
+    def _write_loop(self):
+        conn = self._connect()
+        stop = False
+        while not stop:
+            batch = [self.updates.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not None: # close() does not wait for the end of the interval
+                try:
+                    batch.append(self.updates.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if None in batch:
+                stop = True
+                batch = [update for update in batch if update is not None]
+            with conn: # one transaction per batch
+                for sql, args in batch:
+                    conn.execute(sql, args)
+        conn.close()
+
+    def select(self, state=None):
+        """
+            Returns the jobs as a list of dictionaries, optionally only the ones in the given state.
+        """
+        with contextlib.closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            if state is None:
+                rows = conn.execute('SELECT * FROM jobs').fetchall()
+            else:
+                rows = conn.execute('SELECT * FROM jobs WHERE state=?', (state,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def events(self, kind=None):
+        """
+            Returns the events as a list of dictionaries in the order they happened, optionally only the ones of the given kind.
+        """
+        with contextlib.closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            if kind is None:
+                rows = conn.execute('SELECT * FROM events ORDER BY at').fetchall()
+            else:
+                rows = conn.execute('SELECT * FROM events WHERE kind=? ORDER BY at', (kind,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def job_ids(self, state):
+        """
+            Returns the set of job ids in the given state. This is used to skip the succeeded jobs when a sweep is resumed or to retry
+            only the failed ones.
+        """
+        with contextlib.closing(self._connect()) as conn:
+            return {row[0] for row in conn.execute('SELECT job_id FROM jobs WHERE state=?', (state,))}
+
+    def counts(self):
+        """
+            Returns a dictionary where key=state and value=number of jobs in that state.
+        """
+        with contextlib.closing(self._connect()) as conn:
+            return dict(conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .resume import FINISHED_FILE
+
+ARGUMENTS_FILE = 'arguments.txt'
+PROBE_MKDIRS = 16 # number of folders created from the calling thread to measure the latency of the filesystem
+SLOW_MKDIR_SECONDS = 0.002 # above this latency per mkdir, the folders are created by a thread pool
+
+def atomic_write(path, text):
+    """
+        Writes `text` to a temporary file next to `path` and renames it, such that a killed launcher never leaves a half-written file.
+    """
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def arguments_text(cmd_dict):
+    """
+        Returns the content of arguments.txt: one line "name=value" for each parameter of `cmd_dict` (keys with underscore prefix).
+    """
+    return ''.join(f'{k[1:]}={v}\n' for k, v in cmd_dict.items() if k.startswith('_'))
+
+def create_folders(roots, workers=16):
+    """
+        Creates the folders `roots` in one pass: their parents first (a sweep has far fewer parents than runs), then the runs with one
+        mkdir call each. The first calls are timed: on a network filesystem, where each call has a high latency, the others are fanned
+        out to a thread pool, while on a local disk they are faster from a single thread.
+    """
+    roots = list(dict.fromkeys(os.path.normpath(root) for root in roots))
+    for parent in sorted({os.path.dirname(root) for root in roots}):
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+
+    def mkdirs(chunk):
+        for root in chunk:
+            try:
+                os.mkdir(root)
+            except FileExistsError:
+                pass
+
+    start = time.perf_counter()
+    mkdirs(roots[:PROBE_MKDIRS])
+    latency = (time.perf_counter() - start) / max(1, min(len(roots), PROBE_MKDIRS))
+    rest = roots[PROBE_MKDIRS:]
+    workers = max(1, min(workers, len(rest)))
+    if workers == 1 or latency < SLOW_MKDIR_SECONDS:
+        mkdirs(rest)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(mkdirs, [rest[i::workers] for i in range(workers)]))
+
+class SweepJournal:
+    def __init__(self, path):
+        """
+            Append-only JSON lines file with the metadata of all jobs of a sweep, written instead of (or in addition to) the files
+            arguments.txt and state.finished of each root folder. Each event is one line written with a single write call on a file opened
+            in append mode, so the lines of concurrent writers do not interleave and a killed launcher loses at most its last line.
+            Events: {"event": "arguments", "root": ..., "args": {...}, "time": ...}, {"event": "finished", "root": ..., "time": ...} and
+            {"event": "seeded", "root": null, "time": ...} once the runs that finished before the journal existed were added to it
+            :param path: path of the JSONL file, e.g. sweep_file(script, exp_folder, 'metadata.jsonl')
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.lock = threading.Lock()
+
+    def append(self, event, root, **data):
+        line = json.dumps(dict(event=event, root=root, time=time.time(), **data), default=str) + '\n'
+        with self.lock:
+            os.write(self.fd, line.encode())
+
+    def finished_roots(self, seed=None):
+        """
+            Returns the set of normalized root folders that have a finished event, read from the journal. A truncated last line is ignored.
+            :param seed: optional callable returning the root folders that finished before the journal was used (e.g. found by a
+            ResumeIndex scan). It is only called if the journal was not seeded yet, its roots are appended as finished events such that
+            the next launches do not need to look for them again
+        """
+        finished = set()
+        seeded = False
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('event') == 'finished':
+                    finished.add(os.path.normpath(record['root']))
+                seeded = seeded or record.get('event') == 'seeded'
+        if seed is not None and not seeded:
+            for root in sorted(set(map(os.path.normpath, seed())) - finished):
+                self.append('finished', root, exit_code=0, seeded=True)
+                finished.add(root)
+            self.append('seeded', None)
+        return finished
+
+    def close(self):
+        with self.lock:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+
+class JobMetadata:
+    def __init__(self, journal=None, per_job_files=True, workers=16):
+        """
+            Writes the metadata of the jobs: the arguments when a job starts and the finished mark when it succeeds. The per-job files
+            arguments.txt and state.finished are written atomically (temporary file and rename), the root folders can be created in bulk
+            before the jobs are dispatched (see create_folders) and the metadata can be consolidated in one SweepJournal.
+            :param journal: optional SweepJournal
+            :param per_job_files: whether to write arguments.txt and state.finished in the root folder of each job. Without journal, they
+            are the only record of the finished jobs. With a journal, they are a compatibility view for tools that read the root folders
+            :param workers: number of threads used by create_folders
+        """
+        assert journal is not None or per_job_files, 'The metadata needs a journal or the per-job files'
+        self.journal = journal
+        self.per_job_files = per_job_files
+        self.workers = workers
+        self.created = set() # root folders created by create_folders, prepare_job does not create them again
+        self.lock = threading.Lock()
+
+    def create_folders(self, roots):
+        roots = [root for root in roots if root not in self.created]
+        create_folders(roots, self.workers)
+        with self.lock:
+            self.created.update(roots)
+
+    def write_arguments(self, root, cmd_dict):
+        """
+            Creates the root folder of the job (unless it was created in bulk) and records its arguments.
+        """
+        with self.lock:
+            created = root in self.created
+            self.created.discard(root) # a retry of the job creates the folder again in case it was removed
+        if not created:
+            os.makedirs(root, exist_ok=True)
+        if self.per_job_files:
+            atomic_write(os.path.join(root, ARGUMENTS_FILE), arguments_text(cmd_dict))
+        if self.journal is not None:
+            self.journal.append('arguments', root, args={k[1:]: v for k, v in cmd_dict.items() if k.startswith('_')})
+
+    def mark_finished(self, root, exit_code):
+        """
+            Marks a successful job as finished (a crashed job will be run again at the next launch).
+        """
+        if exit_code != 0:
+            return
+        if self.per_job_files:
+            atomic_write(os.path.join(root, FINISHED_FILE), '')
+        if self.journal is not None:
+            self.journal.append('finished', root, exit_code=exit_code)
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+
+DEFAULT_METADATA = JobMetadata() # per-job files only, used when the launcher does not give its own JobMetadata
@@ -0,0 +1,121 @@
+"""
+    Reference of the keys of the dictionary `scheduling` given to GridSearcher.run (and of the section `scheduling` of a YAML spec, see
+    gridsearcher.cli). This is the only place where they are documented: check_scheduling rejects the keys that are not listed here.
+"""
+from .sampling import Uniform
+
+SCHEDULING_KEYS = {
+    # required
+    'gpus': 'list of the GPU ids to run the jobs on',
+    'max_jobs_per_gpu': 'how many jobs run on each GPU at most (num_processes = len(gpus) * max_jobs_per_gpu)',
+    'params_values': 'dictionary with the values of each hyper-parameter, the cartesian product is run. With `sampling` or `bayesopt`, '
+                     'the values can also be a range: Uniform(low, high), LogUniform(low, high) or IntUniform(low, high)',
+    'distributed_training': 'if True, each job uses all GPUs of `gpus` in CUDA_VISIBLE_DEVICES (DataParallel), otherwise one GPU',
+
+    # search space
+    'sampling': 'dictionary with the keys `n`, `method` (random, sobol or lhs, default sobol) and `seed` (default 0) to run `n` points '
+                'drawn from `params_values` instead of the cartesian product (see sampling.Sampler)',
+    'halving': 'dictionary to run asynchronous successive halving (see halving.SuccessiveHalving) instead of the whole grid, with the keys '
+               '`budget_param` (parameter receiving the budget, e.g. epochs, which must appear in exp_folder and not in params_values), '
+               '`metric` (written by the script with halving.log_metrics), `min_budget`, `max_budget`, `eta` (default 3), `mode` (min or '
+               'max, default min) and `brackets` (default 1, more brackets is Hyperband)',
+    'bayesopt': 'dictionary to run Bayesian optimization (see bayesopt.BayesianSearch) instead of the whole grid, with the keys `metric` '
+                '(written by the script with halving.log_metrics), `n_trials`, `mode` (min or max, default min), `n_initial`, `liar` and '
+                '`seed`. With the ledger, the results of the previous launches are given to the model',
+
+    # placement and order of the jobs
+    'warmup_seconds': 'minimum number of seconds between two launches on the same GPU (default 5)',
+    'device_probe': 'DeviceProbe (NvidiaSmiProbe or FileProbe) used to place the jobs by GPU memory instead of by number of jobs, '
+                    '`max_jobs_per_gpu` remaining an upper bound. Defaults to NvidiaSmiProbe if `memory_footprint` is given',
+    'memory_footprint': 'GPU memory of a job in MB: a number or a callable receiving the parameters of the job. If not given, the '
+                        'footprint is learned from the memory allocated by the previous jobs',
+    'memory_reserve_mb': 'memory kept free on each GPU by the memory placement (default 1024)',
+    'job_cost': 'estimated duration of a job: a callable receiving the parameters of the job or `learned` to estimate it from the jobs of '
+                'the sweep that already ended (and from the ledger). The longest jobs are dispatched first',
+    'job_priority': 'callable receiving the parameters of the job and returning a number, the highest priorities are dispatched first. '
+                    'Takes precedence over `job_cost`',
+    'broker': 'True or a dictionary with the keys `weight` (default 1), `name`, `folder` and `poll_interval` to share the GPUs of the '
+              'machine with the other sweeps using a broker (see broker.SlotBroker)',
+
+    # resume and records
+    'resume_manifest': 'whether to persist the list of finished runs in the sweep folder to speed up the next launches (default False)',
+    'resume_workers': 'number of threads used to look for finished runs and to create the root folders (default 16)',
+    'ledger': 'whether to record the state, GPUs, timing and exit code of each job in a SQLite file in the sweep folder (default False). '
+              'The jobs recorded as succeeded are done, in addition to the ones found in the root folders or in the journal',
+    'retry_failed_only': 'only run the jobs recorded as failed in the ledger (default False)',
+    'global_index': 'True or the path of a SQLite file (default $GRIDSEARCHER_INDEX or ~/.gridsearcher/index.sqlite) shared by all sweeps, '
+                    'where each successful job is recorded under the hash of its effective arguments (see identity.config_hash). A '
+                    'configuration that already finished in another folder or sweep is not run again',
+    'duplicates': 'with `global_index`, `link` (default) turns the root folder of a configuration that already finished elsewhere into a '
+                  'symbolic link to its results, `skip` only skips it',
+    'metadata_journal': 'True or the path of a JSON lines file (default in the sweep folder) where the arguments and the end of all jobs '
+                        'are appended (see metadata.SweepJournal). The finished jobs are then read from the journal at the next launch, the '
+                        'runs that finished before the first launch with the journal being added to it',
+    'metadata_files': 'whether to write arguments.txt and state.finished in each root folder, default True without journal and False '
+                      'with a journal',
+    'precreate_folders': 'number of root folders of runnable jobs created together before they are dispatched (default 1024), 0 creates '
+                         'each folder when its job starts',
+
+    # execution
+    'log_max_bytes': 'maximum size of the log file output.log written in the root folder of each job (default 50MB)',
+    'log_backups': 'how many rotated log files to keep for each job (default 1)',
+    'resident_entry': 'with GSBackend.RESIDENT, function of the script called for each job with sys.argv set to its arguments '
+                      '(default main)',
+    'resident_max_jobs': 'with GSBackend.RESIDENT, number of jobs after which a worker is replaced by a fresh process (default 0 for never)',
+    'coordinator': 'dictionary with the keys `host` (default 127.0.0.1), `port`, `lease_timeout` and `allow_remote` (required to '
+                   'listen on an address reachable from other nodes, e.g. 0.0.0.0) (see distributed.Coordinator). No job runs on this '
+                   'machine: the grid is served to the agents started on each node with '
+                   '`python -m gridsearcher.agent --host HOST --port PORT --gpus 0,1,2,3`',
+
+    # failures
+    'max_retries': 'how many times a failed job is run again in the same launch (default 0), if its failure (see '
+                   'failures.classify_failure) is in `retry_on`',
+    'retry_on': 'kinds of failures that are retried (default oom, cuda and signal)',
+    'retry_backoff': 'seconds before the first retry of a job, doubled at each retry (default 30)',
+    'quarantine_failures': 'number of failures of the kinds in `quarantine_on` within `quarantine_window` seconds after which a GPU does '
+                           'not receive new jobs anymore (see failures.GPUQuarantine)',
+    'quarantine_on': 'kinds of failures attributed to the GPU (default cuda)',
+    'quarantine_window': 'length in seconds of the window of `quarantine_failures` (default 600)',
+
+    # monitoring
+    'telemetry': 'True or a dictionary with the keys `interval` (default 5 seconds) and `probe` to sample the CPU, RSS and GPU usage of '
+                 'each job (see telemetry.SweepMonitor), written to resources.csv in each root folder, with a summary and a Chrome trace '
+                 'in the sweep folder',
+    'progress': 'True or a dictionary with the keys `interval` (default 1 second), `log_interval` (default 60 seconds, used instead of '
+                '`interval` when the output is not a terminal), `terminal` (default True) and `port` to show the status of the sweep in a '
+                'panel at the bottom of the terminal and serve it as JSON on http://127.0.0.1:port/ (see progress.SweepProgress). The '
+                'commands of the jobs are not printed and the terminal is not cleared',
+}
+
+REQUIRED_KEYS = ['gpus', 'max_jobs_per_gpu', 'params_values', 'distributed_training']
+SINGLE_MACHINE_KEYS = ['halving', 'max_retries', 'quarantine_failures', 'telemetry', 'metadata_journal', 'broker']
+
+def check_scheduling(scheduling):
+    """
+        Checks the keys of `scheduling` and the combinations of options that are not supported, and removes the duplicate values of
+        `params_values` (keeping the order given by the user) to avoid running the same job twice.
+    """
+    for key in REQUIRED_KEYS:
+        assert key in scheduling, f'scheduling requires `{key}` key'
+    unknown = [key for key in scheduling if key not in SCHEDULING_KEYS]
+    assert not unknown, f'Unknown keys in scheduling: {unknown}, see gridsearcher.options.SCHEDULING_KEYS'
+
+    for k, values in scheduling['params_values'].items():
+        if not isinstance(values, Uniform): # ranges can only be sampled
+            scheduling['params_values'][k] = list(dict.fromkeys(values))
+        else:
+            assert 'sampling' in scheduling or 'bayesopt' in scheduling, f'The range of {k} requires scheduling["sampling"] or ["bayesopt"]'
+
+    if 'bayesopt' in scheduling:
+        assert 'halving' not in scheduling and 'sampling' not in scheduling, 'bayesopt cannot be used with halving or sampling'
+    if 'bayesopt' in scheduling or 'halving' in scheduling:
+        assert 'job_cost' not in scheduling and 'job_priority' not in scheduling, 'halving and bayesopt decide the order of the jobs'
+    if 'coordinator' in scheduling:
+        used = [key for key in SINGLE_MACHINE_KEYS if scheduling.get(key, False)]
+        assert not used, f'{used} are only supported on one machine'
+    if scheduling.get('retry_failed_only', False):
+        assert scheduling.get('ledger', False), 'retry_failed_only requires scheduling["ledger"]=True'
+    if scheduling.get('global_index', False):
+        assert scheduling.get('duplicates', 'link') in ['link', 'skip'], 'duplicates must be link or skip'
+        assert scheduling.get('metadata_files', not scheduling.get('metadata_journal', False)), \
+            'global_index requires the files state.finished in the root folders (metadata_files=True)'
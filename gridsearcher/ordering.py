@@ -0,0 +1,126 @@
+import json
+import heapq
+import threading
+
+class CostModel:
+    def __init__(self, keys):
+        """
+            Estimates the duration of a job from the durations of the jobs of the same sweep that already ended.
+            The estimate is the mean duration of all jobs multiplied, for each varying parameter, by the ratio between the mean duration of
+            the jobs having the same value and the global mean.
+            A job having a value that was never observed and does not belong to a running job gets no estimate, so that it runs first and
+            the first jobs of the sweep cover all values of each parameter.
+            :param keys: names of the varying parameters (the keys of scheduling['params_values'])
+        """
+        self.keys = list(keys)
+        self.stats = {} # key=tuple (parameter name, value as string) and value=list [sum of durations, count]
+        self.running = set() # tuples (parameter name, value as string) of the jobs that started
+        self.total = [0.0, 0]
+        self.version = 0 # incremented when the estimates change enough for the queue to sort the remaining jobs again
+        self.lock = threading.Lock()
+
+    def started(self, params):
+        """
+            Records that a job started, its values are not unknown anymore.
+        """
+        with self.lock:
+            for key in self.keys:
+                value = (key, str(params.get(key)))
+                if value not in self.running and value not in self.stats:
+                    self.version += 1
+                self.running.add(value)
+
+    def observe(self, params, duration):
+        """
+            Records the duration of a job that ended.
+            :param params: dictionary of parameters of the job (names without underscore prefix)
+            :param duration: duration of the job in seconds
+        """
+        if duration is None or duration <= 0:
+            return
+        with self.lock:
+            self.total[0] += duration
+            self.total[1] += 1
+            new_value = False
+            for key in self.keys:
+                stat = self.stats.setdefault((key, str(params.get(key))), [0.0, 0])
+                new_value = new_value or stat[1] == 0
+                stat[0] += duration
+                stat[1] += 1
+            count = self.total[1]
+            if new_value or count & (count - 1) == 0: # sorting again costs one estimate per job: only for new values and counts 1, 2, 4, 8, ...
+                self.version += 1
+
+    def observe_ledger(self, rows):
+        """
+            Records the durations of the jobs that succeeded in the previous launches of the sweep.
+            :param rows: rows returned by SweepLedger.select
+        """
+        for row in rows:
+            self.observe(json.loads(row['params']), row['duration'])
+        return self
+
+    def estimate(self, params):
+        """
+            Returns the estimated duration of a job or None if it has a value that was never seen.
+        """
+        unknown, estimate = self.priority(params)
+        return None if unknown > 0 else estimate
+
+    def priority(self, params):
+        """
+            Returns the score used by OrderedJobs for `job_cost='learned'`: a tuple (number of values of the job that were never seen,
+            estimated duration), such that the most informative jobs run first and then the longest ones.
+        """
+        with self.lock:
+            values = [(key, str(params.get(key))) for key in self.keys]
+            unknown = sum(value not in self.stats and value not in self.running for value in values)
+            if self.total[1] == 0:
+                return unknown, 0.0
+            mean = self.total[0] / self.total[1]
+            estimate = mean
+            for value in values:
+                stat = self.stats.get(value)
+                if stat is not None:
+                    estimate *= (stat[0] / stat[1]) / mean
+            return unknown, estimate
+
+class OrderedJobs:
+    def __init__(self, jobs, score, model=None):
+        """
+            Iterable over `jobs` that yields the job with the highest score first, e.g. the longest job first to minimise the makespan:
+            the long jobs start while all GPUs are busy and the short ones fill the gaps at the end of the sweep.
+            The whole list of jobs is materialized, since the last job of the grid can be the first to run.
+            :param jobs: iterable of jobs
+            :param score: callable receiving a job and returning a number or a tuple of numbers compared in order (higher runs first)
+            :param model: optional CostModel used by `score`. When it learns new durations, the remaining jobs are scored again
+        """
+        self.jobs = list(jobs)
+        self.score = score
+        self.model = model
+        self.version = None
+        self.heap = None # built by the first call to `__next__`
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        current = None if self.model is None else self.model.version
+        if self.heap is None or current != self.version:
+            self._sort(current)
+        if len(self.heap) == 0:
+            raise StopIteration
+        return heapq.heappop(self.heap)[2]
+
+    def _sort(self, version):
+        """
+            Scores all remaining jobs and rebuilds the heap. Ties keep the order of the grid.
+        """
+        remaining = enumerate(self.jobs) if self.heap is None else [(index, job) for _, index, job in self.heap]
+        self.jobs = None
+        self.version = version
+        self.heap = []
+        for index, job in remaining:
+            score = self.score(job)
+            self.heap.append((tuple(-x for x in score) if isinstance(score, tuple) else -score, index, job))
+        heapq.heapify(self.heap)
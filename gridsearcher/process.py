@@ -0,0 +1,212 @@
+import os
+import time
+import socket
+import selectors
+import threading
+import traceback
+import subprocess
+
+LOG_FILE = 'output.log'
+
+class RotatingLog:
+    def __init__(self, path, max_bytes=50 * 2**20, backups=1):
+        """
+            Size-capped log file. When `path` would grow over `max_bytes`, it is renamed to `path.1` (the older backups are shifted
+            to `path.2`, ... and the oldest one is removed) and a new file is started, so a job never uses more than
+            (backups + 1) * max_bytes of disk for its output.
+            :param path: path of the log file
+            :param max_bytes: maximum size of one file, 0 means no limit
+            :param backups: how many rotated files to keep
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.file = open(path, 'ab')
+        self.size = self.file.tell()
+
+    def write(self, data):
+        if self.max_bytes > 0 and self.size + len(data) > self.max_bytes and self.size > 0:
+            self.rotate()
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+
+    def rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.isfile(f'{self.path}.{i}'):
+                os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+        if self.backups > 0:
+            os.replace(self.path, f'{self.path}.1')
+        self.file = open(self.path, 'wb')
+        self.size = 0
+
+    def close(self):
+        self.file.close()
+
+class JobHandle:
+    def __init__(self, proc, log, on_exit):
+        """
+            Non-blocking handle of a job started by ProcessSupervisor.launch.
+            :param proc: the subprocess.Popen object
+            :param log: the RotatingLog receiving stdout and stderr
+            :param on_exit: callable receiving the exit code, called by the supervisor when the process ends
+        """
+        self.proc = proc
+        self.log = log
+        self.on_exit = on_exit
+        self.started_at = time.time()
+
+    @property
+    def pid(self):
+        return self.proc.pid
+
+    def poll(self):
+        """
+            Returns the exit code of the process or None if it is still running (negative exit code if it was killed by a signal).
+        """
+        return self.proc.poll()
+
+    def kill(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+
+class ProcessSupervisor:
+    def __init__(self):
+        """
+            Starts jobs with subprocess.Popen (no shell) and supervises all of them from a single thread: the output of every child is
+            read with a selector and written to its RotatingLog and the `on_exit` callback of a job is called as soon as the job ends.
+            On Windows, where pipes cannot be used with selectors, each job gets a thread that copies its output.
+        """
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.handles = set()
+        self.pending = [] # handles launched but not registered in the selector yet
+        self.exiting = [] # handles that closed their output but did not exit yet
+        self.wakeup_r, self.wakeup_w = socket.socketpair() # wakes up the supervisor thread when a new job is registered
+        self.wakeup_r.setblocking(False)
+        self.selector.register(self.wakeup_r, selectors.EVENT_READ, None)
+        self.use_selector = os.name != 'nt'
+        self.closed = False
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def launch(self, args, env, log_path, on_exit, max_log_bytes=50 * 2**20, log_backups=1):
+        """
+            Starts a job and returns immediately.
+            :param args: list of program arguments, e.g. ['python3', 'main.py', '--lr', '0.1']
+            :param env: dictionary of environment variables for the job
+            :param log_path: path of the file receiving stdout and stderr of the job
+            :param on_exit: callable receiving the exit code, called from the supervisor thread when the job ends
+            :param max_log_bytes: maximum size of the log file before rotating it
+            :param log_backups: how many rotated log files to keep
+            :return: JobHandle
+        """
+        log = RotatingLog(log_path, max_bytes=max_log_bytes, backups=log_backups)
+        try:
+            proc = subprocess.Popen(args, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0)
+        except Exception: # e.g. the executable does not exist
+            log.close()
+            raise
+        handle = JobHandle(proc, log, on_exit)
+        with self.lock:
+            self.handles.add(handle)
+            if self.use_selector:
+                self.pending.append(handle) # the selector is only used from the supervisor thread
+        if self.use_selector:
+            self.wakeup_w.send(b'x')
+        else:
+            threading.Thread(target=self._copy_output, args=(handle,), daemon=True).start()
+        return handle
+
+    def running(self):
+        """
+            Returns the handles of the jobs that did not end yet.
+        """
+        with self.lock:
+            return list(self.handles)
+
+    def kill_all(self):
+        for handle in self.running():
+            handle.kill()
+
+    def close(self):
+        """
+            Stops the supervisor thread and closes the selector and the wakeup sockets. Meant to be called once all jobs ended: the output
+            of the jobs still running is not collected anymore and their `on_exit` is not called.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.wakeup_w.send(b'x')
+        self.thread.join()
+        self.wakeup_w.close()
+
+    def _loop(self):
+        while True:
+            timeout = 0.5 if self.exiting else None
+            for key, _ in self.selector.select(timeout=timeout):
+                if key.data is None:
+                    try:
+                        self.wakeup_r.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    if self.closed:
+                        self._close_selector()
+                        return
+                    self._register_pending()
+                    continue
+                handle = key.data
+                try:
+                    data = os.read(key.fd, 65536)
+                except BlockingIOError:
+                    continue
+                if data:
+                    handle.log.write(data)
+                else: # end of output, the process is exiting
+                    self.selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    self.exiting.append(handle)
+            self._reap()
+
+    def _close_selector(self):
+        """
+            Closes the pipes and logs of the jobs that did not end and the resources of the supervisor thread, called from that thread.
+        """
+        for handle in self.running():
+            handle.proc.stdout.close()
+            handle.log.close()
+        self.selector.close()
+        self.wakeup_r.close()
+
+    def _register_pending(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for handle in pending:
+            os.set_blocking(handle.proc.stdout.fileno(), False)
+            self.selector.register(handle.proc.stdout, selectors.EVENT_READ, handle)
+
+    def _reap(self):
+        still_running = []
+        for handle in self.exiting:
+            if handle.proc.poll() is None:
+                still_running.append(handle)
+            else:
+                self._finish(handle)
+        self.exiting = still_running
+
+    def _copy_output(self, handle):
+        for data in iter(lambda: handle.proc.stdout.read(65536), b''):
+            handle.log.write(data)
+        handle.proc.stdout.close()
+        handle.proc.wait()
+        self._finish(handle)
+
+    def _finish(self, handle):
+        handle.log.close()
+        with self.lock:
+            self.handles.discard(handle)
+        try:
+            handle.on_exit(handle.proc.returncode)
+        except Exception:
+            traceback.print_exc()
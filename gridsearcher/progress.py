@@ -0,0 +1,250 @@
+import io
+import sys
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class SweepProgress:
+    def __init__(self, gpus, max_jobs_per_gpu, total=None):
+        """
+            In-memory status of a sweep, fed by the callbacks of the launcher when a job is generated, starts and ends: counts of the jobs
+            queued, running, done and failed, occupancy of each GPU, quarantined GPUs, throughput and an ETA from the durations of the jobs
+            that ended.
+            :param gpus: list of GPU ids
+            :param max_jobs_per_gpu: number of slots per GPU
+            :param total: number of jobs of the sweep if it is known in advance (including the ones finished in previous launches)
+        """
+        self.gpus = list(gpus)
+        self.max_jobs = max_jobs_per_gpu
+        self.total = total
+        self.t0 = time.monotonic()
+        self.counts = dict(queued=0, running=0, done=0, failed=0, skipped=0, retried=0, quarantined=0)
+        self.gpu_jobs = {gpu: 0 for gpu in self.gpus} # key=gpu id and value=number of running jobs
+        self.quarantined_gpus = set()
+        self.running = {} # key=job_id and value=time.monotonic() of the start
+        self.durations = 0.0 # sum of the durations of the jobs that ended
+        self.first_start = None
+        self.lock = threading.Lock()
+
+    def queued(self):
+        with self.lock:
+            self.counts['queued'] += 1
+
+    def skipped(self):
+        """
+            Records a job that was finished in a previous launch.
+        """
+        with self.lock:
+            self.counts['skipped'] += 1
+
+    def started(self, job_id, gpus):
+        with self.lock:
+            now = time.monotonic()
+            self.first_start = self.first_start or now
+            self.counts['queued'] = max(0, self.counts['queued'] - 1)
+            self.counts['running'] += 1
+            self.running[job_id] = (now, list(gpus))
+            for gpu in gpus:
+                self.gpu_jobs[gpu] = self.gpu_jobs.get(gpu, 0) + 1
+
+    def ended(self, job_id, exit_code, retried=False):
+        """
+            Records the end of a job. A job that will be retried goes back to the queue.
+        """
+        with self.lock:
+            if job_id not in self.running:
+                return
+            started_at, gpus = self.running.pop(job_id)
+            self.counts['running'] -= 1
+            for gpu in gpus:
+                self.gpu_jobs[gpu] -= 1
+            if retried:
+                self.counts['retried'] += 1
+                self.counts['queued'] += 1
+            elif exit_code == 0:
+                self.counts['done'] += 1
+                self.durations += time.monotonic() - started_at
+            else:
+                self.counts['failed'] += 1
+
+    def quarantined(self, gpu):
+        """
+            Records that `gpu` does not receive new jobs anymore (see failures.GPUQuarantine).
+        """
+        with self.lock:
+            self.quarantined_gpus.add(gpu)
+            self.counts['quarantined'] = len(self.quarantined_gpus)
+
+    def status(self):
+        """
+            Returns a dictionary with the counts, the occupancy of the GPUs, the throughput in jobs per hour, the mean duration of the
+            successful jobs and the ETA in seconds (None until a job succeeded).
+        """
+        with self.lock:
+            now = time.monotonic()
+            counts = dict(self.counts)
+            ended = counts['done'] + counts['failed']
+            mean = self.durations / counts['done'] if counts['done'] > 0 else None
+            if self.total is not None: # the jobs that were not generated yet are part of the remaining work
+                remaining = max(0, self.total - counts['skipped'] - ended - counts['running'])
+            else:
+                remaining = counts['queued']
+            eta = None
+            if mean is not None:
+                """
+                    The remaining work is the mean duration for each job that did not start plus the expected remaining time of the running
+                    jobs, shared by all slots.
+                """
+                work = remaining * mean + sum(max(0.0, mean - (now - started_at)) for started_at, _ in self.running.values())
+                eta = work / (len(self.gpus) * self.max_jobs)
+            elapsed = now - (self.first_start or now)
+            return dict(
+                elapsed=round(now - self.t0, 1),
+                total=self.total,
+                remaining=remaining,
+                gpus={str(gpu): dict(running=count, slots=self.max_jobs, quarantined=gpu in self.quarantined_gpus)
+                      for gpu, count in self.gpu_jobs.items()},
+                jobs_per_hour=round(ended / elapsed * 3600, 1) if elapsed > 0 else None,
+                mean_seconds=None if mean is None else round(mean, 1),
+                eta_seconds=None if eta is None else round(eta, 1),
+                **counts)
+
+    def render(self):
+        """
+            Returns the lines of the terminal panel.
+        """
+        s = self.status()
+        total = '?' if s['total'] is None else s['total']
+        lines = [
+            f'Elapsed {format_seconds(s["elapsed"])}\tETA {format_seconds(s["eta_seconds"])}\t'
+            f'Throughput {"-" if s["jobs_per_hour"] is None else s["jobs_per_hour"]} jobs/h\tMean duration {format_seconds(s["mean_seconds"])}',
+            f'Jobs: queued {s["queued"]}\trunning {s["running"]}\tdone {s["done"]}\tfailed {s["failed"]}\tretried {s["retried"]}\t'
+            f'finished before {s["skipped"]}\ttotal {total}',
+        ]
+        gpus = []
+        for gpu, info in s['gpus'].items():
+            bar = '#' * info['running'] + '.' * max(0, info['slots'] - info['running'])
+            gpus.append(f'GPU {gpu} [{bar}]' + (' quarantined' if info['quarantined'] else ''))
+        lines.append('  '.join(gpus))
+        return lines
+
+def format_seconds(seconds):
+    if seconds is None:
+        return '-'
+    seconds = int(seconds)
+    return f'{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+
+class TerminalPanel(io.TextIOBase):
+    def __init__(self, progress, interval=1.0, stream=None, log_interval=60.0):
+        """
+            Shows the status of a sweep at the bottom of the terminal, redrawn every `interval` seconds. While the panel is shown, it
+            replaces sys.stdout: the messages printed by the launcher are written above the panel, which is drawn again at the next refresh.
+            When the output is not a terminal (nohup, log file of a job scheduler), the status is only printed every `log_interval` seconds
+            if the counts of jobs changed, and once more when the panel stops.
+            :param progress: SweepProgress
+            :param interval: number of seconds between two refreshes on a terminal
+            :param stream: where the panel is drawn, defaults to sys.stdout
+            :param log_interval: minimum number of seconds between two status prints when the output is not a terminal
+        """
+        self.progress = progress
+        self.stream = stream or sys.stdout
+        self.tty = self.stream.isatty()
+        self.interval = interval if self.tty else log_interval
+        self.printed = None # counts of the last status printed when the output is not a terminal
+        self.drawn = 0 # number of lines of the panel currently on the screen
+        self.lock = threading.RLock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.stdout = None # sys.stdout replaced by the panel
+
+    def start(self):
+        self.stdout = sys.stdout
+        sys.stdout = self
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+            Stops the refreshes and gives sys.stdout back, also if drawing the last panel fails.
+        """
+        self.stopped.set()
+        try:
+            if self.thread is not None:
+                self.thread.join()
+            self.draw()
+        finally:
+            with self.lock:
+                self.drawn = 0 # the last panel stays on the screen
+                if sys.stdout is self:
+                    sys.stdout = self.stdout
+
+    def write(self, data):
+        with self.lock:
+            self._erase()
+            return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+    def isatty(self):
+        return self.tty
+
+    def draw(self):
+        lines = self.progress.render()
+        with self.lock:
+            self._erase()
+            self.stream.write('\n'.join(lines) + '\n')
+            self.stream.flush()
+            self.drawn = len(lines) if self.tty else 0
+
+    def _erase(self):
+        if self.drawn > 0: # move the cursor to the first line of the panel and clear the end of the screen
+            self.stream.write(f'\x1b[{self.drawn}F\x1b[J')
+            self.drawn = 0
+
+    def _loop(self):
+        while not self.stopped.wait(self.interval):
+            if not self.tty:
+                with self.progress.lock:
+                    counts = dict(self.progress.counts)
+                if counts == self.printed: # nothing happened since the last print, do not fill the log with the same status
+                    continue
+                self.printed = counts
+            self.draw()
+
+class StatusServer:
+    def __init__(self, progress, host='127.0.0.1', port=0):
+        """
+            Serves the status of a sweep as JSON on http://host:port/ from a daemon thread of the launcher.
+            :param progress: SweepProgress
+            :param host: address to listen on, only the local machine by default
+            :param port: port to listen on, 0 picks a free port
+        """
+        self.progress = progress
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                body = json.dumps(progress.status()).encode()
+                handler.send_response(200)
+                handler.send_header('Content-Type', 'application/json')
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args): # no line on stdout for each request
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address[:2]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f'Sweep status: http://{self.host}:{self.port}/')
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,221 @@
+"""
+    Resident workers: instead of starting a new interpreter for each job, one long-lived python process per GPU slot imports the script
+    once and runs the configurations back-to-back by calling its entry function, so the start-up time of python, torch and CUDA is only
+    paid once per slot. The launcher sends one JSON line per job on the stdin of the worker and the worker answers with one JSON line
+    containing the exit code on its stdout. While a job runs, the file descriptors 1 and 2 of the worker are redirected to the log of the job.
+    The worker side is started with `python -m gridsearcher.resident SCRIPT ENTRY`.
+"""
+import os
+import sys
+import gc
+import json
+import threading
+import traceback
+import subprocess
+import importlib.util
+from .process import RotatingLog, LOG_FILE
+from .tools import prepare_job, mark_finished
+
+class ResidentWorker:
+    def __init__(self, script, entry, env):
+        """
+            Starts one worker process, bound to the GPUs in CUDA_VISIBLE_DEVICES of `env` for its whole life.
+            :param script: path of the python script to import
+            :param entry: name of the function of the script that runs one configuration
+            :param env: environment variables of the worker
+        """
+        self.proc = subprocess.Popen(
+            [sys.executable, '-m', 'gridsearcher.resident', script, entry], env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.jobs = 0 # number of jobs run by this worker
+
+    @property
+    def pid(self):
+        return self.proc.pid
+
+    def run(self, job, on_exit):
+        """
+            Sends a job to the worker and calls `on_exit(exit_code)` from a new thread when it ends. If the worker dies, the exit code
+            is the one of the worker process.
+        """
+        self.jobs += 1
+        try:
+            self.proc.stdin.write((json.dumps(job) + '\n').encode())
+            self.proc.stdin.flush()
+        except OSError: # the worker died while it was idle
+            pass
+        threading.Thread(target=self._wait, args=(on_exit,), daemon=True).start()
+
+    def _wait(self, on_exit):
+        line = self.proc.stdout.readline()
+        if line:
+            exit_code = json.loads(line)['exit_code']
+        else:
+            exit_code = self.proc.wait()
+        try:
+            on_exit(exit_code)
+        except Exception:
+            traceback.print_exc()
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def close(self):
+        """
+            Asks the worker to exit by closing its stdin.
+        """
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+
+class ResidentPool:
+    def __init__(self, script, entry='main', max_jobs_per_worker=0, echo=True, metadata=None):
+        """
+            Launcher side of the resident workers. The workers are created on demand and reused for the next jobs placed on the same GPUs,
+            so there are at most as many workers as GPU slots.
+            :param script: path of the python script
+            :param entry: name of the function of the script that runs one configuration. It is called without arguments, with sys.argv
+            set to the arguments of the job, so a script with `if __name__ == '__main__': main()` only needs entry='main'
+            :param max_jobs_per_worker: number of jobs after which a worker is replaced by a fresh process (to bound the memory leaked by
+            the jobs), 0 means never
+            :param echo: whether to print the command of each job
+            :param metadata: optional JobMetadata (see tools.prepare_job)
+        """
+        self.script = script
+        self.echo = echo
+        self.metadata = metadata
+        self.entry = entry
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.idle = {} # key=tuple of GPU ids and value=list of idle workers bound to these GPUs
+        self.workers = set()
+        self.lock = threading.Lock()
+
+    def launch(self, params, gpus, on_exit):
+        """
+            Same as tools.launch_worker, but the job runs in a resident worker.
+            :param params: tuple (exe, cmd, root, cmd_dict, launch_blocking, torchrun, max_log_bytes, log_backups)
+            :param gpus: list of GPU ids reserved for this run
+            :param on_exit: callable receiving the exit code of the job
+            :return: the ResidentWorker running the job
+        """
+        root, max_log_bytes, log_backups = params[2], params[6], params[7]
+        args, env = prepare_job(params, gpus, self.echo, self.metadata)
+        key = tuple(gpus)
+        worker = None
+        with self.lock:
+            idle = self.idle.setdefault(key, [])
+            while idle and worker is None:
+                worker = idle.pop()
+                if not worker.alive():
+                    self.workers.discard(worker)
+                    worker = None
+        if worker is None:
+            worker = ResidentWorker(self.script, self.entry, env)
+            with self.lock:
+                self.workers.add(worker)
+
+        def job_ended(exit_code):
+            mark_finished(root, exit_code, self.metadata)
+            with self.lock:
+                if worker.alive() and (self.max_jobs_per_worker == 0 or worker.jobs < self.max_jobs_per_worker):
+                    self.idle[key].append(worker)
+                else:
+                    self.workers.discard(worker)
+                    worker.close()
+            on_exit(exit_code)
+
+        worker.run(dict(
+            argv=args[1:], # the script and its arguments, without the interpreter
+            log_path=os.path.join(root, LOG_FILE),
+            max_log_bytes=max_log_bytes,
+            log_backups=log_backups), on_exit=job_ended)
+        return worker
+
+    def close(self):
+        """
+            Stops all workers after their current job.
+        """
+        with self.lock:
+            workers, self.workers, self.idle = list(self.workers), set(), {}
+        for worker in workers:
+            worker.close()
+        for worker in workers:
+            worker.proc.wait()
+
+def run_entry(function, argv, log_path, max_log_bytes, log_backups):
+    """
+        Runs one job in the worker process with sys.argv=argv and the output sent to its rotating log, returns its exit code.
+    """
+    log = RotatingLog(log_path, max_bytes=max_log_bytes, backups=log_backups)
+    read_fd, write_fd = os.pipe()
+
+    def copy_output():
+        for data in iter(lambda: os.read(read_fd, 65536), b''):
+            log.write(data)
+
+    copier = threading.Thread(target=copy_output, daemon=True)
+    copier.start()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = os.dup(1), os.dup(2)
+    os.dup2(write_fd, 1)
+    os.dup2(write_fd, 2)
+    os.close(write_fd)
+    sys.argv = list(argv)
+    try:
+        result = function()
+        exit_code = result if isinstance(result, int) else 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            exit_code = e.code or 0
+        else: # sys.exit('message') prints the message and exits with 1
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except Exception:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved[0], 1) # closes the last write end of the pipe, unless the job left child processes holding it
+        os.dup2(saved[1], 2)
+        os.close(saved[0])
+        os.close(saved[1])
+        copier.join(timeout=5)
+        log.close()
+        _free_memory()
+    return exit_code
+
+def _free_memory():
+    """
+        Releases what the previous job left behind, such that the next job starts with the memory of the GPU free.
+    """
+    gc.collect()
+    torch = sys.modules.get('torch', None)
+    if torch is not None and torch.cuda.is_available() and torch.cuda.is_initialized():
+        torch.cuda.empty_cache()
+
+def main():
+    script, entry = sys.argv[1], sys.argv[2]
+    results = os.fdopen(os.dup(1), 'w') # the jobs write to fd 1, the results go to the original stdout
+    commands = os.fdopen(os.dup(0), 'r')
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0) # the jobs must not read the commands
+    os.close(devnull)
+    os.dup2(2, 1) # outside of the jobs, the output goes to the console of the launcher
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script))) # as `python script.py` would do
+    spec = importlib.util.spec_from_file_location('__gridsearcher_job__', script) # not __main__, the main block is not run
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    function = getattr(module, entry)
+
+    for line in commands:
+        job = json.loads(line)
+        exit_code = run_entry(function, **job)
+        results.write(json.dumps(dict(exit_code=exit_code)) + '\n')
+        results.flush()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+"""
+    Aggregation of the results of a sweep into one table: one row per run with its arguments (arguments.txt or the sweep journal), the
+    last value of each metric found in the metric files declared by the user and whether it finished. The root folders are found with a
+    parallel walk of the sweep folder and the parsed runs are cached by file mtime, such that aggregating again only reads the new or
+    changed runs. Command line: `python -m gridsearcher.results SWEEP_FOLDER --metrics metrics.jsonl --out results.csv`
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from .resume import FINISHED_FILE, MTIME_SLACK_NS
+from .metadata import ARGUMENTS_FILE, atomic_write
+from .halving import METRICS_FILE
+
+CACHE_FILE = '.gridsearcher_results.json'
+CACHE_VERSION = 1
+
+def parse_key_values(path):
+    """
+        Parses a file with one "key=value" line per entry (the format of arguments.txt), the values are kept as strings.
+    """
+    values = {}
+    with open(path) as f:
+        for line in f:
+            key, sep, value = line.rstrip('\n').partition('=')
+            if sep:
+                values[key] = value
+    return values
+
+def parse_metrics(path):
+    """
+        Returns a flat dictionary with the metrics of a file, according to its extension:
+            - .jsonl: the last value of each key over all lines (e.g. the file written by halving.log_metrics)
+            - .json: the keys of the object, nested objects give "parent.child" keys
+            - .csv: the last row
+            - any other extension: "key=value" lines
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.jsonl':
+        values = {}
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError: # a line being written or truncated by a crash
+                    continue
+                if isinstance(record, dict):
+                    values.update(flatten(record))
+        return values
+    if ext == '.json':
+        with open(path) as f:
+            record = json.load(f)
+        return flatten(record) if isinstance(record, dict) else {}
+    if ext == '.csv':
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        return {k: parse_value(v) for k, v in rows[-1].items()} if rows else {}
+    return {k: parse_value(v) for k, v in parse_key_values(path).items()}
+
+def flatten(record, prefix=''):
+    values = {}
+    for k, v in record.items():
+        if isinstance(v, dict):
+            values.update(flatten(v, f'{prefix}{k}.'))
+        else:
+            values[f'{prefix}{k}'] = v
+    return values
+
+def parse_value(text):
+    """
+        Converts a value read from a text file to int, float, bool or None if it looks like one, otherwise returns it unchanged.
+    """
+    if not isinstance(text, str):
+        return text
+    if text in ('True', 'False'):
+        return text == 'True'
+    if text in ('None', ''):
+        return None
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+def file_signature(path):
+    """
+        Returns [mtime_ns, size] of a file, or None if it does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+class ResultsTable:
+    def __init__(self, columns):
+        """
+            Columnar table: `columns` is a dictionary where key=column name and value=list with one value per row (None if missing).
+        """
+        self.columns = columns
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), []))
+
+    def rows(self):
+        """
+            Returns the rows as dictionaries.
+        """
+        names = list(self.columns.keys())
+        return [dict(zip(names, values)) for values in zip(*self.columns.values())]
+
+    def to_numpy(self):
+        """
+            Returns a dictionary of NumPy arrays, one per column. Numeric columns without missing values are int or float arrays, the
+            others are object arrays.
+        """
+        import numpy as np # only needed for this conversion
+        arrays = {}
+        for name, values in self.columns.items():
+            if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+                arrays[name] = np.asarray(values)
+            else:
+                arrays[name] = np.asarray(values, dtype=object)
+        return arrays
+
+    def to_pandas(self):
+        import pandas as pd # only needed for this conversion
+        return pd.DataFrame(self.columns)
+
+    def to_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            self._write_csv(f)
+
+    def to_parquet(self, path):
+        import pyarrow as pa # only needed for this conversion
+        import pyarrow.parquet as pq
+        pq.write_table(pa.table(self.columns), path)
+
+    def save(self, path):
+        """
+            Writes the table to `path` in the format given by its extension: .csv, .parquet, .json (list of rows) or .jsonl (one row per line).
+        """
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.parquet':
+            self.to_parquet(path)
+        elif ext == '.json':
+            with open(path, 'w') as f:
+                json.dump(self.rows(), f, default=str)
+        elif ext == '.jsonl':
+            with open(path, 'w') as f:
+                for row in self.rows():
+                    f.write(json.dumps(row, default=str) + '\n')
+        else:
+            self.to_csv(path)
+
+    def _write_csv(self, f):
+        writer = csv.writer(f)
+        writer.writerow(self.columns.keys())
+        writer.writerows(['' if v is None else v for v in values] for values in zip(*self.columns.values()))
+
+class SweepResults:
+    def __init__(self, folder, metrics=(METRICS_FILE,), cache=True, journal=None, workers=16):
+        """
+            Collects the results of the runs found under `folder`: a run is a folder containing arguments.txt (the walk does not go below
+            it) or a root folder recorded in the sweep journal.
+            :param folder: sweep folder, e.g. tools.sweep_folder(exp_folder)
+            :param metrics: names of the metric files of a run, relative to its root folder (see parse_metrics for the formats)
+            :param cache: True to cache the parsed runs in `folder`/.gridsearcher_results.json, a path, or False. A run is parsed again
+            only if one of its files changed, and the folders whose mtime did not change are not listed again
+            :param journal: optional path of a SweepJournal, whose arguments and finished events are used for the runs without
+            arguments.txt (sweeps run with scheduling['metadata_journal'] and metadata_files=False)
+            :param workers: number of threads used for the walk and the parsing
+        """
+        self.folder = os.path.normpath(folder)
+        self.metrics = list(metrics)
+        self.cache_path = os.path.join(self.folder, CACHE_FILE) if cache is True else (cache or None)
+        self.journal = journal
+        self.workers = workers
+        self.stats = dict(listed=0, parsed=0, cached=0)
+
+    def collect(self, varying_only=False):
+        """
+            Walks the sweep folder, parses the new or changed runs and returns a ResultsTable with the columns `root`, the arguments of
+            the runs, their metrics and `finished`.
+            :param varying_only: only keep the arguments whose value is not the same for all runs (the swept parameters)
+        """
+        cache = self._load_cache()
+        scan_start_ns = time.time_ns()
+        journal_args, journal_finished = self._read_journal()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            dirs, roots = self._walk(pool, cache.get('dirs', {}), cache.get('scan_start_ns', 0), set(journal_args))
+            cached_runs = cache.get('runs', {})
+            runs = {}
+
+            def check(root):
+                """
+                    One stat per file of the run: the files are parsed again only if one of them was created, removed or modified.
+                """
+                signatures = {name: file_signature(os.path.join(root, name)) for name in [ARGUMENTS_FILE, FINISHED_FILE] + self.metrics}
+                finished = signatures[FINISHED_FILE] is not None or root in journal_finished
+                run = cached_runs.get(root)
+                if run is not None and run['signatures'] == signatures and run['finished'] == finished:
+                    return root, run, False
+                return root, self._parse(root, signatures, journal_args.get(root), finished), True
+
+            for root, run, parsed in pool.map(check, sorted(roots)):
+                runs[root] = run
+                self.stats['parsed' if parsed else 'cached'] += 1
+
+        if self.cache_path is not None:
+            atomic_write(self.cache_path, json.dumps(dict(
+                version=CACHE_VERSION, metrics=self.metrics, scan_start_ns=scan_start_ns, dirs=dirs, runs=runs)))
+        return self._table(runs, varying_only)
+
+    def _walk(self, pool, cached_dirs, cached_scan_ns, journal_roots):
+        """
+            Lists the sweep folder level by level. A folder whose mtime is the one of the previous scan (and older than the slack) is
+            not listed again. Returns (dirs, roots) where `dirs` is written to the cache.
+        """
+        def listing(folder):
+            try:
+                mtime_ns = os.stat(folder).st_mtime_ns
+            except FileNotFoundError:
+                return folder, None, None, False
+            cached = cached_dirs.get(folder)
+            if cached is not None and cached[0] == mtime_ns and mtime_ns < cached_scan_ns - MTIME_SLACK_NS:
+                return folder, mtime_ns, cached[1], True
+            subdirs, is_root = [], folder in journal_roots
+            try:
+                with os.scandir(folder) as it:
+                    for e in it:
+                        if e.name == ARGUMENTS_FILE:
+                            is_root = True
+                        elif e.is_dir(follow_symlinks=True):
+                            subdirs.append(e.name)
+            except (FileNotFoundError, NotADirectoryError):
+                return folder, None, None, False
+            return folder, mtime_ns, [subdirs, is_root], False
+
+        dirs, roots = {}, set()
+        level = [self.folder]
+        while level:
+            next_level = []
+            for folder, mtime_ns, entry, cached in pool.map(listing, level):
+                if entry is None:
+                    continue
+                dirs[folder] = [mtime_ns, entry]
+                self.stats['listed'] += not cached
+                subdirs, is_root = entry
+                if is_root: # the sub-folders of a run (checkpoints, etc.) are not walked
+                    roots.add(folder)
+                else:
+                    next_level.extend(os.path.join(folder, name) for name in subdirs)
+            level = next_level
+        return dirs, roots
+
+    def _parse(self, root, signatures, journal_args, finished):
+        arguments = {}
+        if journal_args is not None:
+            arguments.update({k: str(v) for k, v in journal_args.items()})
+        if signatures[ARGUMENTS_FILE] is not None:
+            arguments.update(parse_key_values(os.path.join(root, ARGUMENTS_FILE)))
+        metrics = {}
+        for name in self.metrics:
+            if signatures[name] is not None:
+                try:
+                    metrics.update(parse_metrics(os.path.join(root, name)))
+                except (OSError, ValueError, csv.Error) as e:
+                    print(f'[ResultsError] cannot parse {os.path.join(root, name)}: {e}')
+        return dict(
+            signatures=signatures,
+            arguments=arguments,
+            metrics=metrics,
+            finished=finished)
+
+    def _read_journal(self):
+        """
+            Returns the arguments (key=normalized root) and the finished roots recorded in the journal.
+        """
+        args, finished = {}, set()
+        if self.journal is None or not os.path.isfile(self.journal):
+            return args, finished
+        with open(self.journal) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                root = os.path.normpath(record.get('root', ''))
+                if record.get('event') == 'arguments':
+                    args[root] = record['args']
+                elif record.get('event') == 'finished':
+                    finished.add(root)
+        return args, finished
+
+    def _table(self, runs, varying_only):
+        """
+            Builds the columns: root, the arguments in order of first appearance (converted with parse_value), the metrics and finished.
+            A metric with the name of an argument is prefixed with "metric.".
+        """
+        arg_names, metric_names = {}, {}
+        for run in runs.values():
+            arg_names.update(dict.fromkeys(run['arguments']))
+            metric_names.update(dict.fromkeys(run['metrics']))
+        roots = list(runs.keys())
+        columns = dict(root=roots)
+        for name in arg_names:
+            values = [parse_value(runs[root]['arguments'].get(name, None)) for root in roots]
+            if varying_only and len(set(map(repr, values))) <= 1:
+                continue
+            columns[name] = values
+        for name in metric_names:
+            columns[f'metric.{name}' if name in columns else name] = [runs[root]['metrics'].get(name, None) for root in roots]
+        columns['finished'] = [runs[root]['finished'] for root in roots]
+        return ResultsTable(columns)
+
+    def _load_cache(self):
+        if self.cache_path is None or not os.path.isfile(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {} # a corrupted cache only means parsing everything again
+        if cache.get('version') != CACHE_VERSION or cache.get('metrics') != self.metrics: # other files, other columns
+            return {}
+        return cache
+
+def collect_results(folder, metrics=(METRICS_FILE,), cache=True, journal=None, workers=16, varying_only=False):
+    """
+        Returns a ResultsTable with one row per run of the sweep folder `folder` (see SweepResults).
+        Example: collect_results('./results', metrics=['metrics.jsonl'], varying_only=True).to_pandas()
+    """
+    return SweepResults(folder, metrics=metrics, cache=cache, journal=journal, workers=workers).collect(varying_only=varying_only)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='GridSearcher results: one row per run of a sweep with its arguments and metrics')
+    parser.add_argument('folder', type=str, help='sweep folder containing the root folders of the runs')
+    parser.add_argument('--metrics', type=str, nargs='*', default=[METRICS_FILE], help='metric files of a run, relative to its root folder')
+    parser.add_argument('--out', type=str, default=None, help='output file (.csv, .parquet, .json or .jsonl), CSV on stdout by default')
+    parser.add_argument('--journal', type=str, default=None, help='sweep journal of a sweep run with metadata_journal')
+    parser.add_argument('--varying-only', action='store_true', help='only keep the arguments that differ between runs')
+    parser.add_argument('--no-cache', action='store_true', help='parse all runs again and do not write the cache')
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args(argv)
+
+    results = SweepResults(args.folder, metrics=args.metrics, cache=not args.no_cache, journal=args.journal, workers=args.workers)
+    start = time.perf_counter()
+    table = results.collect(varying_only=args.varying_only)
+    if args.out is None:
+        table._write_csv(sys.stdout)
+    else:
+        table.save(args.out)
+    print(f'{len(table)} runs in {time.perf_counter() - start:.2f}s (folders listed: {results.stats["listed"]}, '
+          f'runs parsed: {results.stats["parsed"]}, from cache: {results.stats["cached"]})', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+FINISHED_FILE = 'state.finished'
+MTIME_SLACK_NS = 2 * 10**9 # directories modified less than 2 seconds before a scan are listed again next time (coarse mtime on NFS)
+
+def list_subdirs(folder):
+    """
+        Returns the names of the sub-folders of `folder` using a single os.scandir call, or an empty list if `folder` does not exist.
+    """
+    try:
+        with os.scandir(folder) as it:
+            return [e.name for e in it if e.is_dir(follow_symlinks=True)]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+class ResumeIndex:
+    def __init__(self, folder, depth, manifest=None, workers=16):
+        """
+            Index of the finished runs of a sweep, built before launching to skip the runs that already have the file `state.finished`.
+            Instead of checking each grid point separately, the folder tree of the sweep is walked once, level by level, with a thread pool
+            that fans out the os.scandir/stat calls (useful on network filesystems, where each call has a high latency).
+            :param folder: sweep folder, the static part of exp_folder (see tools.sweep_folder)
+            :param depth: how many folder levels there are between `folder` and the root folders of the runs (see tools.sweep_depth)
+            :param manifest: optional path to a JSON file where the result of the scan is persisted. The next scan lists again only the
+            folders whose mtime changed and checks only the runs that were not finished at the previous scan. Runs are trusted to stay
+            finished, so delete the manifest to force a full scan after removing `state.finished` files by hand.
+            :param workers: number of threads used for the scan
+        """
+        self.folder = os.path.normpath(folder)
+        self.depth = depth
+        self.manifest = manifest
+        self.workers = workers
+        self.finished = set()
+        self.stats = dict(listed=0, cached=0, checked=0)
+
+    def scan(self):
+        """
+            Walks the sweep folder and fills in `self.finished` with the normalized paths of the finished root folders.
+            :return: self
+        """
+        cache = self._load_manifest()
+        cached_dirs = cache.get('dirs', {})
+        cached_finished = set(cache.get('finished', []))
+        scan_start_ns = time.time_ns()
+        dirs = {} # key=folder, value=[mtime_ns, sub-folders], written to the manifest
+
+        def listing(folder):
+            try:
+                mtime_ns = os.stat(folder).st_mtime_ns
+            except FileNotFoundError:
+                return folder, None, []
+            cached = cached_dirs.get(folder)
+            if cached is not None and cached[0] == mtime_ns and mtime_ns < cache.get('scan_start_ns', 0) - MTIME_SLACK_NS:
+                return folder, mtime_ns, cached[1]
+            return folder, mtime_ns, None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            level = [self.folder]
+            for _ in range(self.depth):
+                if self.manifest is None:
+                    results = [(folder, None, names) for folder, names in zip(level, pool.map(list_subdirs, level))]
+                else:
+                    results = list(pool.map(listing, level))
+                    to_list = [folder for folder, mtime_ns, names in results if mtime_ns is not None and names is None]
+                    listed = dict(zip(to_list, pool.map(list_subdirs, to_list)))
+                    self.stats['cached'] += len(level) - len(to_list)
+                    results = [(folder, mtime_ns, listed.get(folder, names)) for folder, mtime_ns, names in results]
+                    for folder, mtime_ns, names in results:
+                        if mtime_ns is not None:
+                            dirs[folder] = [mtime_ns, names]
+                self.stats['listed'] += len(level)
+                level = [os.path.normpath(os.path.join(folder, name)) for folder, _, names in results for name in names]
+
+            to_check = [root for root in level if root not in cached_finished]
+            flags = pool.map(lambda root: os.path.isfile(os.path.join(root, FINISHED_FILE)), to_check)
+            self.finished = {root for root in level if root in cached_finished}
+            self.finished.update(root for root, flag in zip(to_check, flags) if flag)
+            self.stats['checked'] = len(to_check)
+
+        if self.manifest is not None:
+            self._save_manifest(dict(scan_start_ns=scan_start_ns, dirs=dirs, finished=sorted(self.finished)))
+        return self
+
+    def is_finished(self, root):
+        """
+            Checks whether the run with root folder `root` was finished when the index was built.
+        """
+        return os.path.normpath(root) in self.finished
+
+    def _load_manifest(self):
+        if self.manifest is None or not os.path.isfile(self.manifest):
+            return {}
+        try:
+            with open(self.manifest) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {} # a corrupted manifest only means a full scan
+
+    def _save_manifest(self, data):
+        tmp = f'{self.manifest}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.manifest) # atomic, a killed launcher never leaves a half-written manifest
@@ -0,0 +1,254 @@
+import math
+import random
+
+BITS = 32 # resolution of the quasi-random sequences, at most 2^32 points
+MASK64 = 2**64 - 1
+
+"""
+    Initial direction numbers m_1, ..., m_s of the Sobol sequence for the dimensions 2 to 21 (Joe and Kuo, new-joe-kuo-6.21201), in the
+    order of the primitive polynomials returned by `primitive_polynomials`. The next dimensions use random odd numbers m_i < 2^i drawn
+    with a fixed seed, which still gives a valid Sobol sequence.
+"""
+JOE_KUO = [
+    [1], [1, 3], [1, 3, 1], [1, 1, 1], [1, 1, 3, 3], [1, 3, 5, 13], [1, 1, 5, 5, 17], [1, 1, 5, 5, 5], [1, 1, 7, 11, 19],
+    [1, 1, 5, 1, 1], [1, 1, 1, 3, 11], [1, 3, 5, 5, 31], [1, 3, 3, 9, 7, 49], [1, 1, 1, 15, 21, 21], [1, 3, 1, 13, 27, 49],
+    [1, 1, 1, 15, 7, 5], [1, 3, 1, 15, 13, 25], [1, 1, 5, 5, 19, 61], [1, 3, 7, 11, 23, 15, 103], [1, 3, 7, 13, 13, 15, 69],
+]
+
+class Uniform:
+    def __init__(self, low, high, digits=6):
+        """
+            Continuous range for the values of a parameter in scheduling['params_values'] when `sampling` is used.
+            :param low: smallest value
+            :param high: largest value
+            :param digits: number of significant digits kept in the sampled values (so the root folders have readable names), None keeps all
+        """
+        assert low < high, 'low must be smaller than high'
+        self.low = low
+        self.high = high
+        self.digits = digits
+
+    def value(self, u):
+        """
+            Maps u in [0, 1) to a value of the range.
+        """
+        return self.round(self.low + u * (self.high - self.low))
+
+    def round(self, x):
+        return x if self.digits is None else float(f'{x:.{self.digits}g}')
+
+class LogUniform(Uniform):
+    """
+        Range whose logarithm is sampled uniformly, e.g. LogUniform(1e-5, 1e-1) for a learning rate.
+    """
+    def __init__(self, low, high, digits=6):
+        assert low > 0, 'LogUniform requires positive bounds'
+        super().__init__(low, high, digits)
+
+    def value(self, u):
+        return self.round(math.exp(math.log(self.low) + u * (math.log(self.high) - math.log(self.low))))
+
+class IntUniform(Uniform):
+    """
+        Range of integers between low and high (both included).
+    """
+    def __init__(self, low, high):
+        super().__init__(low, high, digits=None)
+
+    def value(self, u):
+        return min(self.high, self.low + int(u * (self.high - self.low + 1)))
+
+def to_value(values, u):
+    """
+        Maps u in [0, 1) to a value of a parameter: an element of the list `values` or a value of the range `values`.
+    """
+    if isinstance(values, Uniform):
+        return values.value(u)
+    return values[min(len(values) - 1, int(u * len(values)))]
+
+def to_unit(values, value):
+    """
+        Inverse of `to_value`: maps a value of a parameter to [0, 1), to the center of its bin for lists and integers.
+    """
+    if isinstance(values, IntUniform):
+        return (int(value) - values.low + 0.5) / (values.high - values.low + 1)
+    if isinstance(values, LogUniform):
+        return (math.log(float(value)) - math.log(values.low)) / (math.log(values.high) - math.log(values.low))
+    if isinstance(values, Uniform):
+        return (float(value) - values.low) / (values.high - values.low)
+    return (values.index(value) + 0.5) / len(values)
+
+def space_size(params_values):
+    """
+        Returns the number of distinct points of the search space, or None if it contains a continuous range.
+    """
+    size = 1
+    for values in params_values.values():
+        if isinstance(values, Uniform) and not isinstance(values, IntUniform):
+            return None
+        size *= (values.high - values.low + 1) if isinstance(values, IntUniform) else len(values)
+    return size
+
+def splitmix64(x):
+    """
+        Counter-based pseudo-random generator: returns a well mixed 64-bit integer for any 64-bit integer `x`.
+    """
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+def primitive_polynomials(count):
+    """
+        Returns the first `count` primitive polynomials over GF(2) of degree >= 1, sorted by degree and then by coefficients, as tuples
+        (degree s, a) where the bits of `a` are the coefficients of x^(s-1), ..., x^1 (the coefficients of x^s and 1 are always 1).
+    """
+    result = []
+    degree = 1
+    while len(result) < count:
+        order = 2**degree - 1
+        factors = [q for q in range(2, order + 1) if order % q == 0 and all(q % p != 0 for p in range(2, int(q**0.5) + 1))]
+        for a in range(2**(degree - 1)):
+            poly = (1 << degree) | (a << 1) | 1
+            if _x_power(order, poly, degree) == 1 and all(_x_power(order // q, poly, degree) != 1 for q in factors):
+                result.append((degree, a))
+                if len(result) == count:
+                    break
+        degree += 1
+    return result
+
+def _x_power(n, poly, degree):
+    """
+        Returns x^n modulo `poly` in GF(2)[x].
+    """
+    result, base = 1, 2 # the polynomials 1 and x
+    while n > 0:
+        if n & 1:
+            result = _mul_mod(result, base, poly, degree)
+        base = _mul_mod(base, base, poly, degree)
+        n >>= 1
+    return result
+
+def _mul_mod(a, b, poly, degree):
+    result = 0
+    while b:
+        if b & 1:
+            result ^= a
+        b >>= 1
+        a <<= 1
+        if a >> degree & 1:
+            a ^= poly
+    return result
+
+class Sampler:
+    def __init__(self, params_values, n, method='sobol', seed=0):
+        """
+            Draws `n` distinct points of the search space `params_values` without enumerating the cartesian product. Each point only depends
+            on its index and on the seed, so the points are computed in O(number of parameters) time and constant memory. With `random`
+            and `sobol`, drawing more points later with the same seed gives the same first points, whose runs already finished and are
+            skipped by the launcher (the strata of `lhs` depend on `n`).
+            :param params_values: dictionary where key=parameter name and value=list of values or a range (Uniform, LogUniform, IntUniform)
+            :param n: number of points to draw
+            :param method: 'random' (uniform), 'sobol' (scrambled Sobol sequence) or 'lhs' (Latin hypercube with n strata per parameter)
+            :param seed: seed of the scrambling and of the random numbers
+        """
+        assert method in ['random', 'sobol', 'lhs'], 'method must be random, sobol or lhs'
+        self.params_values = list(params_values.values())
+        self.n = n
+        self.method = method
+        self.seed = seed
+        self.dims = len(self.params_values)
+        self.size = space_size(params_values)
+        rng = random.Random(seed)
+
+        if method == 'sobol':
+            self.directions = self._sobol_directions()
+            self.shifts = [rng.getrandbits(BITS) for _ in range(self.dims)] # random digital shift of each dimension
+        elif method == 'lhs':
+            self.keys = [rng.getrandbits(64) for _ in range(self.dims * 4)] # keys of the permutation of the strata of each dimension
+
+    def __iter__(self):
+        """
+            Yields `n` distinct tuples of values (fewer if the space has less than `n` points), in the order of the keys of params_values.
+        """
+        seen = set()
+        target = self.n if self.size is None else min(self.n, self.size)
+        index = 0
+        while len(seen) < target and index < 100 * self.n: # the discrete spaces can produce the same point twice
+            point = tuple(to_value(values, u) for values, u in zip(self.params_values, self.unit_point(index)))
+            index += 1
+            if point not in seen:
+                seen.add(point)
+                yield point
+
+    def unit_point(self, index):
+        """
+            Returns the point number `index` of the sequence, in [0, 1)^dims.
+        """
+        if self.method == 'sobol':
+            return self._sobol(index)
+        if self.method == 'lhs':
+            return self._lhs(index)
+        return [splitmix64(self.seed * 0x100000001B3 + index * self.dims + d) / 2**64 for d in range(self.dims)]
+
+    def _sobol_directions(self):
+        """
+            Returns the direction numbers V[d][i] of the Sobol sequence for each dimension d and bit i.
+        """
+        directions = [[1 << (BITS - 1 - i) for i in range(BITS)]] # the first dimension is the van der Corput sequence
+        polynomials = primitive_polynomials(self.dims - 1)
+        fallback = random.Random(0) # fixed seed, the direction numbers must not depend on the seed of the sampler
+        for d, (s, a) in enumerate(polynomials):
+            if d < len(JOE_KUO):
+                m = list(JOE_KUO[d])
+            else:
+                m = [fallback.randrange(1, 2**(i + 1), 2) for i in range(s)]
+            for i in range(s, BITS):
+                value = m[i - s] ^ (m[i - s] << s)
+                for k in range(1, s):
+                    if a >> (s - 1 - k) & 1:
+                        value ^= m[i - k] << k
+                m.append(value)
+            directions.append([m[i] << (BITS - 1 - i) for i in range(BITS)])
+        return directions
+
+    def _sobol(self, index):
+        gray = index ^ (index >> 1) # the point of index n is the XOR of the direction numbers of the bits of the Gray code of n
+        point = []
+        for d in range(self.dims):
+            x = self.shifts[d]
+            bits, i = gray, 0
+            while bits:
+                if bits & 1:
+                    x ^= self.directions[d][i]
+                bits >>= 1
+                i += 1
+            point.append(x / 2**BITS)
+        return point
+
+    def _lhs(self, index):
+        """
+            Latin hypercube: the range of each parameter is split in n strata, the point number `index` falls in the stratum
+            permutation_d(index) of dimension d, at a random position inside the stratum. The permutations are computed on the fly.
+        """
+        point = []
+        for d in range(self.dims):
+            stratum = self._permute(index % self.n, d)
+            jitter = splitmix64(self.seed * 0x100000001B3 + index * self.dims + d) / 2**64
+            point.append((stratum + jitter) / self.n)
+        return point
+
+    def _permute(self, i, d):
+        """
+            Pseudo-random permutation of range(n) in constant memory: a Feistel network over the next power of 4, with cycle walking to
+            stay inside range(n).
+        """
+        half = max(1, (max(self.n - 1, 1).bit_length() + 1) // 2)
+        mask = (1 << half) - 1
+        while True:
+            left, right = i >> half, i & mask
+            for r in range(4):
+                left, right = right, left ^ (splitmix64(self.keys[d * 4 + r] ^ right) & mask)
+            i = (left << half) | right
+            if i < self.n:
+                return i
@@ -0,0 +1,212 @@
+import random
+import threading
+import time
+import traceback
+
+class GPUScheduler:
+    def __init__(self, gpus, max_jobs_per_gpu, distributed_training=False, warmup_seconds=5, placement=None, broker=None):
+        """
+            Central owner of the GPU slot table for one sweep. Jobs ask for a slot with `acquire` and give it back with `release`.
+            Waiting is done on a condition variable, so a freed slot is handed out as soon as the job holding it finishes.
+            :param gpus: list of GPU ids
+            :param max_jobs_per_gpu: how many jobs can share one GPU at the same time
+            :param distributed_training: if True, each job takes one slot on all GPUs (it will see all of them in CUDA_VISIBLE_DEVICES)
+            :param warmup_seconds: minimum time between two launches on the same GPU. It is applied only when the GPU is already running
+            another job, because the scripts do not allocate GPU memory immediately. Jobs placed on an idle GPU start right away.
+            :param placement: optional MemoryPlacement. If given, jobs are placed by memory footprint using the readings of a device probe
+            (max_jobs_per_gpu remains an upper bound) and the warm-up delay is replaced by waiting for the memory of the previous job
+            to be allocated. Its probe is read here and ValueError is raised if it does not report all `gpus`
+            :param broker: optional registered SlotBroker. If given, each slot is also reserved in the table shared by all sweeps of the
+            machine, which enforces the global limit of each GPU and the fair share between sweeps
+        """
+        assert len(gpus) > 0, 'GPUScheduler requires at least one GPU'
+        assert max_jobs_per_gpu > 0, 'max_jobs_per_gpu must be positive'
+        self.gpus = list(gpus)
+        self.max_jobs = max_jobs_per_gpu
+        self.dist_train = distributed_training
+        self.warmup_seconds = warmup_seconds
+        self.placement = placement
+        self.broker = broker
+        self.gpu_processes_count = {gpu: 0 for gpu in self.gpus} # key=gpu id and value=number of jobs currently on that GPU
+        self.last_launch = {gpu: None for gpu in self.gpus} # key=gpu id and value=time.monotonic() of the latest launch on that GPU
+        self.running = 0 # number of jobs holding a slot
+        self.quarantined = set() # GPUs that do not receive new jobs, see `quarantine`
+        self.cond = threading.Condition()
+        if self.placement is not None:
+            self.placement.check(self.gpus)
+
+    def _free_gpus(self, job=None):
+        """
+            Returns the GPUs the next job should run on or an empty list if there is no free slot. Must be called with `self.cond` held.
+            With a broker, the returned GPUs are already reserved in the table of the machine. With a placement policy, the latest
+            reading of its probe is used (see `refresh`).
+        """
+        if self.quarantined and (self.dist_train or len(self.quarantined) == len(self.gpus)):
+            raise RuntimeError(f'No GPU left to run the jobs, quarantined GPUs: {sorted(self.quarantined)}')
+        counts = {gpu: count for gpu, count in self.gpu_processes_count.items() if gpu not in self.quarantined}
+
+        if self.placement is not None:
+            gpus = self.placement.choose(counts, job, self.dist_train, self.max_jobs)
+            return self.broker.try_acquire(gpus, all_of=True) if gpus and self.broker is not None else gpus
+
+        if self.dist_train:
+            if all(count < self.max_jobs for count in counts.values()):
+                return self.gpus if self.broker is None else self.broker.try_acquire(self.gpus, all_of=True)
+            return []
+
+        if self.broker is not None: # the broker picks the least loaded GPU of the machine among the GPUs with a free local slot
+            candidates = sorted([gpu for gpu, count in counts.items() if count < self.max_jobs], key=counts.get)
+            return self.broker.try_acquire(candidates) if candidates else []
+
+        least = min(counts.values())
+        if least >= self.max_jobs:
+            return []
+        # if there are multiple GPUs with minimal number of processes, then pick a random GPU from them
+        return [random.choice([gpu for gpu, count in counts.items() if count == least])]
+
+    def acquire(self, job=None, timeout=None):
+        """
+            Blocks until a slot is free and reserves it.
+            :param job: the job that will use the slot, given to the placement policy
+            :param timeout: maximum number of seconds to wait, None waits forever
+            :return: a tuple (gpus, delay), where `gpus` is the list of GPU ids reserved for the job and `delay` is the number of seconds
+            the job should wait before starting (warm-up for shared GPUs). Returns (None, None) if the timeout expired.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.refresh()
+            with self.cond:
+                gpus = self._free_gpus(job)
+                if gpus:
+                    return self._reserve(gpus, job)
+                """
+                    Without placement policy, the slot table only changes in `release`, which notifies the condition. The memory readings
+                    of a placement policy and the table of a broker change by themselves, so they are read again every `poll_interval`
+                    seconds.
+                """
+                wait = self.poll_interval()
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None, None
+                    wait = remaining if wait is None else min(wait, remaining)
+                self.cond.wait(wait)
+
+    def refresh(self):
+        """
+            Reads the probe of the placement policy, at most once every `poll_interval` seconds. Called without holding `self.cond`, such
+            that a slow probe does not block `release` and `quarantine`.
+        """
+        if self.placement is not None:
+            self.placement.refresh()
+
+    def try_acquire(self, job=None):
+        """
+            Non-blocking version of `acquire`, returns (None, None) if there is no free slot. It does not read the probe of the placement
+            policy: call `refresh` before, outside of any event loop since the probe can be slow.
+        """
+        with self.cond:
+            gpus = self._free_gpus(job)
+            if not gpus:
+                return None, None
+            return self._reserve(gpus, job)
+
+    def _reserve(self, gpus, job=None):
+        """
+            Reserves a slot on `gpus` and computes the warm-up delay. Must be called with `self.cond` held.
+        """
+        now = time.monotonic()
+        delay = 0
+        if self.placement is not None:
+            self.placement.started(gpus, job)
+        else:
+            for gpu in gpus:
+                last = self.last_launch[gpu]
+                if self.gpu_processes_count[gpu] > 0 and last is not None:
+                    delay = max(delay, last + self.warmup_seconds - now)
+
+        for gpu in gpus:
+            self.gpu_processes_count[gpu] += 1
+            self.last_launch[gpu] = now + delay
+        self.running += 1
+        return list(gpus), delay
+
+    def poll_interval(self):
+        """
+            Returns how long to wait before looking again for a free slot, None to wait until a slot is released.
+        """
+        intervals = [policy.poll_interval for policy in [self.placement, self.broker] if policy is not None]
+        return min(intervals) if intervals else None
+
+    def release(self, gpus, job=None):
+        """
+            Gives back the slot reserved by `acquire` for `job` and wakes up whoever waits for a slot.
+        """
+        with self.cond:
+            for gpu in gpus:
+                self.gpu_processes_count[gpu] -= 1
+            if self.placement is not None:
+                self.placement.ended(gpus, job)
+            if self.broker is not None:
+                self.broker.release(gpus)
+            self.running -= 1
+            self.cond.notify_all()
+
+    def quarantine(self, gpu):
+        """
+            Stops giving new jobs to `gpu`, for example after repeated CUDA errors. The jobs running on it are not stopped.
+            The next `acquire` raises RuntimeError if no GPU is left (with distributed training, each job needs all GPUs).
+        """
+        with self.cond:
+            self.quarantined.add(gpu)
+            self.cond.notify_all()
+
+    def wait_all(self):
+        """
+            Blocks until all jobs released their slots.
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.running == 0)
+
+    def run_async(self, jobs, launcher):
+        """
+            Dispatches each element of `jobs` as soon as a slot is free and returns when all of them finished. The jobs are started
+            without blocking: `launcher(job, gpus, release)` starts the job and returns immediately, then `release()` must be called when
+            the job ends. No thread is kept per running job, the warm-up delay of shared GPUs is implemented with a timer.
+            Without placement policy, the slot is reserved before the next job is taken from `jobs`, such that adaptive searches
+            (successive halving, Bayesian optimization) choose the next job with the results of all jobs that ended until then.
+            :param jobs: iterable of jobs, consumed lazily
+            :param launcher: callable that starts a job on the given GPUs
+        """
+        jobs = iter(jobs)
+        while True:
+            if self.placement is None:
+                gpus, delay = self.acquire()
+                job = next(jobs, None)
+                if job is None:
+                    self.release(gpus)
+                    break
+            else: # the placement policy needs the job to choose the GPUs
+                job = next(jobs, None)
+                if job is None:
+                    break
+                gpus, delay = self.acquire(job)
+            if delay > 0:
+                threading.Timer(delay, self._launch_job, args=(launcher, job, gpus)).start()
+            else:
+                self._launch_job(launcher, job, gpus)
+        self.wait_all()
+
+    def _launch_job(self, launcher, job, gpus):
+        released = threading.Event()
+
+        def release():
+            if not released.is_set(): # the slot must be given back only once
+                released.set()
+                self.release(gpus, job)
+
+        try:
+            launcher(job, gpus, release)
+        except Exception:
+            traceback.print_exc()
+            release()
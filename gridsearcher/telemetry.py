@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import threading
+import traceback
+
+RESOURCES_FILE = 'resources.csv'
+
+def read_processes():
+    """
+        Reads the process table from /proc: returns a dictionary where key=pid and value=tuple (parent pid, CPU seconds, RSS in MB).
+        Returns an empty dictionary on systems without /proc.
+    """
+    if not os.path.isdir('/proc'):
+        return {}
+    ticks = os.sysconf('SC_CLK_TCK')
+    page_mb = os.sysconf('SC_PAGE_SIZE') / 2**20
+    table = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                stat = f.read()
+        except OSError: # the process ended
+            continue
+        fields = stat[stat.rindex(')') + 2:].split() # the name of the program can contain spaces and parentheses
+        # fields[1] is the parent pid, fields[11] and fields[12] are utime and stime, fields[21] is the RSS in pages
+        table[int(name)] = (int(fields[1]), (int(fields[11]) + int(fields[12])) / ticks, int(fields[21]) * page_mb)
+    return table
+
+def descendants(table, pid, children=None):
+    """
+        Returns the pids of the process `pid` and of all its children, grand-children, ... in the table of read_processes.
+        :param children: optional dictionary where key=pid and value=list of child pids, computed from `table` if not given
+    """
+    if children is None:
+        children = {}
+        for child, (parent, _, _) in table.items():
+            children.setdefault(parent, []).append(child)
+    result, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        if p in table:
+            result.append(p)
+            stack.extend(children.get(p, []))
+    return result
+
+class SweepMonitor:
+    def __init__(self, gpus, max_jobs_per_gpu, interval=5, probe=None):
+        """
+            Samples the resources of the running jobs every `interval` seconds from one thread: CPU usage and RSS of the process tree
+            of each job (from /proc, on Linux) and, if a DeviceProbe is given, the memory and utilization of the GPUs and the GPU memory
+            of each job. Each job gets a small CSV time series in its root folder when it ends, and the sweep gets a summary (slot
+            occupancy, idle gaps, queue wait times) and a timeline in Chrome trace format (open it in chrome://tracing or Perfetto).
+            :param gpus: list of GPU ids of the sweep
+            :param max_jobs_per_gpu: number of slots per GPU, each slot is one row of the timeline
+            :param interval: number of seconds between two samples
+            :param probe: optional DeviceProbe
+        """
+        self.gpus = list(gpus)
+        self.max_jobs = max_jobs_per_gpu
+        self.interval = interval
+        self.probe = probe
+        self.t0 = time.time()
+        self.jobs = {} # key=job_id and value=dictionary with the timing and the samples of the job
+        self.running = {} # key=job_id and value=the attempt that is running
+        self.lanes = {gpu: [None] * max_jobs_per_gpu for gpu in self.gpus} # key=gpu id and value=job_id running in each slot
+        self.gpu_samples = [] # tuples (time, {gpu: (used memory in MB, utilization)})
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def queued(self, job_id):
+        with self.lock:
+            self.jobs[job_id] = dict(queued=time.time(), attempts=[])
+
+    def started(self, job_id, gpus, root):
+        """
+            Records the start of a job in the first free slot of each of its GPUs. A job that is retried gets one attempt per run.
+        """
+        with self.lock:
+            job = self.jobs.setdefault(job_id, dict(queued=None, attempts=[]))
+            lanes = {}
+            for gpu in gpus:
+                slots = self.lanes.setdefault(gpu, [])
+                lane = slots.index(None) if None in slots else len(slots)
+                if lane == len(slots):
+                    slots.append(None)
+                slots[lane] = job_id
+                lanes[gpu] = lane
+            job['root'] = root
+            job['attempts'].append(dict(started=time.time(), ended=None, exit_code=None, lanes=lanes, pid=None, cpu={}, samples=[]))
+            self.running[job_id] = job['attempts'][-1]
+
+    def attach(self, job_id, pid):
+        """
+            Gives the pid of the process of a job. The CPU time already used by the process (e.g. by the previous jobs of a resident
+            worker) is not counted for this job.
+        """
+        table = read_processes()
+        with self.lock:
+            attempt = self.running.get(job_id, None)
+            if attempt is not None:
+                attempt['pid'] = pid
+                attempt['cpu'] = {p: table[p][1] for p in descendants(table, pid)}
+
+    def ended(self, job_id, exit_code):
+        with self.lock:
+            attempt = self.running.pop(job_id, None)
+            if attempt is None:
+                return
+            attempt['ended'] = time.time()
+            attempt['exit_code'] = exit_code
+            for gpu, lane in attempt['lanes'].items():
+                self.lanes[gpu][lane] = None
+            root, samples = self.jobs[job_id]['root'], attempt['samples']
+        try:
+            self._write_samples(root, attempt['started'], samples)
+        except OSError:
+            traceback.print_exc()
+
+    def _loop(self):
+        previous = time.time()
+        while not self.stopped.wait(self.interval):
+            try:
+                now = time.time()
+                self._sample(now, now - previous)
+                previous = now
+            except Exception:
+                traceback.print_exc()
+
+    def _sample(self, now, elapsed):
+        table = read_processes()
+        gpu_memory, gpu_util, process_memory = {}, {}, {}
+        if self.probe is not None:
+            gpu_memory = {gpu: total - free for gpu, (free, total) in self.probe.memory().items()}
+            gpu_util = self.probe.utilization()
+            process_memory = self.probe.process_memory()
+
+        children = {}
+        for child, (parent, _, _) in table.items():
+            children.setdefault(parent, []).append(child)
+
+        with self.lock:
+            self.gpu_samples.append((now, {gpu: (gpu_memory.get(gpu), gpu_util.get(gpu)) for gpu in self.gpus}))
+            for attempt in self.running.values():
+                if attempt['pid'] is None:
+                    continue
+                pids = descendants(table, attempt['pid'], children)
+                cpu = sum(table[p][1] - attempt['cpu'].get(p, 0) for p in pids)
+                attempt['cpu'] = {p: table[p][1] for p in pids}
+                rss = sum(table[p][2] for p in pids)
+                gpu_mb = sum(process_memory.get(p, 0) for p in pids) if process_memory else None
+                utils = [gpu_util[gpu] for gpu in attempt['lanes'] if gpu in gpu_util]
+                attempt['samples'].append((
+                    round(now - attempt['started'], 1),
+                    round(100 * cpu / elapsed, 1) if table else None,
+                    round(rss, 1) if table else None,
+                    None if gpu_mb is None else round(gpu_mb, 1),
+                    round(sum(utils) / len(utils), 1) if utils else None))
+
+    def _write_samples(self, root, started, samples):
+        """
+            Appends the samples of an attempt to resources.csv in the root folder of the job, with one header line per attempt.
+        """
+        if root is None or not os.path.isdir(root):
+            return
+        with open(os.path.join(root, RESOURCES_FILE), 'a') as f:
+            f.write(f'# started at {time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started))}\n')
+            f.write('seconds,cpu_percent,rss_mb,gpu_memory_mb,gpu_utilization\n')
+            for sample in samples:
+                f.write(','.join('' if x is None else str(x) for x in sample) + '\n')
+
+    def summary(self):
+        """
+            Returns a dictionary with the slot occupancy, the idle slot-seconds and the largest idle gaps of the slots, the queue wait
+            times (from the moment a job was generated to its start, including the warm-up delay) and the resources of each job.
+        """
+        with self.lock:
+            attempts = [attempt for job in self.jobs.values() for attempt in job['attempts']]
+            if attempts and all(attempt['ended'] is not None for attempt in attempts):
+                end = max(attempt['ended'] for attempt in attempts) # the end of the last job, not the time of the summary
+            else:
+                end = time.time()
+            slots = sum(len(lanes) for lanes in self.lanes.values())
+            busy = {} # key=(gpu, lane) and value=sorted list of (start, end)
+            waits, jobs = [], []
+            for job_id, job in self.jobs.items():
+                for i, attempt in enumerate(job['attempts']):
+                    stop = attempt['ended'] or end
+                    for gpu, lane in attempt['lanes'].items():
+                        busy.setdefault((gpu, lane), []).append((attempt['started'], stop))
+                    if i == 0 and job['queued'] is not None:
+                        waits.append(attempt['started'] - job['queued'])
+                    samples = attempt['samples']
+                    jobs.append(dict(
+                        job_id=job_id,
+                        root=job['root'],
+                        gpus=list(attempt['lanes'].keys()),
+                        started=round(attempt['started'] - self.t0, 3),
+                        seconds=round(stop - attempt['started'], 3),
+                        exit_code=attempt['exit_code'],
+                        mean_cpu_percent=_mean([s[1] for s in samples]),
+                        peak_rss_mb=_max([s[2] for s in samples]),
+                        peak_gpu_memory_mb=_max([s[3] for s in samples]),
+                        mean_gpu_utilization=_mean([s[4] for s in samples])))
+
+        gaps = [] # tuples (length, gpu, lane, start) of the idle periods of each slot
+        busy_seconds = 0
+        for gpu, lanes in self.lanes.items():
+            for lane in range(len(lanes)):
+                previous = self.t0
+                for start, stop in sorted(busy.get((gpu, lane), [])):
+                    if start > previous:
+                        gaps.append((start - previous, gpu, lane, previous - self.t0))
+                    busy_seconds += stop - start
+                    previous = max(previous, stop)
+                if end > previous:
+                    gaps.append((end - previous, gpu, lane, previous - self.t0))
+
+        capacity = slots * (end - self.t0)
+        waits.sort()
+        return dict(
+            seconds=round(end - self.t0, 3),
+            slots=slots,
+            occupancy=round(busy_seconds / capacity, 4) if capacity > 0 else None,
+            idle_slot_seconds=round(capacity - busy_seconds, 3),
+            largest_gaps=[dict(gpu=gpu, slot=lane, start=round(start, 3), seconds=round(length, 3))
+                          for length, gpu, lane, start in sorted(gaps, key=lambda g: -g[0])[:10]],
+            queue_wait=dict(
+                mean=_mean(waits, digits=3),
+                median=round(waits[len(waits) // 2], 3) if waits else None,
+                max=round(waits[-1], 3) if waits else None),
+            jobs=jobs)
+
+    def chrome_trace(self):
+        """
+            Returns the timeline of the sweep in Chrome trace format: one process per GPU, one thread per slot and one complete event per
+            run of a job, plus counters for the memory and utilization of the GPUs.
+        """
+        us = lambda t: round((t - self.t0) * 1e6)
+        events = []
+        with self.lock:
+            for gpu, lanes in self.lanes.items():
+                pid = self.gpus.index(gpu) if gpu in self.gpus else len(self.gpus)
+                events.append(dict(ph='M', name='process_name', pid=pid, args=dict(name=f'GPU {gpu}')))
+                for lane in range(len(lanes)):
+                    events.append(dict(ph='M', name='thread_name', pid=pid, tid=lane, args=dict(name=f'slot {lane}')))
+            end = time.time()
+            for job_id, job in self.jobs.items():
+                for attempt in job['attempts']:
+                    stop = attempt['ended'] or end
+                    for gpu, lane in attempt['lanes'].items():
+                        events.append(dict(
+                            ph='X',
+                            name=os.path.basename(job['root'].rstrip('/\\')) if job['root'] else job_id[:8],
+                            pid=self.gpus.index(gpu) if gpu in self.gpus else len(self.gpus),
+                            tid=lane,
+                            ts=us(attempt['started']),
+                            dur=us(stop) - us(attempt['started']),
+                            args=dict(job_id=job_id, root=job['root'], exit_code=attempt['exit_code'],
+                                      peak_rss_mb=_max([s[2] for s in attempt['samples']]))))
+            for t, readings in self.gpu_samples:
+                for gpu, (memory, util) in readings.items():
+                    pid = self.gpus.index(gpu)
+                    if memory is not None:
+                        events.append(dict(ph='C', name='memory_mb', pid=pid, ts=us(t), args=dict(used=memory)))
+                    if util is not None:
+                        events.append(dict(ph='C', name='utilization', pid=pid, ts=us(t), args=dict(percent=util)))
+        return dict(traceEvents=events, displayTimeUnit='ms')
+
+    def write(self, summary_path, trace_path):
+        """
+            Writes the summary and the Chrome trace of the sweep and returns the summary.
+        """
+        summary = self.summary()
+        with open(summary_path, 'w') as f:
+            json.dump(summary, f, indent=1)
+        with open(trace_path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        return summary
+
+def _mean(values, digits=1):
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), digits) if values else None
+
+def _max(values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
@@ -1,11 +1,11 @@
 import os
-import random
 import time
-import yaml
+import shlex
+import hashlib
 import platform
-from tqdm import tqdm
 from enum import Enum
-from .file_locker import lock_acquire, lock_release
+from .process import LOG_FILE
+from .metadata import DEFAULT_METADATA
 
 class GSExe(Enum):
     PYTHON = 'python3'
@@ -15,6 +15,11 @@ class GSKeyValSep(Enum):
     SPACE = ' '
     EQUAL = '='
 
+class GSBackend(Enum):
+    SUPERVISOR = 'supervisor' # jobs started with subprocess.Popen and supervised by one thread
+    ASYNC = 'async' # jobs started and awaited by an asyncio event loop
+    RESIDENT = 'resident' # jobs run one after the other in long-lived python processes that import the script once
+
 def validate_constructor_params(
         script: str,
         exe: GSExe = GSExe.PYTHON,
@@ -33,6 +38,7 @@ def pause_process(seconds, message=None):
     """
         Pauses the process for specified number of seconds and prints a message before, if specified.
     """
+    from tqdm import tqdm # imported when a sweep starts, not when the package is imported
     if message is not None:
         print(message)
     for _ in tqdm(range(seconds)):
@@ -48,83 +54,133 @@ def read_yaml(file):
     """
         Reads YAML file and returns a dictionary of the contents.
     """
+    import yaml
     with open(file) as f:
         data = yaml.load(f, Loader=yaml.loader.SafeLoader)
         return data
 
-def waiting_worker(params):
+def grid_size(params_values):
     """
-        This method will run an experiment with a single element of the cartesian product, on a single process.
+        Returns the number of points in the cartesian product of `params_values` without computing it.
     """
-    exe, index, cmd, root, cmd_dict, gpu_processes_count, gpus, max_jobs, dist_train, launch_blocking, torchrun = params
+    size = 1
+    for values in params_values.values():
+        size *= len(values)
+    return size
 
-    n_gpus = len(gpus)
+def sweep_size(scheduling):
     """
-        Each process sleeps index+5 seconds, where index is the command index. This is necessary because the scripts do not allocate
-        GPU memory immediately
-    """
-    time.sleep(index + 5)
-
-    if not dist_train:
-        n_gpus = 1
-        while True:
-            """
-                The shared dictionary gpu_processes_count has key=gpu id and value=number of processes on that GPU
-                We sort this dictionary based on values (item[1]) to get least busy GPUs at the first index
-            """
-            sorted_items = sorted(gpu_processes_count.items(), key=lambda item: item[1]) # this will be a list
-            gpu, count = sorted_items[0] # sort ASC by processes count, this is the least busy GPU (count = current number of jobs on GPU)
-
-            # if there are multiple GPUs with minimal number of processes, then pick a random GPU from them
-            i = 1
-            while i < n_gpus and sorted_items[i][0] == count: # advance i to the first GPU that has a different number of jobs (!= count)
-                i += 1
-            if count < max_jobs: # if we can fit another job there
-                gpu = random.choice([g for g, c in sorted_items[:i]]) # randomly generate a GPU id among the least busy ones)
-                lock_acquire() # acquire the lock to change the shared dictionary gpu_processes_count
-                gpu_processes_count[gpu] += 1 # increase number of jobs for the GPU
-                lock_release()
-                break
-
-            print(f'All GPUs in have {max_jobs} jobs, waiting 60 seconds...')
-            time.sleep(60)
-
-    # create the root folder, e.g. param_name_for_exp_root_folder
-    os.makedirs(root, exist_ok=True)
-
-    # write all parameters to the arguments file
-    with open(os.path.join(root, 'arguments.txt'), 'w') as w:
-        for k, v in cmd_dict.items():
-            if k.startswith('_'):
-                w.write(f'{k[1:]}={v}\n')
-
-    # set CUDA_VISIBLE_DEVICES variable
-    if dist_train:
-        gpus = ",".join(map(str, gpus))
-        cvd = f'CUDA_VISIBLE_DEVICES={gpus}'
-    else:
-        cvd = f'CUDA_VISIBLE_DEVICES={gpu}' # the randomly chosen GPU
+        Returns the number of jobs of a sweep from its `scheduling` dictionary, or None for successive halving, whose number of jobs is
+        decided while it runs.
+    """
+    if 'bayesopt' in scheduling:
+        return scheduling['bayesopt']['n_trials']
+    if 'sampling' in scheduling:
+        return scheduling['sampling']['n']
+    if 'halving' in scheduling:
+        return None
+    return grid_size(scheduling['params_values'])
+
+def sweep_folder(exp_folder):
+    """
+        Returns the folder that contains all root folders of a sweep, which is the part of `exp_folder` before the first placeholder.
+        Example: for Template('./results/${wandb_project}/lr=${lr}') the sweep folder is './results'
+        :param exp_folder: Template or string given to GridSearcher.run
+    """
+    path = exp_folder.template if hasattr(exp_folder, 'template') else exp_folder
+    if '$' not in path:
+        return os.path.dirname(path) or '.'
+    return os.path.dirname(path[:path.index('$')]) or '.'
+
+def sweep_depth(exp_folder):
+    """
+        Returns the number of folder levels between `sweep_folder(exp_folder)` and the root folders of the runs.
+        Example: for Template('./results/${wandb_project}/lr=${lr}') the depth is 2
+    """
+    path = exp_folder.template if hasattr(exp_folder, 'template') else exp_folder
+    rest = os.path.relpath(os.path.normpath(path), os.path.normpath(sweep_folder(exp_folder)))
+    return len([part for part in rest.replace('\\', '/').split('/') if part])
+
+def sweep_id(script, exp_folder):
+    """
+        Returns a short identifier of a sweep, computed from the script and the exp_folder template.
+        It is used to name the sweep-level files (lock, etc.) stored in `sweep_folder(exp_folder)`.
+    """
+    path = exp_folder.template if hasattr(exp_folder, 'template') else exp_folder
+    return hashlib.md5(f'{script}|{path}'.encode()).hexdigest()[:12]
 
-    # set CUDA_LAUNCH_BLOCKING variable
-    clb = 'CUDA_LAUNCH_BLOCKING=1' if launch_blocking else ''
+def sweep_file(script, exp_folder, name):
+    """
+        Returns the path of a sweep-level file, e.g. sweep_file(script, exp_folder, 'lock') is "<sweep folder>/.gridsearcher_<sweep id>.lock"
+    """
+    return os.path.join(sweep_folder(exp_folder), f'.gridsearcher_{sweep_id(script, exp_folder)}.{name}')
+
+def prepare_job(params, gpus, echo=True, metadata=None):
+    """
+        Prepares an experiment with a single element of the cartesian product: creates its root folder, writes the arguments file and
+        builds the program arguments and the environment of the job.
+        :param params: tuple (exe, cmd, root, cmd_dict, launch_blocking, torchrun, max_log_bytes, log_backups)
+        :param gpus: list of GPU ids reserved for this run
+        :param echo: whether to print the command
+        :param metadata: JobMetadata recording the arguments, defaults to an atomic arguments.txt in the root folder
+        :return: a tuple (args, env)
+    """
+    exe, cmd, root, cmd_dict, launch_blocking, torchrun, max_log_bytes, log_backups = params
+    n_gpus = len(gpus)
 
+    # create the root folder, e.g. param_name_for_exp_root_folder, and write all parameters to the arguments file
+    (metadata or DEFAULT_METADATA).write_arguments(root, cmd_dict)
+
+    env = dict(os.environ)
+    env['CUDA_VISIBLE_DEVICES'] = ','.join(map(str, gpus)) # all GPUs for distributed training, otherwise the GPU chosen by the scheduler
+    if launch_blocking:
+        env['CUDA_LAUNCH_BLOCKING'] = '1'
+
+    # the command is split like a shell would do it, e.g. "--lr_decay_at 82 123" gives three arguments
+    args = shlex.split(cmd, posix=not on_windows())
     if torchrun:
-        single_proc_extra_args = '--rdzv-backend=c10d --rdzv-endpoint=localhost:0' if n_gpus == 1 else ''
-        cmd = f'{clb} {cvd} torchrun --standalone --nnodes=1 --nproc-per-node={n_gpus} {single_proc_extra_args} {cmd}'.strip()
+        single_proc_extra_args = ['--rdzv-backend=c10d', '--rdzv-endpoint=localhost:0'] if n_gpus == 1 else []
+        args = ['torchrun', '--standalone', '--nnodes=1', f'--nproc-per-node={n_gpus}', *single_proc_extra_args, *args]
     else:
-        cmd = f'{clb} {cvd} {exe} {cmd}'.strip()
+        args = [exe, *args]
 
-    print(cmd)
-    os.system(cmd)
+    if echo:
+        print(f'CUDA_VISIBLE_DEVICES={env["CUDA_VISIBLE_DEVICES"]}', ' '.join(args))
+    return args, env
 
-    # write state.finished file to mark that the experiment was finished
-    with open(os.path.join(root, 'state.finished'), 'w'):
-        pass
+def mark_finished(root, exit_code, metadata=None):
+    """
+        Writes state.finished file to mark that the experiment was finished (a crashed experiment will be run again at the next launch)
+    """
+    (metadata or DEFAULT_METADATA).mark_finished(root, exit_code)
 
-    if not dist_train: # if we are not in distributed settings, decrease the number of processes for the GPU that finished the run
-        lock_acquire()
-        gpu_processes_count[gpu] -= 1
-        lock_release()
+def launch_worker(params, gpus, supervisor, on_exit, echo=True, metadata=None):
+    """
+        This method starts an experiment with a single element of the cartesian product and returns immediately.
+        The job is started with subprocess.Popen without a shell, its stdout and stderr go to a size-capped rotating log file in its root
+        folder and `supervisor` calls `on_exit(exit_code)` when it ends.
+        :param params: tuple (exe, cmd, root, cmd_dict, launch_blocking, torchrun, max_log_bytes, log_backups)
+        :param gpus: list of GPU ids reserved for this run
+        :param supervisor: ProcessSupervisor
+        :param on_exit: callable receiving the exit code of the job
+        :param echo: whether to print the command
+        :param metadata: optional JobMetadata (see prepare_job)
+        :return: JobHandle
+    """
+    root, max_log_bytes, log_backups = params[2], params[6], params[7]
+    args, env = prepare_job(params, gpus, echo, metadata)
+
+    def job_ended(exit_code):
+        mark_finished(root, exit_code, metadata)
+        on_exit(exit_code)
+
+    return supervisor.launch(
+        args=args,
+        env=env,
+        log_path=os.path.join(root, LOG_FILE),
+        on_exit=job_ended,
+        max_log_bytes=max_log_bytes,
+        log_backups=log_backups)
 
 # def wait_for_gpus_of_user(gpus, max_jobs=None, timeout_seconds=60):
 #     """
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from gridsearcher.bayesopt import BayesianSearch, GaussianProcess
+from gridsearcher.sampling import Uniform
+
+def make_search(**kwargs):
+    return BayesianSearch(params_values=dict(x=Uniform(0, 1), y=Uniform(0, 1)), make_job=None, metric='loss', n_trials=100, n_initial=8,
+                          seed=0, **kwargs)
+
+def loss(config):
+    return (config[0] - 0.8) ** 2 + (config[1] - 0.3) ** 2
+
+def run(search, n, diverged=()):
+    """
+        Asks and tells `n` configurations, the ones whose index is in `diverged` report NaN.
+    """
+    for i in range(n):
+        config = search.ask()
+        search.tell(config, float('nan') if i in diverged else loss(config))
+
+@pytest.mark.parametrize('value', [float('nan'), float('inf'), None])
+def test_failed_or_diverged_result_gets_the_worst_value(value):
+    search = make_search()
+    run(search, 8)
+    config = search.ask()
+    search.tell(config, value)
+    assert search.observed[config] == max(loss(c) for c in search.observed if c != config)
+
+def test_ask_is_still_guided_after_nan_results():
+    search = make_search()
+    run(search, 30, diverged={3, 10, 20})
+    assert all(np.isfinite(v) for v in search.observed.values())
+    config = search.ask()
+    assert np.isfinite(search.gp.alpha).all() and config not in search.observed
+    assert min(loss(c) for c in search.observed) < 0.008 # the suggestions converge to the minimum at (0.8, 0.3)
+
+def test_maximization_keeps_the_best_result():
+    search = make_search(mode='max')
+    for i in range(10):
+        config = search.ask()
+        search.tell(config, -loss(config))
+    best, value = search.best()
+    assert value == max(-loss(c) for c in search.observed)
+
+def test_gaussian_process_interpolates():
+    x = np.random.default_rng(0).random((20, 2))
+    y = np.sin(3 * x[:, 0]) + x[:, 1]
+    mean, std = GaussianProcess(seed=0).fit(x, y).predict(x)
+    assert np.allclose(mean, y, atol=0.05)
+    assert (std < 0.1).all()
+
+def test_gaussian_process_duplicated_points():
+    x = np.zeros((5, 2)) # singular kernel matrix without noise
+    y = np.arange(5.0)
+    mean, _ = GaussianProcess(seed=0, n_restarts=4).fit(x, y).predict(x[:1])
+    assert np.isfinite(mean).all()
@@ -0,0 +1,73 @@
+import os
+import pytest
+from gridsearcher.broker import SlotBroker
+
+@pytest.fixture
+def folder(tmp_path):
+    return str(tmp_path / 'broker')
+
+def test_global_limit_is_the_smallest_max_jobs(folder):
+    a = SlotBroker(gpus=[0], max_jobs_per_gpu=3, folder=folder).register()
+    b = SlotBroker(gpus=[0], max_jobs_per_gpu=2, folder=folder).register()
+    assert a.try_acquire([0]) == [0]
+    assert b.try_acquire([0]) == [0]
+    assert a.try_acquire([0]) == [] # 2 jobs on GPU 0, the limit of b
+    b.release([0])
+    assert a.try_acquire([0]) == [0]
+    a.close()
+    b.close()
+
+def test_waiting_sweep_with_smaller_share_goes_first(folder):
+    a = SlotBroker(gpus=[0], max_jobs_per_gpu=2, folder=folder).register()
+    b = SlotBroker(gpus=[0], max_jobs_per_gpu=2, folder=folder).register()
+    assert a.try_acquire([0]) == [0]
+    assert a.try_acquire([0]) == [0]
+    assert b.try_acquire([0]) == [] # full, b waits with 0 slots
+    a.release([0])
+    assert a.try_acquire([0]) == [] # a holds 1 slot, the free slot goes to b
+    assert b.try_acquire([0]) == [0]
+    a.close()
+    b.close()
+
+@pytest.mark.parametrize('weight, expected', [(1, []), (2, [0])])
+def test_weight_scales_the_share(folder, weight, expected):
+    a = SlotBroker(gpus=[0], max_jobs_per_gpu=4, weight=weight, folder=folder).register()
+    b = SlotBroker(gpus=[0], max_jobs_per_gpu=4, folder=folder).register()
+    for _ in range(3):
+        assert a.try_acquire([0]) == [0]
+    assert b.try_acquire([0]) == [0]
+    assert b.try_acquire([0]) == [] # full, b waits with a share of 1
+    a.release([0])
+    assert a.try_acquire([0]) == expected # a holds 2 slots: a share of 2 with weight 1, 1 with weight 2
+    a.close()
+    b.close()
+
+def test_least_loaded_gpu_and_all_of(folder):
+    a = SlotBroker(gpus=[0, 1], max_jobs_per_gpu=2, folder=folder).register()
+    assert a.try_acquire([0, 1]) == [0]
+    assert a.try_acquire([0, 1]) == [1]
+    assert a.try_acquire([0, 1], all_of=True) == [0, 1]
+    assert a.try_acquire([0, 1], all_of=True) == []
+    a.close()
+
+def test_closed_sweep_gives_back_its_slots(folder):
+    a = SlotBroker(gpus=[0], max_jobs_per_gpu=1, folder=folder).register()
+    b = SlotBroker(gpus=[0], max_jobs_per_gpu=1, folder=folder).register()
+    assert a.try_acquire([0]) == [0]
+    assert b.try_acquire([0]) == []
+    a.close()
+    assert b.try_acquire([0]) == [0]
+    b.close()
+
+def test_missing_alive_file_and_lost_table(folder):
+    a = SlotBroker(gpus=[0], max_jobs_per_gpu=2, folder=folder).register()
+    b = SlotBroker(gpus=[0], max_jobs_per_gpu=2, folder=folder).register()
+    assert b.try_acquire([0]) == [0]
+    os.remove(os.path.join(folder, f'{b.key}.alive'))
+    assert len(a.sweeps()) == 2 # the PID of b is alive, b is not removed
+    os.remove(os.path.join(folder, 'table.json'))
+    assert b.try_acquire([0]) == [0] # b adds its entry again with the slot it holds
+    assert sorted(sum(sweep['held'].values()) for sweep in a.sweeps()) == [2]
+    assert a.try_acquire([0]) == [] # the 2 slots of b are counted
+    a.close()
+    b.close()
@@ -0,0 +1,82 @@
+import json
+import pytest
+from string import Template
+import gridsearcher.gridsearcher
+from gridsearcher.cli import main, load_spec, parse_values
+from gridsearcher.file_locker import FileLock
+from gridsearcher.sampling import LogUniform, IntUniform
+from gridsearcher.tools import sweep_file
+
+SCRIPT = '''
+import sys, os
+out = sys.argv[sys.argv.index('--out') + 1]
+with open(os.path.join(os.path.dirname(os.path.dirname(out)), 'runs.txt'), 'a') as f:
+    f.write(sys.argv[sys.argv.index('--lr') + 1] + '\\n')
+'''
+
+SPEC = '''
+script: {script}
+param_name_for_exp_root_folder: out
+exp_folder: {folder}/sweep/lr=${{lr}}
+scheduling:
+  gpus: [0]
+  max_jobs_per_gpu: 2
+  warmup_seconds: 0
+  progress: {{terminal: false}}
+  params_values:
+    lr: [1, 2, 3]
+'''
+
+def write_spec(tmp_path, monkeypatch):
+    monkeypatch.setattr(gridsearcher.gridsearcher, 'pause_process', lambda *args, **kwargs: None)
+    script = tmp_path / 'script.py'
+    script.write_text(SCRIPT)
+    spec = tmp_path / 'sweep.yaml'
+    spec.write_text(SPEC.format(script=script, folder=tmp_path))
+    return str(spec)
+
+def runs(tmp_path):
+    path = tmp_path / 'runs.txt'
+    return sorted(path.read_text().split()) if path.exists() else []
+
+def status(spec, capsys):
+    capsys.readouterr()
+    assert main([spec, '--status', '--json']) == 0
+    return json.loads(capsys.readouterr().out)
+
+def test_load_spec_and_values(tmp_path):
+    spec = tmp_path / 'sweep.yaml'
+    spec.write_text('script: train.py\nparam_name_for_exp_root_folder: out\nexp_folder: ./results/${lr}\nscheduling: {gpus: [0]}\n')
+    with pytest.raises(AssertionError, match='scheduling.max_jobs_per_gpu'):
+        load_spec(str(spec))
+    assert parse_values(0.1) == [0.1]
+    assert isinstance(parse_values(dict(log_uniform=[1e-4, 1e-1])), LogUniform)
+    assert isinstance(parse_values(dict(int_uniform=[1, 8])), IntUniform)
+
+def test_status_and_resume_refusal(tmp_path, monkeypatch, capsys):
+    spec = write_spec(tmp_path, monkeypatch)
+    assert status(spec, capsys) == dict(script=str(tmp_path / 'script.py'), folder=str(tmp_path / 'sweep'), total=3, running=False,
+                                        source='folders', finished=0)
+    assert main([spec]) == 0
+    assert runs(tmp_path) == ['1', '2', '3']
+    assert status(spec, capsys)['finished'] == 3
+
+    (tmp_path / 'runs.txt').unlink()
+    assert main([spec]) == 1 # runs already finished
+    assert 'use --resume' in capsys.readouterr().err
+    assert runs(tmp_path) == []
+    assert main([spec, '--resume']) == 0
+    assert runs(tmp_path) == [] # all runs finished
+
+def test_refuses_to_start_while_a_launcher_runs(tmp_path, monkeypatch, capsys):
+    spec = write_spec(tmp_path, monkeypatch)
+    lock = FileLock(sweep_file(str(tmp_path / 'script.py'), Template(f'{tmp_path}/sweep/lr=${{lr}}'), 'lock'))
+    lock.acquire()
+    try:
+        assert status(spec, capsys)['running']
+        assert main([spec]) == 1
+        assert 'already running' in capsys.readouterr().err
+        assert runs(tmp_path) == []
+    finally:
+        lock.release()
+    assert not status(spec, capsys)['running']
@@ -0,0 +1,83 @@
+import random
+from string import Template
+from itertools import product
+import pytest
+from gridsearcher import GridSearcher
+from gridsearcher.gridsearcher import backward_key_replace
+
+def make_searcher():
+    gs = GridSearcher(script='train.py', defaults=dict(epochs=10, bs=32))
+    gs.add_param('model.name', 'resnet18')
+    gs.add_param('use-amp', True)
+    gs.add_param('no_wandb', False)
+    gs.add_param('lr_decay_at', [82, 123])
+    gs.add_param('tag', Template('E=${epochs}_bs=${bs}')) # only static inputs, filled once
+    gs.add_param('wandb_name', Template('${tag}_lr=${lr}_seed=${seed}'))
+    gs.add_param('log', Template('${out}/log.txt')) # uses the root folder
+    return gs
+
+PARAMS_VALUES = dict(lr=[0.1, 0.01], seed=[0, 1, 2], optimizerDOTname=['sgd', 'adam'])
+EXP_FOLDER = Template('/results/${tag}/lr=${lr}_${optimizerDOTname}/seed=${seed}')
+
+def legacy_commands(gs, points):
+    """
+        Reference builder: fills all templates with the values of gs.__dict__ and formats all parameters again for each point, as
+        GridSearcher did before the compiled command.
+    """
+    def fill(template):
+        if isinstance(template, str):
+            return template
+        return template.substitute(**{k[1:]: v for k, v in gs.__dict__.items() if k.startswith('_')})
+
+    for values in points:
+        for k, v in zip(PARAMS_VALUES.keys(), values):
+            gs.add_param(k, v)
+        for k, v in list(gs.__dict__.items()):
+            if k.startswith('template_') and k != 'template_log':
+                gs.__dict__[k.replace('template', '')] = fill(v)
+        root = fill(EXP_FOLDER)
+        gs.add_param('out', root)
+        gs.__dict__['_log'] = fill(gs.template_log)
+        args = []
+        for k, v in gs.__dict__.items():
+            if k.startswith('_'):
+                if isinstance(v, bool):
+                    if v:
+                        args.append(f'--{backward_key_replace(k[1:])}')
+                else:
+                    args.append(f'--{backward_key_replace(k[1:])} {v}')
+        yield f'train.py {" ".join(args)}', root, {k: v for k, v in gs.__dict__.items() if k.startswith('_')}
+
+def compiled_commands(gs, points):
+    gs.exp_folder_template = EXP_FOLDER
+    return gs._iter_grid('out', PARAMS_VALUES, points)
+
+@pytest.mark.parametrize('shuffle', [False, True])
+def test_compiled_command_matches_legacy_builder(shuffle):
+    points = list(product(*PARAMS_VALUES.values()))
+    if shuffle: # several parameters change between consecutive points
+        random.Random(0).shuffle(points)
+    expected = list(legacy_commands(make_searcher(), points))
+    actual = list(compiled_commands(make_searcher(), points))
+    assert actual == expected
+
+def test_compiled_command_first_point():
+    cmd, root, cmd_dict = next(compiled_commands(make_searcher(), [(0.1, 0, 'sgd')]))
+    assert root == '/results/E=10_bs=32/lr=0.1_sgd/seed=0'
+    assert cmd == ('train.py --epochs 10 --bs 32 --model.name resnet18 --use-amp --lr_decay_at 82 123 --tag E=10_bs=32 '
+                   '--wandb_name E=10_bs=32_lr=0.1_seed=0 --log /results/E=10_bs=32/lr=0.1_sgd/seed=0/log.txt --lr 0.1 --seed 0 '
+                   '--optimizer.name sgd --out /results/E=10_bs=32/lr=0.1_sgd/seed=0')
+    assert None not in cmd_dict.values()
+
+def test_unknown_placeholder_fails_before_launch():
+    gs = make_searcher()
+    gs.add_param('run', Template('${tag}_${missing}'))
+    with pytest.raises(RuntimeError, match='unknown parameters'):
+        compiled_commands(gs, [])
+
+def test_cyclic_templates_fail_before_launch():
+    gs = make_searcher()
+    gs.add_param('a', Template('${b}'))
+    gs.add_param('b', Template('${a}'))
+    with pytest.raises(RuntimeError, match='cyclic reference'):
+        compiled_commands(gs, [])
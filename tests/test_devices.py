@@ -0,0 +1,70 @@
+import json
+import time
+import pytest
+from gridsearcher.devices import FileProbe, MemoryPlacement
+from gridsearcher.scheduler import GPUScheduler
+
+def write_memory(path, free):
+    with open(path, 'w') as f:
+        json.dump({str(gpu): dict(free=mb, total=16000) for gpu, mb in free.items()}, f)
+
+def make_scheduler(path, free, gpus=(0, 1), **kwargs):
+    write_memory(path, free)
+    placement = MemoryPlacement(FileProbe(str(path)), reserve_mb=0, poll_interval=0, **kwargs)
+    return GPUScheduler(list(gpus), max_jobs_per_gpu=4, placement=placement)
+
+def place(scheduler, job):
+    scheduler.refresh()
+    gpus, _ = scheduler.try_acquire(job)
+    return gpus
+
+def test_best_fit_and_settling(tmp_path):
+    path = tmp_path / 'memory.json'
+    scheduler = make_scheduler(path, {0: 10000, 1: 5000}, footprint=3000)
+    assert place(scheduler, 'a') == [1] # the fullest GPU where the job fits
+    assert place(scheduler, 'b') == [0] # GPU 1 waits for the memory of job a
+    assert place(scheduler, 'c') is None # both GPUs are settling
+
+    write_memory(path, {0: 10000, 1: 2000}) # job a allocated its memory, job b did not yet
+    assert place(scheduler, 'c') is None # 2000 MB left on GPU 1, GPU 0 still settling
+    write_memory(path, {0: 7000, 1: 2000})
+    assert place(scheduler, 'c') == [0]
+
+def test_settle_timeout(tmp_path):
+    path = tmp_path / 'memory.json'
+    scheduler = make_scheduler(path, {0: 10000}, gpus=[0], footprint=3000, settle_timeout=0.2)
+    assert place(scheduler, 'a') == [0]
+    assert place(scheduler, 'b') is None # the memory of job a never shows up
+    time.sleep(0.25)
+    assert place(scheduler, 'b') == [0]
+
+def test_unknown_footprint_is_learned(tmp_path):
+    path = tmp_path / 'memory.json'
+    scheduler = make_scheduler(path, {0: 10000, 1: 10000})
+    assert place(scheduler, 'a') == [0]
+    assert place(scheduler, 'b') == [1] # the other GPU is empty
+    assert place(scheduler, 'c') is None # unknown footprint: only empty GPUs
+
+    write_memory(path, {0: 6000, 1: 6000})
+    assert place(scheduler, 'c') is None # the memory changed, the jobs settle when the next reading is the same
+    assert place(scheduler, 'c') == [0]
+    assert scheduler.placement.learned_mb == 4000
+
+def test_release_ends_settling(tmp_path):
+    path = tmp_path / 'memory.json'
+    scheduler = make_scheduler(path, {0: 10000}, gpus=[0], footprint=3000)
+    assert place(scheduler, 'a') == [0]
+    scheduler.release([0], 'a')
+    assert place(scheduler, 'b') == [0]
+
+def test_gpu_missing_from_probe(tmp_path):
+    path = tmp_path / 'memory.json'
+    with pytest.raises(ValueError, match=r'\[2\]'):
+        make_scheduler(path, {0: 10000, 1: 10000}, gpus=[0, 1, 2])
+    with pytest.raises(ValueError): # string ids while the probe reports integers
+        make_scheduler(path, {0: 10000}, gpus=['0'])
+
+    scheduler = make_scheduler(path, {0: 10000, 1: 10000}, footprint=3000)
+    write_memory(path, {0: 10000}) # GPU 1 disappears during the sweep
+    with pytest.raises(ValueError):
+        place(scheduler, 'a')
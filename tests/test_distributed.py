@@ -0,0 +1,58 @@
+import sys
+import time
+import threading
+from collections import Counter
+from gridsearcher.distributed import Coordinator, WorkerAgent
+
+def make_jobs(folder, n_jobs, sleep):
+    for i in range(n_jobs):
+        root = str(folder / f'job_{i}')
+        cmd = f'-c "import time; time.sleep({sleep})" --root {root}'
+        yield f'job_{i}', (sys.executable, cmd, root, dict(_root=root), False, False, 2**20, 1)
+
+def run_sweep(folder, n_jobs, sleep, agents, lease_timeout=5):
+    """
+        Runs a coordinator on a free port and one thread per agent, returns (exit codes per job, jobs started per agent, errors raised
+        by the agents).
+    """
+    coordinator = Coordinator(make_jobs(folder, n_jobs, sleep), host='127.0.0.1', port=0, lease_timeout=lease_timeout)
+    ended, started, errors = {}, Counter(), []
+    coordinator.on_start = lambda job_id, gpus: started.update([gpus[0].split('/')[0]])
+    coordinator.on_exit = lambda job_id, exit_code: ended.setdefault(job_id, []).append(exit_code)
+    server = threading.Thread(target=coordinator.serve)
+    server.start()
+    while coordinator.server is None or coordinator.port == 0:
+        time.sleep(0.01)
+
+    def run(agent):
+        try:
+            agent.run()
+        except Exception as e:
+            errors.append(e)
+
+    threads = []
+    for name, kwargs in agents:
+        agent = WorkerAgent('127.0.0.1', coordinator.port, gpus=[0], warmup_seconds=0, heartbeat_interval=0.2, name=name, **kwargs)
+        threads.append(threading.Thread(target=run, args=(agent,)))
+        threads[-1].start()
+    server.join(timeout=30)
+    for thread in threads:
+        thread.join(timeout=30)
+    assert not server.is_alive() and not any(thread.is_alive() for thread in threads)
+    return ended, started, errors
+
+def test_two_agents_run_each_job_once(tmp_path):
+    ended, started, errors = run_sweep(tmp_path, 8, 0.2, [('a', dict(poll_interval=0.1)), ('b', dict(poll_interval=0.1))])
+    assert errors == []
+    assert ended == {f'job_{i}': [0] for i in range(8)}
+    assert set(started) == {'a', 'b'}
+
+def test_agent_polling_when_the_sweep_ends_stops_cleanly(tmp_path, capsys):
+    """
+        The only job runs on one agent while the other one sleeps in its poll loop for longer than the coordinator waits after the end
+        of the sweep: it finds the connection closed when it wakes up and must stop without raising.
+    """
+    ended, started, errors = run_sweep(tmp_path, 1, 1, [('a', dict(poll_interval=3)), ('b', dict(poll_interval=3))], lease_timeout=1)
+    assert errors == []
+    assert ended == {'job_0': [0]}
+    assert 'lost the connection to the coordinator' in capsys.readouterr().out
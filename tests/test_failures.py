@@ -0,0 +1,65 @@
+import time
+from gridsearcher.failures import classify_failure, RetryQueue, GPUQuarantine, OOM, CUDA, SIGNAL, ERROR
+from gridsearcher.scheduler import GPUScheduler
+
+def test_classify_failure(tmp_path):
+    log = tmp_path / 'output.log'
+    log.write_bytes(b'epoch 1\nRuntimeError: CUDA error: out of memory\n')
+    assert classify_failure(0, str(log)) is None
+    assert classify_failure(1, str(log)) == OOM # checked before the generic CUDA errors
+    log.write_bytes(b'RuntimeError: CUDA error: an illegal memory access was encountered\n')
+    assert classify_failure(1, str(log)) == CUDA
+    assert classify_failure(1, str(log), offset=log.stat().st_size) == ERROR # the error was printed by a previous attempt
+    assert classify_failure(-9, str(tmp_path / 'missing.log')) == SIGNAL
+    assert classify_failure(137, str(tmp_path / 'missing.log')) == SIGNAL
+    assert classify_failure(None, str(tmp_path / 'missing.log')) == ERROR
+
+def test_retry_after_backoff():
+    queue = RetryQueue([('a', 1), ('b', 2)], max_retries=2, backoff_seconds=0.1)
+    jobs = iter(queue)
+    assert next(jobs) == ('a', 1)
+    assert queue.ended('a', CUDA)
+    assert next(jobs) == ('b', 2) # the retry of a is not due yet
+    queue.ended('b', None)
+
+    begin = time.monotonic()
+    assert next(jobs) == ('a', 1) # blocks until the retry is due
+    assert time.monotonic() - begin >= 0.09
+    assert queue.ended('a', OOM)
+    begin = time.monotonic()
+    assert next(jobs) == ('a', 1)
+    assert time.monotonic() - begin >= 0.19 # the backoff doubles
+    assert not queue.ended('a', OOM) # max_retries reached
+    assert next(jobs, None) is None
+    assert queue.retries == {'a': 2}
+
+def test_retry_only_given_kinds():
+    retried = []
+    queue = RetryQueue([('a', 1), ('b', 2)], max_retries=3, backoff_seconds=0, retry_on=(OOM,),
+                       on_retry=lambda job_id, failure, attempt, delay: retried.append((job_id, failure, attempt)))
+    jobs = iter(queue)
+    assert next(jobs) == ('a', 1)
+    assert not queue.ended('a', ERROR)
+    assert next(jobs) == ('b', 2)
+    assert queue.ended('b', OOM)
+    assert next(jobs) == ('b', 2)
+    queue.ended('b', None)
+    assert next(jobs, None) is None
+    assert retried == [('b', OOM, 1)]
+
+def test_quarantine_threshold_and_window():
+    scheduler = GPUScheduler([0, 1], max_jobs_per_gpu=1)
+    quarantined = []
+    quarantine = GPUQuarantine(scheduler, max_failures=2, window_seconds=0.2,
+                               on_quarantine=lambda gpu, failure, n_failures: quarantined.append((gpu, n_failures)))
+    quarantine.failed([0], CUDA)
+    quarantine.failed([0], OOM) # not attributed to the GPU
+    quarantine.failed([0], None)
+    assert scheduler.quarantined == set()
+    time.sleep(0.25)
+    quarantine.failed([0], CUDA) # the first failure left the window
+    assert scheduler.quarantined == set()
+    quarantine.failed([0], CUDA)
+    assert scheduler.quarantined == {0}
+    assert quarantined == [(0, 2)]
+    assert scheduler.acquire() == ([1], 0) # new jobs only go to GPU 1
@@ -0,0 +1,76 @@
+import os
+from gridsearcher.halving import SuccessiveHalving, log_metrics, read_metric, budgets
+
+CONFIGS = [(x,) for x in [5, 3, 8, 1, 7, 2, 9, 4, 6]]
+
+def make_search(folder, configs=CONFIGS, **kwargs):
+    def make_job(values, budget):
+        job_id = f'{values[0]}_{budget}'
+        root = os.path.join(folder, job_id)
+        return job_id, root, (job_id, values[0], budget, root)
+    return SuccessiveHalving(configs, make_job, 'loss', min_budget=1, max_budget=9, eta=3, **kwargs)
+
+def run(search, fail=()):
+    """
+        Runs the jobs one after the other: the loss of x with budget b is x / b and the configurations in `fail` crash.
+        Returns the list of (x, budget) in the order the jobs were started.
+    """
+    runs = []
+    for job_id, x, budget, root in search:
+        os.makedirs(root, exist_ok=True)
+        runs.append((x, budget))
+        if x in fail:
+            search.ended(job_id, 1)
+        else:
+            log_metrics(root, epoch=budget)
+            log_metrics(root, loss=x / budget)
+            search.ended(job_id, 0)
+    return runs
+
+def test_budgets():
+    assert budgets(1, 9, 3) == [1, 3, 9]
+    assert budgets(1, 10, 3) == [1, 3, 9, 10]
+    assert budgets(5, 5, 3) == [5]
+
+def test_read_metric(tmp_path):
+    assert read_metric(str(tmp_path), 'loss') is None
+    log_metrics(str(tmp_path), loss=0.5)
+    log_metrics(str(tmp_path), acc=0.9)
+    with open(tmp_path / 'metrics.jsonl', 'a') as f:
+        f.write('{"loss": 0.') # line being written
+    assert read_metric(str(tmp_path), 'loss') == 0.5
+
+def test_promotion_from_metrics(tmp_path):
+    search = make_search(str(tmp_path))
+    runs = run(search)
+    """
+        The best 1/3 of the results of a rung are promoted as soon as they are known, before a new configuration starts: 3 is the best
+        of (5, 3, 8), 1 becomes the best of 4 results, 2 is in the best 2 of 6 results and 1 is the best of the 3 results of rung 3.
+    """
+    assert runs == [(5, 1), (3, 1), (8, 1), (3, 3), (1, 1), (1, 3), (7, 1), (2, 1), (2, 3), (1, 9), (9, 1), (4, 1), (6, 1)]
+    assert search.best() == ((1,), 9, 1 / 9)
+
+def test_failed_jobs_are_not_promoted(tmp_path):
+    search = make_search(str(tmp_path), configs=[(1,), (2,), (3,)])
+    assert run(search, fail=(1,)) == [(1, 1), (2, 1), (3, 1), (2, 3)]
+    assert search.best() == ((2,), 3, 2 / 3)
+
+def test_max_mode(tmp_path):
+    search = make_search(str(tmp_path), configs=[(1,), (2,), (3,)], mode='max')
+    assert run(search) == [(1, 1), (2, 1), (3, 1), (3, 3)]
+    assert search.best() == ((3,), 3, 1)
+
+def test_resume_reads_the_metrics_of_ended_jobs(tmp_path):
+    first = make_search(str(tmp_path))
+    run(first)
+    is_done = lambda job_id, root: read_metric(root, 'loss') is not None
+    second = make_search(str(tmp_path), is_done=is_done)
+    assert run(second) == []
+    assert second.best() == first.best()
+
+def test_hyperband_brackets_start_at_higher_rungs(tmp_path):
+    search = make_search(str(tmp_path), brackets=3)
+    assert [len(bracket['waiting']) for bracket in search.brackets] == [6, 2, 1]
+    runs = run(search)
+    assert runs == [(5, 1), (3, 1), (1, 1), (1, 3), (2, 1), (4, 1), (6, 1), (2, 3), (8, 3), (9, 3), (7, 9)]
+    assert search.best() == ((7,), 9, 7 / 9) # the only configuration that reached the largest budget
@@ -0,0 +1,58 @@
+import os
+from gridsearcher.identity import effective_params, config_hash, GlobalIndex, link_result, ROOT_PLACEHOLDER
+
+def finished_root(folder, name):
+    root = os.path.join(folder, name)
+    os.makedirs(root)
+    open(os.path.join(root, 'state.finished'), 'w').close()
+    return root
+
+def test_effective_params_without_root():
+    cmd_dict = dict(_lr=0.1, _root='/exp/lr=0.1', _log='/exp/lr=0.1/log.txt', _tag=None)
+    assert effective_params(cmd_dict, 'root', '/exp/lr=0.1') == dict(lr='0.1', log=f'{ROOT_PLACEHOLDER}/log.txt')
+
+def test_config_hash_is_stable(tmp_path, monkeypatch):
+    a = effective_params(dict(_lr=0.1, _wd=0, _root='/a/lr=0.1'), 'root', '/a/lr=0.1')
+    b = effective_params(dict(_wd=0, _root='/b/run_7', _lr=0.1), 'root', '/b/run_7') # other folder and order
+    assert config_hash('train.py', 'python', a) == config_hash('train.py', 'python', b)
+    assert len(config_hash('train.py', 'python', a)) == 64
+
+    monkeypatch.chdir(tmp_path) # the script is identified by its absolute path
+    assert config_hash('train.py', 'python', a) == config_hash(str(tmp_path / 'train.py'), 'python', a)
+    assert config_hash('train.py', 'python', a) != config_hash('eval.py', 'python', a)
+    assert config_hash('train.py', 'python', a) != config_hash('train.py', 'python3', a)
+    assert config_hash('train.py', 'python', a) != config_hash('train.py', 'python', dict(a, lr='0.2'))
+
+def test_index_lookup_across_launches(tmp_path):
+    path = str(tmp_path / 'index.sqlite')
+    first = finished_root(str(tmp_path), 'first')
+    second = finished_root(str(tmp_path), 'second')
+    index = GlobalIndex(path, batch_size=2)
+    index.add('h1', 'train.py', dict(lr='0.1'), first)
+    assert index.lookup('h1') == first # pending rows are visible before the commit
+    index.add('h1', 'train.py', dict(lr='0.1'), second)
+    index.close()
+
+    index = GlobalIndex(path)
+    assert index.lookup('h1') == first # the first folder is kept
+    assert index.lookup('h2') is None
+    index.close()
+
+def test_index_forgets_deleted_results(tmp_path):
+    path = str(tmp_path / 'index.sqlite')
+    root = finished_root(str(tmp_path), 'run')
+    index = GlobalIndex(path)
+    index.add('h1', 'train.py', {}, root)
+    index.flush()
+    os.remove(os.path.join(root, 'state.finished'))
+    assert index.lookup('h1') is None
+    open(os.path.join(root, 'state.finished'), 'w').close()
+    assert index.lookup('h1') is None # the entry was removed
+    index.close()
+
+def test_link_result(tmp_path):
+    source = finished_root(str(tmp_path), 'source')
+    root = str(tmp_path / 'sweep' / 'lr=0.1')
+    assert link_result(source, root)
+    assert os.path.islink(root) and os.path.isfile(os.path.join(root, 'state.finished'))
+    assert not link_result(source, root) # already exists
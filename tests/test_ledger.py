@@ -0,0 +1,79 @@
+import os
+from string import Template
+import gridsearcher.gridsearcher
+from gridsearcher import GridSearcher
+from gridsearcher.ledger import SweepLedger, SUCCEEDED, FAILED, RUNNING, QUEUED
+from gridsearcher.resume import FINISHED_FILE
+
+SCRIPT = '''
+import sys, os
+out = sys.argv[sys.argv.index('--out') + 1]
+with open(os.path.join(os.path.dirname(os.path.dirname(out)), 'runs.txt'), 'a') as f:
+    f.write(sys.argv[sys.argv.index('--lr') + 1] + '\\n')
+sys.exit(1 if sys.argv[sys.argv.index('--lr') + 1] == os.environ.get('FAIL_LR') else 0)
+'''
+
+def launch(tmp_path, monkeypatch, **scheduling):
+    """
+        Runs the sweep lr=1..4 of SCRIPT in tmp_path/sweep and returns the values of lr that ran, in sorted order.
+    """
+    monkeypatch.setattr(gridsearcher.gridsearcher, 'pause_process', lambda *args, **kwargs: None)
+    script = tmp_path / 'script.py'
+    script.write_text(SCRIPT)
+    runs = tmp_path / 'runs.txt'
+    if runs.exists():
+        runs.unlink()
+    gs = GridSearcher(script=str(script), defaults={})
+    gs.run(param_name_for_exp_root_folder='out', exp_folder=Template(str(tmp_path / 'sweep' / 'lr=${lr}')),
+           scheduling=dict(gpus=[0], max_jobs_per_gpu=2, distributed_training=False, warmup_seconds=0, params_values=dict(lr=[1, 2, 3, 4]),
+                           progress=dict(terminal=False), **scheduling))
+    return sorted(runs.read_text().split()) if runs.exists() else []
+
+def ledger_of(tmp_path):
+    paths = [name for name in os.listdir(tmp_path / 'sweep') if name.endswith('ledger.sqlite')]
+    return SweepLedger(str(tmp_path / 'sweep' / paths[0]))
+
+def test_records_the_state_of_each_job(tmp_path, monkeypatch):
+    monkeypatch.setenv('FAIL_LR', '2')
+    assert launch(tmp_path, monkeypatch, ledger=True) == ['1', '2', '3', '4']
+    ledger = ledger_of(tmp_path)
+    assert ledger.counts() == {SUCCEEDED: 3, FAILED: 1}
+    failed = ledger.select(FAILED)[0]
+    assert failed['root'].endswith('lr=2') and failed['exit_code'] == 1 and failed['attempts'] == 1
+
+def test_retry_failed_only_runs_the_failed_jobs(tmp_path, monkeypatch):
+    monkeypatch.setenv('FAIL_LR', '2')
+    launch(tmp_path, monkeypatch, ledger=True)
+    os.remove(tmp_path / 'sweep' / 'lr=4' / FINISHED_FILE) # not failed in the ledger, so not run again
+    monkeypatch.setenv('FAIL_LR', '')
+    assert launch(tmp_path, monkeypatch, ledger=True, retry_failed_only=True) == ['2']
+    assert ledger_of(tmp_path).counts() == {SUCCEEDED: 4}
+
+def test_resume_across_enabling_the_ledger(tmp_path, monkeypatch):
+    assert launch(tmp_path, monkeypatch) == ['1', '2', '3', '4']
+    os.remove(tmp_path / 'sweep' / 'lr=3' / FINISHED_FILE)
+    assert launch(tmp_path, monkeypatch, ledger=True) == ['3']
+    assert launch(tmp_path, monkeypatch, ledger=True) == [] # lr=1, 2 and 4 finished before the ledger existed
+
+def test_start_marks_stale_running_jobs_as_failed(tmp_path):
+    path = str(tmp_path / 'ledger.sqlite')
+    ledger = SweepLedger(path).start()
+    for job_id in ['a', 'b', 'c']:
+        ledger.queued(job_id, f'/root/{job_id}', f'train.py --x {job_id}', {'_x': job_id})
+    ledger.running('a', [0])
+    ledger.running('b', [1])
+    ledger.ended('b', 0)
+    ledger.close() # the launcher died while a was running
+
+    ledger = SweepLedger(path).start()
+    ledger.close()
+    assert ledger.counts() == {FAILED: 1, SUCCEEDED: 1, QUEUED: 1}
+    assert ledger.job_ids(FAILED) == {'a'}
+    assert ledger.job_ids(RUNNING) == set()
+
+def test_batched_writes_are_visible_after_close(tmp_path):
+    ledger = SweepLedger(str(tmp_path / 'ledger.sqlite'), flush_interval=60, batch_size=1000).start()
+    for i in range(100):
+        ledger.queued(str(i), f'/root/{i}', 'cmd', {})
+    ledger.close()
+    assert ledger.counts() == {QUEUED: 100}
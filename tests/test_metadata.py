@@ -0,0 +1,55 @@
+import os
+from string import Template
+import gridsearcher.gridsearcher
+from gridsearcher import GridSearcher
+from gridsearcher.metadata import SweepJournal, JobMetadata
+from gridsearcher.resume import FINISHED_FILE
+
+SCRIPT = '''
+import sys, os
+out = sys.argv[sys.argv.index('--out') + 1]
+with open(os.path.join(os.path.dirname(os.path.dirname(out)), 'runs.txt'), 'a') as f:
+    f.write(sys.argv[sys.argv.index('--lr') + 1] + '\\n')
+'''
+
+def launch(tmp_path, monkeypatch, **scheduling):
+    """
+        Runs the sweep lr=1..4 of SCRIPT in tmp_path/sweep and returns the values of lr that ran, in sorted order.
+    """
+    monkeypatch.setattr(gridsearcher.gridsearcher, 'pause_process', lambda *args, **kwargs: None)
+    script = tmp_path / 'script.py'
+    script.write_text(SCRIPT)
+    runs = tmp_path / 'runs.txt'
+    if runs.exists():
+        runs.unlink()
+    gs = GridSearcher(script=str(script), defaults={})
+    gs.run(param_name_for_exp_root_folder='out', exp_folder=Template(str(tmp_path / 'sweep' / 'lr=${lr}')),
+           scheduling=dict(gpus=[0], max_jobs_per_gpu=2, distributed_training=False, warmup_seconds=0, params_values=dict(lr=[1, 2, 3, 4]),
+                           progress=dict(terminal=False), **scheduling))
+    return sorted(runs.read_text().split()) if runs.exists() else []
+
+def test_journal_records_finished_jobs(tmp_path):
+    journal = SweepJournal(str(tmp_path / 'metadata.jsonl'))
+    metadata = JobMetadata(journal=journal, per_job_files=False)
+    metadata.mark_finished(str(tmp_path / 'a'), 0)
+    metadata.mark_finished(str(tmp_path / 'b'), 1) # failed jobs are not finished
+    with open(journal.path, 'a') as f:
+        f.write('{"event": "finished", "ro') # truncated by a killed launcher
+    assert journal.finished_roots() == {str(tmp_path / 'a')}
+    assert not os.path.exists(tmp_path / 'a' / FINISHED_FILE)
+    metadata.close()
+
+def test_journal_is_seeded_once(tmp_path):
+    journal = SweepJournal(str(tmp_path / 'metadata.jsonl'))
+    journal.append('finished', '/sweep/a')
+    assert journal.finished_roots(seed=lambda: ['/sweep/a', '/sweep/./b']) == {'/sweep/a', '/sweep/b'}
+    assert journal.finished_roots(seed=lambda: ['/sweep/c']) == {'/sweep/a', '/sweep/b'} # seeded already
+    assert journal.finished_roots() == {'/sweep/a', '/sweep/b'}
+    journal.close()
+
+def test_resume_across_enabling_the_journal(tmp_path, monkeypatch):
+    assert launch(tmp_path, monkeypatch) == ['1', '2', '3', '4']
+    os.remove(tmp_path / 'sweep' / 'lr=3' / FINISHED_FILE)
+    assert launch(tmp_path, monkeypatch, metadata_journal=True) == ['3']
+    assert launch(tmp_path, monkeypatch, metadata_journal=True) == []
+    assert not os.path.exists(tmp_path / 'sweep' / 'lr=3' / FINISHED_FILE) # only recorded in the journal
@@ -0,0 +1,48 @@
+import sys
+import threading
+import pytest
+from gridsearcher import process
+from gridsearcher.process import ProcessSupervisor
+
+def test_output_exit_code_and_close(tmp_path):
+    supervisor = ProcessSupervisor()
+    ended = threading.Event()
+    exit_codes = []
+    on_exit = lambda exit_code: (exit_codes.append(exit_code), ended.set())
+    log_path = str(tmp_path / 'output.log')
+    supervisor.launch([sys.executable, '-c', 'print("hello"); exit(3)'], env=None, log_path=log_path, on_exit=on_exit)
+    assert ended.wait(10)
+    assert exit_codes == [3]
+    with open(log_path) as f:
+        assert f.read() == 'hello\n'
+
+    supervisor.close()
+    assert not supervisor.thread.is_alive()
+    assert supervisor.wakeup_r.fileno() == -1 and supervisor.wakeup_w.fileno() == -1
+    supervisor.close() # closing twice does nothing
+
+def test_close_with_a_running_job(tmp_path):
+    supervisor = ProcessSupervisor()
+    handle = supervisor.launch([sys.executable, '-c', 'import time; time.sleep(10)'], env=None, log_path=str(tmp_path / 'output.log'),
+                               on_exit=lambda exit_code: None)
+    supervisor.close()
+    assert not supervisor.thread.is_alive()
+    assert handle.log.file.closed
+    handle.kill()
+    handle.proc.wait()
+
+def test_log_closed_when_the_job_cannot_start(tmp_path, monkeypatch):
+    logs = []
+
+    class RecordedLog(process.RotatingLog):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            logs.append(self)
+
+    monkeypatch.setattr(process, 'RotatingLog', RecordedLog)
+    supervisor = ProcessSupervisor()
+    with pytest.raises(FileNotFoundError):
+        supervisor.launch([str(tmp_path / 'missing')], env=None, log_path=str(tmp_path / 'output.log'), on_exit=lambda exit_code: None)
+    assert len(logs) == 1 and logs[0].file.closed
+    assert supervisor.running() == []
+    supervisor.close()
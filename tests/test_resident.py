@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+from gridsearcher.resident import ResidentPool
+
+SCRIPT = '''
+import os
+import sys
+
+def main():
+    lr = int(sys.argv[sys.argv.index('--lr') + 1])
+    print(f'pid={os.getpid()}')
+    if lr == 2:
+        raise RuntimeError('diverged')
+    if lr == 3:
+        sys.exit(3)
+    if lr == 4:
+        os._exit(5) # kills the worker
+
+if __name__ == '__main__':
+    main()
+'''
+
+def make_pool(tmp_path, **kwargs):
+    script = tmp_path / 'train.py'
+    script.write_text(SCRIPT)
+    return ResidentPool(str(script), echo=False, **kwargs)
+
+def run(pool, tmp_path, lr, gpus=(0,)):
+    """
+        Runs one job and waits for its end, returns (exit code, pid of the worker, content of the log).
+    """
+    root = str(tmp_path / f'lr={lr}')
+    params = (sys.executable, f'{pool.script} --lr {lr}', root, dict(_lr=lr, _root=root), False, False, 2**20, 1)
+    ended = threading.Event()
+    exit_codes = []
+    worker = pool.launch(params, list(gpus), lambda exit_code: (exit_codes.append(exit_code), ended.set()))
+    assert ended.wait(30)
+    with open(os.path.join(root, 'output.log')) as f:
+        return exit_codes[0], worker.pid, f.read()
+
+def test_worker_is_reused_after_a_failed_job(tmp_path):
+    pool = make_pool(tmp_path)
+    results = [run(pool, tmp_path, lr) for lr in [1, 2, 3, 1]]
+    pool.close()
+    assert [exit_code for exit_code, _, _ in results] == [0, 1, 3, 0]
+    assert len({pid for _, pid, _ in results}) == 1
+    assert results[0][2] == f'pid={results[0][1]}\n'
+    assert 'RuntimeError: diverged' in results[1][2]
+    assert os.path.isfile(tmp_path / 'lr=1' / 'state.finished')
+
+def test_dead_worker_is_replaced(tmp_path):
+    pool = make_pool(tmp_path)
+    exit_code, first, _ = run(pool, tmp_path, 4)
+    assert exit_code == 5
+    _, second, _ = run(pool, tmp_path, 1)
+    pool.close()
+    assert first != second
+
+def test_max_jobs_per_worker_and_gpus(tmp_path):
+    pool = make_pool(tmp_path, max_jobs_per_worker=2)
+    pids = [run(pool, tmp_path, 1)[1] for _ in range(3)]
+    other = run(pool, tmp_path, 1, gpus=(1,))[1]
+    pool.close()
+    assert pids[0] == pids[1] != pids[2] # replaced after 2 jobs
+    assert other not in pids # the workers are bound to their GPUs
+    assert pool.workers == set()
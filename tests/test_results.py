@@ -0,0 +1,84 @@
+import os
+import json
+import time
+from gridsearcher.results import SweepResults, collect_results, parse_metrics, CACHE_FILE
+
+def make_run(folder, lr, loss=None, finished=True):
+    root = os.path.join(folder, f'lr={lr}')
+    os.makedirs(root)
+    with open(os.path.join(root, 'arguments.txt'), 'w') as f:
+        f.write(f'lr={lr}\nwd=0\n')
+    if loss is not None:
+        with open(os.path.join(root, 'metrics.jsonl'), 'w') as f:
+            f.write(json.dumps(dict(epoch=1, loss=loss)) + '\n')
+    if finished:
+        open(os.path.join(root, 'state.finished'), 'w').close()
+    return root
+
+def age(*paths, seconds=60):
+    """
+        Moves the mtime of `paths` to the past, such that the folders are older than the slack of the cache.
+    """
+    t = time.time() - seconds
+    for path in paths:
+        os.utime(path, (t, t))
+
+def collect(folder, **kwargs):
+    results = SweepResults(str(folder), workers=2, **kwargs)
+    return results.collect(), results.stats
+
+def test_table_columns(tmp_path):
+    make_run(tmp_path, 0.1, loss=0.5)
+    make_run(tmp_path, 0.2, finished=False)
+    table, _ = collect(tmp_path)
+    assert table.rows() == [
+        dict(root=os.path.join(str(tmp_path), 'lr=0.1'), lr=0.1, wd=0, epoch=1, loss=0.5, finished=True),
+        dict(root=os.path.join(str(tmp_path), 'lr=0.2'), lr=0.2, wd=0, epoch=None, loss=None, finished=False),
+    ]
+    assert list(collect_results(str(tmp_path), cache=False, varying_only=True).columns) == ['root', 'lr', 'epoch', 'loss', 'finished']
+
+def test_parse_metrics_formats(tmp_path):
+    (tmp_path / 'm.json').write_text('{"val": {"loss": 0.3}, "step": 7}')
+    (tmp_path / 'm.csv').write_text('step,loss\n1,0.9\n2,0.4\n')
+    (tmp_path / 'm.txt').write_text('loss=0.2\nbest=True\n')
+    assert parse_metrics(str(tmp_path / 'm.json')) == {'val.loss': 0.3, 'step': 7}
+    assert parse_metrics(str(tmp_path / 'm.csv')) == dict(step=2, loss=0.4)
+    assert parse_metrics(str(tmp_path / 'm.txt')) == dict(loss=0.2, best=True)
+
+def test_cache_reparses_changed_runs_only(tmp_path):
+    roots = [make_run(tmp_path, lr, loss=lr) for lr in [1, 2, 3]]
+    age(str(tmp_path), *roots)
+    _, stats = collect(tmp_path)
+    assert stats == dict(listed=4, parsed=3, cached=0)
+    assert os.path.isfile(tmp_path / CACHE_FILE)
+
+    _, stats = collect(tmp_path)
+    assert stats == dict(listed=1, parsed=0, cached=3) # only the sweep folder, modified by writing the cache, is listed again
+
+    metrics = os.path.join(roots[1], 'metrics.jsonl')
+    with open(metrics, 'w') as f: # same size, only the mtime tells that the file changed
+        f.write(json.dumps(dict(epoch=1, loss=7)) + '\n')
+    age(metrics, seconds=30)
+    os.remove(os.path.join(roots[2], 'state.finished'))
+    table, stats = collect(tmp_path)
+    assert stats['parsed'] == 2 and stats['cached'] == 1
+    assert table.columns['loss'] == [1, 7, 3]
+    assert table.columns['finished'] == [True, True, False]
+
+def test_new_run_is_found(tmp_path):
+    roots = [make_run(tmp_path, lr) for lr in [1, 2]]
+    age(str(tmp_path), *roots)
+    collect(tmp_path)
+    make_run(tmp_path, 3) # modifies the mtime of the sweep folder
+    table, stats = collect(tmp_path)
+    assert table.columns['lr'] == [1, 2, 3]
+    assert stats['parsed'] == 1
+
+def test_invalid_cache_is_ignored(tmp_path):
+    make_run(tmp_path, 1, loss=0.5)
+    collect(tmp_path)
+    _, stats = collect(tmp_path, metrics=['metrics.jsonl', 'eval.json']) # other metric files
+    assert stats['parsed'] == 1
+    (tmp_path / CACHE_FILE).write_text('{"version": ')
+    table, stats = collect(tmp_path)
+    assert stats['parsed'] == 1 and table.columns['loss'] == [0.5]
@@ -0,0 +1,42 @@
+import os
+from gridsearcher.resume import ResumeIndex, FINISHED_FILE
+
+def make_runs(folder, finished):
+    """
+        Creates the root folders folder/lr=*/seed=* and the file state.finished in the ones listed in `finished`.
+    """
+    roots = [os.path.join(folder, f'lr={lr}', f'seed={seed}') for lr in [1, 2, 3] for seed in [0, 1]]
+    for root in roots:
+        os.makedirs(root)
+    for i in finished:
+        open(os.path.join(roots[i], FINISHED_FILE), 'w').close()
+    return roots
+
+def test_scan_finds_finished_runs(tmp_path):
+    roots = make_runs(tmp_path, finished=[0, 3, 5])
+    index = ResumeIndex(str(tmp_path), depth=2, workers=4).scan()
+    assert [index.is_finished(root) for root in roots] == [True, False, False, True, False, True]
+    assert index.is_finished(os.path.join(str(tmp_path), 'lr=1', '.', 'seed=0')) # paths are normalized
+    assert not index.is_finished(os.path.join(str(tmp_path), 'lr=9', 'seed=0'))
+
+def test_missing_folder_is_empty(tmp_path):
+    assert ResumeIndex(str(tmp_path / 'missing'), depth=2).scan().finished == set()
+
+def test_manifest_keeps_finished_runs_and_checks_the_others(tmp_path):
+    roots = make_runs(tmp_path / 'sweep', finished=[0])
+    manifest = str(tmp_path / 'manifest.json')
+    first = ResumeIndex(str(tmp_path / 'sweep'), depth=2, manifest=manifest).scan()
+    assert first.finished == {roots[0]}
+
+    open(os.path.join(roots[4], FINISHED_FILE), 'w').close() # finished between two launches
+    second = ResumeIndex(str(tmp_path / 'sweep'), depth=2, manifest=manifest).scan()
+    assert second.finished == {roots[0], roots[4]}
+    assert second.stats['checked'] == len(roots) - 1 # the run finished at the first scan is trusted
+
+def test_corrupted_manifest_means_full_scan(tmp_path):
+    roots = make_runs(tmp_path / 'sweep', finished=[2])
+    manifest = tmp_path / 'manifest.json'
+    manifest.write_text('{"dirs": ')
+    index = ResumeIndex(str(tmp_path / 'sweep'), depth=2, manifest=str(manifest)).scan()
+    assert index.finished == {roots[2]}
+    assert index.stats['checked'] == len(roots)
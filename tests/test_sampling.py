@@ -0,0 +1,40 @@
+import pytest
+from gridsearcher.sampling import Sampler, Uniform, LogUniform, IntUniform
+
+def unit_points(method, n, dims, seed=0):
+    sampler = Sampler({f'x{d}': Uniform(0, 1) for d in range(dims)}, n=n, method=method, seed=seed)
+    return [sampler.unit_point(i) for i in range(n)]
+
+@pytest.mark.parametrize('method', ['sobol', 'lhs'])
+def test_one_point_per_stratum_in_each_dimension(method):
+    n = 64
+    points = unit_points(method, n, dims=5, seed=3)
+    for d in range(5):
+        assert sorted(int(p[d] * n) for p in points) == list(range(n))
+
+def test_sobol_is_a_net_in_two_dimensions():
+    points = unit_points('sobol', 64, dims=2, seed=1)
+    for rows in [2, 4, 8, 16, 32]: # each elementary box of volume 1/64 contains one point
+        cols = 64 // rows
+        assert len({(int(x * rows), int(y * cols)) for x, y in points}) == 64
+
+@pytest.mark.parametrize('method', ['random', 'sobol'])
+def test_more_points_keep_the_first_ones(method):
+    params_values = dict(lr=LogUniform(1e-5, 1e-1), layers=IntUniform(2, 12), act=['relu', 'gelu'])
+    first = list(Sampler(params_values, n=10, method=method, seed=5))
+    more = list(Sampler(params_values, n=20, method=method, seed=5))
+    assert more[:10] == first
+    assert list(Sampler(params_values, n=10, method=method, seed=6)) != first
+
+@pytest.mark.parametrize('method', ['random', 'sobol', 'lhs'])
+def test_points_are_distinct_and_in_range(method):
+    params_values = dict(lr=LogUniform(1e-5, 1e-1), layers=IntUniform(2, 12), act=['relu', 'gelu'])
+    points = list(Sampler(params_values, n=50, method=method))
+    assert len(points) == len(set(points)) == 50
+    for lr, layers, act in points:
+        assert 1e-5 <= lr <= 1e-1 and 2 <= layers <= 12 and act in ['relu', 'gelu']
+
+@pytest.mark.parametrize('method', ['random', 'sobol', 'lhs'])
+def test_discrete_space_smaller_than_n(method):
+    points = list(Sampler(dict(a=[1, 2, 3], b=['x', 'y']), n=100, method=method))
+    assert sorted(points) == [(a, b) for a in [1, 2, 3] for b in ['x', 'y']]